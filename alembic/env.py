@@ -13,6 +13,7 @@ from src.models import book as _book
 from src.models import author as _author 
 from src.models import user as _user 
 from src.models import user_book_event as _user_book_event  
+from src.models import user_recommendation as _user_recommendation  
 
 config = context.config
 if config.config_file_name:
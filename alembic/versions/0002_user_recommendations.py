@@ -0,0 +1,23 @@
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0002_user_recommendations"
+down_revision = "0001_uq_title_per_author"
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_table(
+        "user_recommendations",
+        sa.Column("username", sa.String(length=50), primary_key=True),
+        sa.Column("rank", sa.Integer, primary_key=True),
+        sa.Column("book_id", sa.Integer, sa.ForeignKey("books.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("score", sa.Float, nullable=False),
+        sa.Column("computed_at", sa.DateTime(timezone=True), server_default=sa.text("now()"), nullable=False),
+    )
+    op.create_index(op.f("ix_user_recommendations_computed_at"), "user_recommendations", ["computed_at"])
+
+def downgrade():
+    op.drop_index(op.f("ix_user_recommendations_computed_at"), table_name="user_recommendations")
+    op.drop_table("user_recommendations")
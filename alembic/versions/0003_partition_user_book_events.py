@@ -0,0 +1,100 @@
+from datetime import datetime, timezone
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0003_partition_user_book_events"
+down_revision = "0002_user_recommendations"
+branch_labels = None
+depends_on = None
+
+MONTHS_AHEAD = 3
+
+COLUMNS = """
+    id INTEGER NOT NULL DEFAULT nextval('user_book_events_id_seq'),
+    username VARCHAR(50) NOT NULL,
+    book_id INTEGER NOT NULL REFERENCES books(id) ON DELETE CASCADE,
+    event VARCHAR(20) NOT NULL,
+    rating INTEGER,
+    created_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now(),
+    CONSTRAINT ck_user_book_events_event_allowed CHECK (event in ('view','like','rate')),
+    CONSTRAINT ck_user_book_events_rating_range CHECK ((rating is NULL) OR (rating BETWEEN 1 AND 5))
+"""
+
+def _month(year: int, month: int, offset: int = 0):
+    idx = year * 12 + (month - 1) + offset
+    return idx // 12, idx % 12 + 1
+
+def _create_monthly_partitions(conn, first_year: int, first_month: int) -> None:
+    now = datetime.now(timezone.utc)
+    last = _month(now.year, now.month, MONTHS_AHEAD)
+    y, m = first_year, first_month
+    while (y, m) <= last:
+        ny, nm = _month(y, m, 1)
+        conn.execute(sa.text(
+            f"CREATE TABLE user_book_events_y{y:04d}m{m:02d} PARTITION OF user_book_events "
+            f"FOR VALUES FROM ('{y:04d}-{m:02d}-01 00:00:00+00') TO ('{ny:04d}-{nm:02d}-01 00:00:00+00')"
+        ))
+        y, m = ny, nm
+
+def upgrade():
+    conn = op.get_bind()
+    had_table = conn.execute(sa.text("SELECT to_regclass('user_book_events')")).scalar() is not None
+
+    if had_table:
+        op.execute("ALTER TABLE user_book_events RENAME TO user_book_events_heap")
+        # the key is user_book_events_pkey1 after a downgrade, so look it up
+        pkey = conn.execute(sa.text(
+            "SELECT conname FROM pg_constraint WHERE conrelid = 'user_book_events_heap'::regclass AND contype = 'p'"
+        )).scalar()
+        if pkey is not None:
+            op.execute(f'ALTER TABLE user_book_events_heap RENAME CONSTRAINT "{pkey}" TO user_book_events_heap_pkey')
+        op.execute("DROP INDEX IF EXISTS ix_user_book_events_username")
+        op.execute("DROP INDEX IF EXISTS ix_user_book_events_book_id")
+        op.execute("DROP INDEX IF EXISTS ix_user_book_event_user_book")
+        op.execute("ALTER SEQUENCE user_book_events_id_seq OWNED BY NONE")
+    else:
+        op.execute("CREATE SEQUENCE IF NOT EXISTS user_book_events_id_seq")
+
+    # the partition key has to be part of every unique constraint, including the primary key
+    op.execute(f"CREATE TABLE user_book_events ({COLUMNS}, PRIMARY KEY (id, created_at)) PARTITION BY RANGE (created_at)")
+    op.execute("ALTER SEQUENCE user_book_events_id_seq OWNED BY user_book_events.id")
+    op.execute("CREATE TABLE user_book_events_default PARTITION OF user_book_events DEFAULT")
+
+    now = datetime.now(timezone.utc)
+    first = (now.year, now.month)
+    if had_table:
+        oldest = conn.execute(sa.text("SELECT min(created_at) FROM user_book_events_heap")).scalar()
+        if oldest is not None:
+            first = min(first, (oldest.year, oldest.month))
+    _create_monthly_partitions(conn, *first)
+
+    op.execute("CREATE INDEX ix_user_book_events_username_created_at ON user_book_events (username, created_at)")
+    op.execute("CREATE INDEX ix_user_book_events_book_id ON user_book_events (book_id)")
+    op.execute("CREATE INDEX ix_user_book_event_user_book ON user_book_events (username, book_id)")
+
+    if had_table:
+        op.execute(
+            "INSERT INTO user_book_events (id, username, book_id, event, rating, created_at) "
+            "SELECT id, username, book_id, event, rating, created_at FROM user_book_events_heap"
+        )
+        op.execute("DROP TABLE user_book_events_heap")
+
+def downgrade():
+    op.execute("ALTER TABLE user_book_events RENAME TO user_book_events_partitioned")
+    op.execute("ALTER TABLE user_book_events_partitioned RENAME CONSTRAINT user_book_events_pkey TO user_book_events_partitioned_pkey")
+    op.execute("ALTER SEQUENCE user_book_events_id_seq OWNED BY NONE")
+    op.execute("DROP INDEX IF EXISTS ix_user_book_events_username_created_at")
+    op.execute("DROP INDEX IF EXISTS ix_user_book_events_book_id")
+    op.execute("DROP INDEX IF EXISTS ix_user_book_event_user_book")
+    op.execute(f"CREATE TABLE user_book_events ({COLUMNS}, PRIMARY KEY (id))")
+    op.execute("ALTER SEQUENCE user_book_events_id_seq OWNED BY user_book_events.id")
+    op.execute(
+        "INSERT INTO user_book_events (id, username, book_id, event, rating, created_at) "
+        "SELECT id, username, book_id, event, rating, created_at FROM user_book_events_partitioned"
+    )
+    op.execute("DROP TABLE user_book_events_partitioned")
+    op.execute("CREATE INDEX ix_user_book_events_username ON user_book_events (username)")
+    op.execute("CREATE INDEX ix_user_book_events_book_id ON user_book_events (book_id)")
+    op.execute("CREATE INDEX ix_user_book_event_user_book ON user_book_events (username, book_id)")
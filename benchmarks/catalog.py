@@ -0,0 +1,168 @@
+"""Seeded synthetic catalog: authors, books, users and their book events.
+
+The same size and seed always give the same rows, so results from different
+commits are measured against identical data. Rows are generated lazily and
+inserted in batches, which keeps 10M-book catalogs within a few hundred MB.
+
+    python -m benchmarks.catalog --size 1m --seed 42 --database-url postgresql+asyncpg://...
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import random
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterator, List
+
+from sqlalchemy import func, insert, select
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+
+from src.db.base import Base
+from src.models.author import Author
+from src.models.book import Book
+from src.models.user import User
+from src.models.user_book_event import UserBookEvent
+from src.schemas.book import GENRES
+from tests.factories.authors import build_author
+from tests.factories.books import build_book
+
+Row = Dict[str, Any]
+
+_WORDS = (
+    "shadow empire river silent glass winter garden code machine night ocean stone crown "
+    "iron paper city quantum signal memory harbor forest engine dust storm light theory "
+    "voyage archive orbit ember atlas mirror frontier lantern circuit echo cipher"
+).split()
+_FIRST = "Ada Ivan Olena Mark Sofia Taras Lina Petro Maria Omar Yuki Elena Jonas Nadia Arjun Lea".split()
+_LAST = "Franko Kovalenko Shevchenko Lovelace Turing Hopper Marquez Tanaka Novak Singh Moreau Berg".split()
+_EVENTS = ("view", "view", "view", "like", "rate")
+
+
+@dataclass(frozen=True)
+class CatalogSize:
+    books: int
+    authors: int
+    users: int
+    events: int
+
+
+SIZES = {
+    "10k": CatalogSize(books=10_000, authors=500, users=1_000, events=50_000),
+    "1m": CatalogSize(books=1_000_000, authors=50_000, users=100_000, events=5_000_000),
+    "10m": CatalogSize(books=10_000_000, authors=500_000, users=1_000_000, events=50_000_000),
+}
+
+
+def _row(obj) -> Row:
+    """Column values of a factory-built model; ids and server-side defaults are left out."""
+    return {c.key: getattr(obj, c.key) for c in obj.__table__.columns if not c.primary_key and c.server_default is None}
+
+
+def _isbn13(n: int) -> str:
+    digits = f"979{n:09d}"
+    check = (10 - sum(int(d) * (3 if i % 2 else 1) for i, d in enumerate(digits)) % 10) % 10
+    return digits + str(check)
+
+
+def authors(size: CatalogSize, seed: int) -> Iterator[Row]:
+    rng = random.Random(f"{seed}:authors")
+    for i in range(size.authors):
+        # a numeric suffix keeps names unique however large the catalog
+        name = f"{rng.choice(_FIRST)} {rng.choice(_LAST)} {i}"
+        yield {"id": i + 1, **_row(build_author(name=name))}
+
+
+def books(size: CatalogSize, seed: int) -> Iterator[Row]:
+    rng = random.Random(f"{seed}:books")
+    for i in range(size.books):
+        title = " ".join(rng.choice(_WORDS) for _ in range(rng.randint(1, 4))).title() + f" {i}"
+        # Zipf-ish skew: a few prolific authors, many with one or two books
+        author_id = min(int(rng.paretovariate(1.2)), size.authors) if rng.random() < 0.3 else rng.randint(1, size.authors)
+        book = build_book(
+            title=title,
+            genre=rng.choice(GENRES),
+            published_year=rng.randint(1900, 2024),
+            author_id=author_id,
+            isbn=_isbn13(i) if rng.random() < 0.8 else None,
+        )
+        yield {"id": i + 1, **_row(book)}
+
+
+def users(size: CatalogSize, seed: int, password_hash: str) -> Iterator[Row]:
+    for i in range(size.users):
+        yield {"id": i + 1, "username": f"user{i:07d}", "password": password_hash}
+
+
+def events(size: CatalogSize, seed: int) -> Iterator[Row]:
+    rng = random.Random(f"{seed}:events")
+    start = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    span = 180 * 24 * 3600
+    for _ in range(size.events):
+        event = rng.choice(_EVENTS)
+        yield {
+            "username": f"user{rng.randint(0, size.users - 1):07d}",
+            # popular books get most of the traffic, like real catalogs
+            "book_id": min(int(rng.paretovariate(0.8)), size.books) if rng.random() < 0.5 else rng.randint(1, size.books),
+            "event": event,
+            "rating": rng.randint(1, 5) if event == "rate" else None,
+            "created_at": start + timedelta(seconds=rng.randrange(span)),
+        }
+
+
+def _batches(rows: Iterator[Row], n: int) -> Iterator[List[Row]]:
+    batch: List[Row] = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= n:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+async def load(engine: AsyncEngine, size: CatalogSize, seed: int, password_hash: str, batch_size: int = 10_000) -> None:
+    """Create the schema if needed and insert the catalog; a no-op when it is already there."""
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        if (await conn.execute(select(func.count()).select_from(Book))).scalar() >= size.books:
+            return
+    tables = (
+        (Author, authors(size, seed)),
+        (Book, books(size, seed)),
+        (User, users(size, seed, password_hash)),
+        (UserBookEvent, events(size, seed)),
+    )
+    for model, rows in tables:
+        start = time.perf_counter()
+        total = 0
+        for batch in _batches(rows, batch_size):
+            async with engine.begin() as conn:
+                await conn.execute(insert(model), batch)
+            total += len(batch)
+        print(f"loaded {total:>10} {model.__tablename__:<18} in {time.perf_counter() - start:6.1f} s")
+    if engine.dialect.name == "postgresql":
+        async with engine.begin() as conn:
+            for model in (Author, Book, User, UserBookEvent):
+                table = model.__tablename__
+                await conn.exec_driver_sql(f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), (SELECT MAX(id) FROM {table}))")
+            await conn.exec_driver_sql("ANALYZE")
+
+
+async def main(args: argparse.Namespace) -> None:
+    from src.core.security import hash_password
+
+    engine = create_async_engine(args.database_url)
+    try:
+        await load(engine, SIZES[args.size], args.seed, hash_password("bench-password"))
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size", choices=sorted(SIZES), default="10k")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--database-url", default="sqlite+aiosqlite:///benchmarks/catalog-10k.db")
+    asyncio.run(main(parser.parse_args()))
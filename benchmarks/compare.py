@@ -0,0 +1,44 @@
+"""Compare two `benchmarks.run` reports and flag latency/throughput regressions.
+
+    python -m benchmarks.compare benchmarks/results/abc123-10k-sqlite.json benchmarks/results/def456-10k-sqlite.json
+
+Exits with status 1 when any workload's p95 or throughput got worse by more than --threshold percent.
+"""
+import argparse
+import json
+import sys
+
+
+def _pct(old: float, new: float) -> float:
+    return (new - old) / old * 100 if old else 0.0
+
+
+def compare(old: dict, new: dict, threshold: float) -> bool:
+    print(f"{old['meta'].get('commit')} -> {new['meta'].get('commit')}  ({new['meta']['size']}, {new['meta']['database']})")
+    regressed = False
+    for name, after in new["workloads"].items():
+        before = old["workloads"].get(name)
+        if not before or "skipped" in before or "skipped" in after:
+            continue
+        cells = []
+        worse = False
+        for q in ("p50", "p95", "p99"):
+            d = _pct(before["latency_ms"][q], after["latency_ms"][q])
+            cells.append(f"{q} {after['latency_ms'][q]:8.2f} ms ({d:+6.1f}%)")
+            worse |= q == "p95" and d > threshold
+        d = _pct(before["throughput_rps"], after["throughput_rps"])
+        cells.append(f"{after['throughput_rps']:8.1f} req/s ({d:+6.1f}%)")
+        worse |= d < -threshold
+        regressed |= worse
+        print(f"{'!' if worse else ' '} {name:16} " + "  ".join(cells))
+    return regressed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("old")
+    parser.add_argument("new")
+    parser.add_argument("--threshold", type=float, default=10.0, help="percent change treated as a regression")
+    args = parser.parse_args()
+    with open(args.old) as f_old, open(args.new) as f_new:
+        sys.exit(1 if compare(json.load(f_old), json.load(f_new), args.threshold) else 0)
@@ -0,0 +1,68 @@
+"""Content-index lookup latency and recall: exhaustive scan vs. inverted lists (IVF).
+
+Books come from the seeded synthetic catalog, so every run sees the same titles,
+genres and authors. Recall@k is the share of the exhaustive top-k the IVF lookup
+also returns.
+
+    python -m benchmarks.content_index --books 10000 100000 --queries 500
+"""
+import argparse
+import random
+import statistics
+import time
+
+import numpy as np
+
+from benchmarks.catalog import CatalogSize, authors, books
+from src.services.content_index import ContentIndex, _index_from_rows
+
+
+def _rows(n: int, seed: int):
+    size = CatalogSize(books=n, authors=max(n // 20, 1), users=0, events=0)
+    names = {a["id"]: a["name"] for a in authors(size, seed)}
+    return [(b["id"], b["title"], b["genre"], names.get(b["author_id"])) for b in books(size, seed)]
+
+
+def _lookups(idx: ContentIndex, ids, k: int):
+    times, results = [], []
+    for book_id in ids:
+        start = time.perf_counter()
+        results.append(idx.similar(book_id, k))
+        times.append((time.perf_counter() - start) * 1000)
+    times.sort()
+    return statistics.median(times), times[int(len(times) * 0.99) - 1], results
+
+
+def main(args: argparse.Namespace) -> None:
+    for n in args.books:
+        start = time.perf_counter()
+        flat = _index_from_rows(_rows(n, args.seed), args.dim)
+        built = time.perf_counter() - start
+        ivf = ContentIndex(args.dim, capacity=0)
+        # train() reorders rows, so the IVF index gets its own copy of the arrays
+        ivf.ids, ivf.matrix, ivf.size, ivf._pos = np.array(flat.ids), np.array(flat.matrix), flat.size, dict(flat._pos)
+        ivf.cluster = np.zeros(flat.size, dtype=np.int32)
+        start = time.perf_counter()
+        ivf.train(n_lists=int(2 * np.sqrt(n)), probes=args.probes)
+        trained = time.perf_counter() - start
+
+        ids = random.Random(args.seed).sample(range(1, n + 1), min(args.queries, n))
+        flat_p50, flat_p99, exact = _lookups(flat, ids, args.k)
+        ivf_p50, ivf_p99, approx = _lookups(ivf, ids, args.k)
+        recall = statistics.mean(len(set(a) & set(e)) / max(len(e), 1) for a, e in zip(approx, exact))
+        print(
+            f"{n:>9} books  build {built:6.1f} s + train {trained:5.2f} s   "
+            f"exhaustive p50 {flat_p50:7.3f} ms p99 {flat_p99:7.3f} ms   "
+            f"ivf p50 {ivf_p50:6.3f} ms p99 {ivf_p99:6.3f} ms   recall@{args.k} {recall:.3f}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--books", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--dim", type=int, default=256)
+    parser.add_argument("--probes", type=int, default=8)
+    parser.add_argument("-k", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=42)
+    main(parser.parse_args())
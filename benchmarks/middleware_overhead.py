@@ -0,0 +1,107 @@
+"""Per-request overhead of the rate limiter: raw ASGI vs. the old BaseHTTPMiddleware wiring.
+
+Both variants use the same limiter decision, so the difference is the
+middleware plumbing alone. Requests are driven straight through the ASGI
+callable (no server, no HTTP client) to keep the measurement on the middleware.
+
+    python -m benchmarks.middleware_overhead --requests 20000
+"""
+import argparse
+import asyncio
+import time
+
+from starlette.applications import Starlette
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.requests import Request
+from starlette.responses import PlainTextResponse, StreamingResponse
+from starlette.routing import Route
+
+from src.middlewares.rate_limiter import RateLimiterMiddleware
+
+
+class LegacyRateLimiter(BaseHTTPMiddleware):
+    """The limiter as it was wired before: dispatch() + call_next + header mutation."""
+
+    def __init__(self, app, limiter: RateLimiterMiddleware):
+        super().__init__(app)
+        self.limiter = limiter
+
+    async def dispatch(self, request: Request, call_next):
+        now = time.time()
+        ident = self.limiter._identifier(request.scope, self.limiter._templates.resolve(request.scope))
+        allowed, remaining, _, reset_in = await self.limiter._check(self.limiter._default_ip, ident, now)
+        response = await call_next(request)
+        response.headers["X-RateLimit-Limit"] = str(self.limiter.max_requests)
+        response.headers["X-RateLimit-Remaining"] = str(remaining)
+        response.headers["X-RateLimit-Reset"] = str(int(now + reset_in))
+        return response
+
+
+async def _plain(request):
+    return PlainTextResponse("ok")
+
+
+async def _stream(request):
+    async def chunks():
+        for _ in range(64):
+            yield b"x" * 1024
+    return StreamingResponse(chunks())
+
+
+def _app(wrap) -> Starlette:
+    app = Starlette(routes=[Route("/plain", _plain), Route("/stream", _stream)])
+    return wrap(app)
+
+
+def _limiter(app):
+    return RateLimiterMiddleware(app, max_requests=10**9, window_seconds=1, backend="local")
+
+
+async def _drive(app, path: str, n: int) -> float:
+    sent = []
+    request = {"type": "http.request", "body": b"", "more_body": False}
+    never = asyncio.Event()
+
+    def make_receive():
+        messages = [request]
+
+        async def receive():
+            if messages:
+                return messages.pop()
+            await never.wait()
+        return receive
+
+    async def send(message):
+        sent.append(message["type"])
+
+    scope = {
+        "type": "http", "asgi": {"version": "3.0", "spec_version": "2.4"}, "http_version": "1.1", "method": "GET",
+        "scheme": "http", "path": path, "raw_path": path.encode(), "root_path": "", "query_string": b"",
+        "headers": [(b"host", b"bench")], "client": ("10.0.0.1", 1234), "server": ("bench", 80),
+    }
+    for _ in range(200):
+        await app(dict(scope), make_receive(), send)
+    start = time.perf_counter()
+    for _ in range(n):
+        await app(dict(scope), make_receive(), send)
+    return (time.perf_counter() - start) / n * 1e6
+
+
+async def main(n: int) -> None:
+    variants = {
+        "no middleware": lambda app: app,
+        "BaseHTTPMiddleware": lambda app: LegacyRateLimiter(app, _limiter(app)),
+        "raw ASGI": _limiter,
+    }
+    for path in ("/plain", "/stream"):
+        baseline = None
+        for name, wrap in variants.items():
+            us = await _drive(_app(wrap), path, n)
+            baseline = us if baseline is None else baseline
+            print(f"{path:8} {name:20} {us:8.1f} us/req  (+{us - baseline:6.1f})")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=20_000)
+    asyncio.run(main(parser.parse_args().requests))
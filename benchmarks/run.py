@@ -0,0 +1,263 @@
+"""Scripted API workloads against a seeded catalog; latency percentiles, throughput and RSS as JSON.
+
+Requests go through the real app (routing, middlewares, services, DB) via an
+in-process ASGI client, so no server is needed. The default database is a
+SQLite file; pass a Postgres URL to measure what production runs.
+
+    python -m benchmarks.run --size 10k --requests 500 --concurrency 8
+    python -m benchmarks.run --database-url postgresql+asyncpg://u:p@localhost/bench --size 1m
+    python -m benchmarks.compare benchmarks/results/<old>.json benchmarks/results/<new>.json
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import resource
+import statistics
+import subprocess
+import sys
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# the app reads its settings on first use; benchmarks never touch redis or the real DB
+for key, value in {
+    "POSTGRES_USER": "bench", "POSTGRES_PASSWORD": "bench", "POSTGRES_DB": "bench",
+    "POSTGRES_HOST": "localhost", "POSTGRES_PORT": "5432",
+    "SECRET_KEY": "bench-secret", "ALGORITHM": "HS256", "ACCESS_TOKEN_EXPIRE_MINUTES": "60",
+    "RATE_LIMIT_BACKEND": "local", "AUTH_REVOCATION_BACKEND": "memory", "ADMISSION_ENABLED": "false",
+    "EXPORT_DIR": "/tmp/book-bench/out", "IMPORT_DIR": "/tmp/book-bench/in",
+}.items():
+    os.environ.setdefault(key, value)
+
+import httpx
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from benchmarks.catalog import SIZES, CatalogSize, load
+from src.schemas.book import GENRES
+
+Request = Tuple[str, str, Dict[str, Any]]  # method, url, httpx kwargs
+
+
+@dataclass(frozen=True)
+class Workload:
+    name: str
+    build: Callable[[random.Random, CatalogSize, Dict[str, str]], Request]
+    postgres_only: bool = False  # raw SQL with Postgres casts / ILIKE
+    writes: bool = False  # SQLite allows one writer: run these without concurrency there
+
+
+def _list_books(rng, size, auth):
+    params = {
+        "limit": rng.choice((10, 50, 100)),
+        "offset": rng.randrange(0, min(size.books, 10_000)),
+        "sort_by": rng.choice(("title", "author", "year", "isbn")),
+        "sort_dir": rng.choice(("asc", "desc")),
+    }
+    if rng.random() < 0.3:
+        params["genre"] = rng.choice(GENRES)
+    return "GET", "/api/v1/books/", {"params": params}
+
+
+def _search(rng, size, auth):
+    params = {"year_from": (y := rng.randint(1900, 2020)), "year_to": y + rng.randint(0, 5), "limit": 20}
+    return "GET", "/api/v1/books/", {"params": params}
+
+
+def _get_book(rng, size, auth):
+    return "GET", f"/api/v1/books/{rng.randint(1, size.books)}", {}
+
+
+def _raw(rng, size, auth):
+    params = {"q": rng.choice(("river", "code", "night", "atlas")), "limit": 50}
+    return "GET", "/api/v1/books/representations/raw/", {"params": params}
+
+
+def _stats(rng, size, auth):
+    return "GET", "/api/v1/books/stats/", {}
+
+
+def _recommend(rng, size, auth):
+    by = rng.choice(("author", "genre", "hybrid", "content"))
+    return "GET", f"/api/v1/books/{rng.randint(1, min(size.books, 1000))}/recommendations", {"params": {"by": by}}
+
+
+def _export(rng, size, auth):
+    params = {"fmt": rng.choice(("csv", "json")), "genre": rng.choice(GENRES), "year_from": 2015}
+    return "POST", "/api/v1/books/exports/", {"params": params, "headers": auth}
+
+
+def _import(rng, size, auth):
+    tag = rng.getrandbits(48)
+    items = [
+        {"title": f"Imported {tag} {i}", "author_name": f"Import Author {i % 10}", "genre": rng.choice(GENRES), "published_year": 2000}
+        for i in range(100)
+    ]
+    files = {"file": ("books.json", json.dumps(items).encode(), "application/json")}
+    return "POST", "/api/v1/books/imports/", {"files": files, "headers": auth}
+
+
+WORKLOADS = {
+    w.name: w
+    for w in (
+        Workload("list_books", _list_books),
+        Workload("search", _search),
+        Workload("get_book", _get_book),
+        Workload("raw_listing", _raw, postgres_only=True),
+        Workload("stats", _stats, postgres_only=True),
+        Workload("recommendations", _recommend),
+        Workload("exports", _export),
+        Workload("imports", _import, writes=True),
+    )
+}
+
+
+def rss_bytes() -> int:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    i = min(len(sorted_values) - 1, max(0, round(q / 100 * (len(sorted_values) - 1))))
+    return sorted_values[i]
+
+
+async def run_workload(client: httpx.AsyncClient, workload: Workload, size: CatalogSize, auth, seed: int, n: int, concurrency: int) -> Dict[str, Any]:
+    rng = random.Random(f"{seed}:{workload.name}")
+    requests = [workload.build(rng, size, auth) for _ in range(n)]
+    latencies: List[float] = []
+    statuses: Dict[str, int] = {}
+    queue = iter(requests)
+
+    async def worker() -> None:
+        for method, url, kwargs in queue:
+            start = time.perf_counter()
+            try:
+                status = str((await client.request(method, url, **kwargs)).status_code)
+            except Exception as e:  # unhandled in the app: what a server would turn into a 500
+                status = type(e).__name__
+            latencies.append(time.perf_counter() - start)
+            statuses[status] = statuses.get(status, 0) + 1
+
+    rss_before = rss_bytes()
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {
+        "requests": n,
+        "concurrency": concurrency,
+        "errors": sum(v for k, v in statuses.items() if not k.startswith("2")),
+        "statuses": statuses,
+        "throughput_rps": n / elapsed,
+        "latency_ms": {
+            "p50": percentile(latencies, 50) * 1000,
+            "p95": percentile(latencies, 95) * 1000,
+            "p99": percentile(latencies, 99) * 1000,
+            "mean": statistics.fmean(latencies) * 1000,
+            "max": latencies[-1] * 1000,
+        },
+        "rss_mb": {"before": rss_before / 2**20, "after": rss_bytes() / 2**20},
+    }
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def main(args: argparse.Namespace) -> Dict[str, Any]:
+    from src.core.security import hash_password
+    from src.db.session import get_read_session, get_session
+    from src.main import create_app
+
+    size = SIZES[args.size]
+    database_url = args.database_url or f"sqlite+aiosqlite:///benchmarks/catalog-{args.size}-{args.seed}.db"
+    postgres = database_url.startswith("postgresql")
+    if postgres:
+        engine = create_async_engine(database_url, pool_size=args.concurrency + 2)
+    else:
+        engine = create_async_engine(database_url, connect_args={"timeout": 30})
+    await load(engine, size, args.seed, hash_password("bench-password"))
+
+    app = create_app()
+    if not args.rate_limit:
+        # measure the handlers, not the limiter (it would 429 a load test by design)
+        app.user_middleware = [m for m in app.user_middleware if m.cls.__name__ != "RateLimiterMiddleware"]
+    sessions = async_sessionmaker(bind=engine, expire_on_commit=False, class_=AsyncSession)
+
+    async def bench_session():
+        async with sessions() as session:
+            yield session
+
+    app.dependency_overrides[get_session] = bench_session
+    app.dependency_overrides[get_read_session] = bench_session
+
+    selected = args.workloads.split(",") if args.workloads else list(WORKLOADS)
+    results: Dict[str, Any] = {}
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=None) as client:
+        r = await client.post("/api/v1/auth/tokens", data={"username": "user0000000", "password": "bench-password"})
+        r.raise_for_status()
+        auth = {"Authorization": f"Bearer {r.json()['access_token']}"}
+        for name in selected:
+            workload = WORKLOADS[name]
+            if workload.postgres_only and not postgres:
+                results[name] = {"skipped": "needs postgres"}
+                print(f"{name:16} skipped (needs postgres)")
+                continue
+            concurrency = 1 if workload.writes and not postgres else args.concurrency
+            await run_workload(client, workload, size, auth, args.seed + 1, min(args.warmup, args.requests), concurrency)
+            res = results[name] = await run_workload(client, workload, size, auth, args.seed, args.requests, concurrency)
+            lat = res["latency_ms"]
+            print(
+                f"{name:16} p50 {lat['p50']:8.2f} ms  p95 {lat['p95']:8.2f} ms  p99 {lat['p99']:8.2f} ms  "
+                f"{res['throughput_rps']:8.1f} req/s  errors {res['errors']}  rss {res['rss_mb']['after']:.0f} MB"
+            )
+    await engine.dispose()
+
+    report = {
+        "meta": {
+            "commit": _git_commit(),
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "database": engine.dialect.name,
+            "size": args.size,
+            "seed": args.seed,
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+        },
+        "workloads": results,
+    }
+    out = args.out or os.path.join("benchmarks", "results", f"{report['meta']['commit'] or 'local'}-{args.size}-{engine.dialect.name}.json")
+    os.makedirs(os.path.dirname(out) or ".", exist_ok=True)
+    with open(out, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"results written to {out}")
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size", choices=sorted(SIZES), default="10k")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--database-url", help="defaults to a SQLite file under benchmarks/")
+    parser.add_argument("--workloads", help=f"comma-separated subset of: {', '.join(WORKLOADS)}")
+    parser.add_argument("--requests", type=int, default=500, help="measured requests per workload")
+    parser.add_argument("--warmup", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--rate-limit", action="store_true", help="keep the rate limiter in the stack (expect 429s)")
+    parser.add_argument("--out", help="JSON report path (default benchmarks/results/<commit>-<size>-<db>.json)")
+    asyncio.run(main(parser.parse_args()))
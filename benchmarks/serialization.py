@@ -0,0 +1,102 @@
+"""Per-item cost of rendering a /books/ page: response_model round trip vs. dicts + orjson.
+
+"before" is the old handler: build a BookResponse per book and return it through
+`response_model=PaginatedBooks`, so FastAPI validates and serialises it again.
+"after" is the current one: plain dicts from projected rows and FastJSONResponse.
+Both run in a real FastAPI app driven through ASGI with in-memory data, so the
+difference is validation + encoding alone.
+
+    python -m benchmarks.serialization --requests 2000
+"""
+import argparse
+import asyncio
+import time
+from types import SimpleNamespace
+
+from fastapi import FastAPI, Query
+
+from src.core.serialization import FastJSONResponse
+from src.schemas.book import GENRES, BookResponse, PaginatedBooks
+
+
+def _books(n: int):
+    return [
+        SimpleNamespace(
+            id=i, title=f"Book {i}", genre=GENRES[i % len(GENRES)], published_year=1950 + i % 70,
+            author=SimpleNamespace(name=f"Author {i % 40}") if i % 7 else None, isbn=f"979{i:010d}" if i % 3 else None,
+        )
+        for i in range(1, n + 1)
+    ]
+
+
+def _rows(books):
+    return [
+        {"id": b.id, "title": b.title, "genre": b.genre, "published_year": b.published_year,
+         "author_name": b.author.name if b.author else None, "isbn": b.isbn}
+        for b in books
+    ]
+
+
+def _app() -> FastAPI:
+    books = _books(100)
+    rows = _rows(books)
+    app = FastAPI()
+
+    @app.get("/before", response_model=PaginatedBooks, response_model_exclude_none=True)
+    async def before(limit: int = Query(10)):
+        items = [
+            BookResponse(
+                id=b.id, title=b.title, genre=b.genre, published_year=b.published_year,
+                author_name=b.author.name if b.author else None, isbn=b.isbn,
+            )
+            for b in books[:limit]
+        ]
+        return {"items": items, "total": 1000, "limit": limit, "offset": 0, "next_offset": limit}
+
+    @app.get("/after", response_model=PaginatedBooks, response_model_exclude_none=True)
+    async def after(limit: int = Query(10)):
+        page = {"items": [{k: v for k, v in r.items() if v is not None} for r in rows[:limit]],
+                "total": 1000, "limit": limit, "offset": 0, "next_offset": limit}
+        return FastJSONResponse(page)
+
+    return app
+
+
+async def _drive(app, path: str, limit: int, n: int) -> float:
+    body = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        if message["type"] == "http.response.body":
+            body.append(message["body"])
+
+    scope = {
+        "type": "http", "asgi": {"version": "3.0", "spec_version": "2.4"}, "http_version": "1.1", "method": "GET",
+        "scheme": "http", "path": path, "raw_path": path.encode(), "root_path": "", "query_string": f"limit={limit}".encode(),
+        "headers": [(b"host", b"bench")], "client": ("10.0.0.1", 1234), "server": ("bench", 80),
+    }
+    for _ in range(100):
+        await app(dict(scope), receive, send)
+    start = time.perf_counter()
+    for _ in range(n):
+        await app(dict(scope), receive, send)
+    return (time.perf_counter() - start) / n * 1e6
+
+
+async def main(n: int) -> None:
+    app = _app()
+    for limit in (10, 100):
+        before = await _drive(app, "/before", limit, n)
+        after = await _drive(app, "/after", limit, n)
+        print(
+            f"page of {limit:3}: before {before:8.1f} us/req ({before / limit:6.2f} us/item)   "
+            f"after {after:8.1f} us/req ({after / limit:6.2f} us/item)   {before / after:4.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=2000)
+    asyncio.run(main(parser.parse_args().requests))
@@ -0,0 +1,48 @@
+"""Cold-start cost of the API: importing src.main, building the app, then the first requests.
+
+Each run is a fresh interpreter so module caches do not hide import costs.
+
+    python -m benchmarks.startup --runs 5
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+PROBE = r"""
+import asyncio, json, time
+t0 = time.perf_counter()
+import src.main
+t1 = time.perf_counter()
+app = src.main.app
+t2 = time.perf_counter()
+import httpx
+
+async def first_requests():
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as c:
+        t = time.perf_counter()
+        await c.get("/openapi.json")
+        t3 = time.perf_counter()
+        await c.get("/metrics")
+        return t3 - t, time.perf_counter() - t3
+
+openapi, metrics = asyncio.run(first_requests())
+print(json.dumps({"import_main": t1 - t0, "build_app": t2 - t1, "first_openapi": openapi, "first_metrics": metrics}))
+"""
+
+
+def main(runs: int) -> None:
+    samples = []
+    for _ in range(runs):
+        out = subprocess.run([sys.executable, "-c", PROBE], check=True, capture_output=True, text=True).stdout
+        samples.append(json.loads(out.strip().splitlines()[-1]))
+    for key in samples[0]:
+        values = [s[key] * 1000 for s in samples]
+        print(f"{key:14} median {statistics.median(values):8.1f} ms   min {min(values):8.1f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    main(parser.parse_args().runs)
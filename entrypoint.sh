@@ -1,5 +1,9 @@
-set -euo pipefail
+#!/bin/sh
+set -eu
 
-mkdir -p /app/data/exports /app/data/imports
+# worker metric snapshots from a previous run would be summed into this one's counters
+if [ -n "${METRICS_MULTIPROC_DIR:-}" ]; then
+  python -m src.core.metrics --clear "$METRICS_MULTIPROC_DIR"
+fi
 
 exec "$@"
@@ -1,7 +1,7 @@
-from typing import List, Optional
+from typing import List, Optional, Tuple
+import asyncio
 import os
 import csv
-import json
 from io import StringIO
 from uuid import uuid4
 
@@ -13,24 +13,37 @@ from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.core.config import settings
-from src.db.session import get_session
+from src.core.metrics import Counter
+from src.core.serialization import FastJSONResponse, dumps
+from src.db.session import get_read_session, get_session
 from src.models.author import Author
 from src.models.book import Book
-from src.schemas.book import BookCreate, BookResponse, BookUpdate, PaginatedBooks
+from src.schemas.book import BookCreate, BookResponse, BookUpdate, PaginatedBooks, book_payload
 from src.schemas.imports import BookImportItem
 from src.services.book_raw import list_books_raw
 from src.services.book_service import BookService
 from src.services.books_stats import books_kpis
 from src.services.recommendations import recommend_for_book
 from src.core.security import get_current_user 
+from src.middlewares.policies import rate_limit
 
 router = APIRouter()
 
+BOOK_IMPORT_ROWS = Counter("book_import_rows_total", "Rows read by book imports, by outcome.", labelnames=("result",))
+BOOK_EXPORT_ROWS = Counter("book_export_rows_total", "Books written to export files, by format.", labelnames=("format",))
+BOOK_EXPORT_BYTES = Counter("book_export_bytes_total", "Size of written export files, by format.", labelnames=("format",))
+
+_IMPORT_ADAPTER = TypeAdapter(list[BookImportItem])
+
 
 def svc(db: AsyncSession = Depends(get_session)) -> BookService:
     return BookService(db)
 
 
+def read_svc(db: AsyncSession = Depends(get_read_session)) -> BookService:
+    return BookService(db)
+
+
 @router.get("/books/", response_model=PaginatedBooks, response_model_exclude_none=True)
 async def list_books(
     title: Optional[str] = Query(None),
@@ -43,7 +56,7 @@ async def list_books(
     offset: int = Query(0, ge=0),
     sort_by: Optional[str] = Query("title", pattern=r"^(title|author|year|isbn)$"),
     sort_dir: Optional[str] = Query("asc", pattern=r"^(asc|desc)$"),
-    s: BookService = Depends(svc),
+    s: BookService = Depends(read_svc),
 ):
     rows, total = await s.list(
         title=title,
@@ -56,34 +69,25 @@ async def list_books(
         offset=offset,
         sort_by=sort_by or "title",
         sort_dir=sort_dir or "asc",
+        as_rows=True,
     )
-    items = [
-        BookResponse(
-            id=b.id,
-            title=b.title,
-            genre=b.genre,
-            published_year=b.published_year,
-            author_name=b.author.name if b.author else None,
-            isbn=b.isbn,
-        )
-        for b in rows
-    ]
-    next_offset = (offset + limit) if (offset + limit) < total else None
-    return {"items": items, "total": total, "limit": limit, "offset": offset, "next_offset": next_offset}
+    # rows come straight from the columns: drop None like response_model_exclude_none and encode once
+    page = {
+        "items": [{k: v for k, v in r.items() if v is not None} for r in rows],
+        "total": total,
+        "limit": limit,
+        "offset": offset,
+    }
+    if offset + limit < total:
+        page["next_offset"] = offset + limit
+    return FastJSONResponse(page)
 
 
 @router.get("/books/{book_id}", response_model=BookResponse, response_model_exclude_none=True)
 async def get_book_by_id(book_id: int, s: BookService = Depends(svc)):
     try:
         b = await s.get_or_404(book_id)
-        return BookResponse(
-            id=b.id,
-            title=b.title,
-            genre=b.genre,
-            published_year=b.published_year,
-            author_name=b.author.name if b.author else None,
-            isbn=b.isbn,
-        )
+        return FastJSONResponse(book_payload(b))
     except ValueError:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Book not found")
 
@@ -133,14 +137,13 @@ async def update_book(
     current_user: dict = Depends(get_current_user),  
 ):
     try:
-        base = await s.get_or_404(book_id)
         obj = await s.update(
             book_id=book_id,
-            title=book_update.title if (book_update.title is not None) else base.title,
-            genre=book_update.genre if (book_update.genre is not None) else base.genre,
-            published_year=book_update.published_year if (book_update.published_year is not None) else base.published_year,
+            title=book_update.title,
+            genre=book_update.genre,
+            published_year=book_update.published_year,
             author_name=book_update.author_name,
-            isbn=book_update.isbn if (book_update.isbn is not None) else None,
+            isbn=book_update.isbn,
         )
         return BookResponse(
             id=obj.id,
@@ -182,7 +185,25 @@ async def delete_book(
         raise HTTPException(500, "Failed to delete book")
 
 
+def _parse_import(content: bytes, ext: str) -> Tuple[List[BookImportItem], int]:
+    """Validated items and the number of skipped CSV rows.
+
+    A malformed JSON upload raises ValueError; a CSV that is not UTF-8 raises UnicodeDecodeError.
+    """
+    if ext == ".json":
+        return _IMPORT_ADAPTER.validate_json(content), 0
+    items: List[BookImportItem] = []
+    invalid = 0
+    for r in csv.DictReader(content.decode("utf-8-sig").splitlines()):
+        try:
+            items.append(BookImportItem.model_validate(r))
+        except Exception:
+            invalid += 1
+    return items, invalid
+
+
 @router.post("/books/imports/", status_code=status.HTTP_201_CREATED)
+@rate_limit(cost=20, per_user=(200, 3600))  # 10 imports an hour
 async def import_books(
     file: UploadFile = File(...),
     db: AsyncSession = Depends(get_session),
@@ -197,20 +218,14 @@ async def import_books(
     async with aiofiles.open(path, "wb") as f:
         await f.write(content)
 
-    adapter = TypeAdapter(list[BookImportItem])
-    items: list[BookImportItem] = []
-    if ext == ".json":
-        try:
-            items = adapter.validate_json(content)
-        except Exception:
-            raise HTTPException(status_code=400, detail="JSON must be a list of books")
-    else:
-        rows = list(csv.DictReader(content.decode("utf-8").splitlines()))
-        for r in rows:
-            try:
-                items.append(BookImportItem.model_validate(r))
-            except Exception:
-                continue
+    try:
+        # parsing and validating a whole upload is CPU-bound: keep it off the event loop
+        items, invalid = await asyncio.to_thread(_parse_import, content, ext)
+    except UnicodeDecodeError:
+        raise HTTPException(status_code=400, detail="CSV must be UTF-8 encoded")
+    except ValueError:
+        raise HTTPException(status_code=400, detail="JSON must be a list of books")
+    BOOK_IMPORT_ROWS.inc(invalid, result="invalid")
 
     created = 0
     for item in items:
@@ -224,6 +239,7 @@ async def import_books(
             await db.execute(select(Book).where(Book.title == item.title, Book.author_id == author.id))
         ).scalars().first()
         if exists:
+            BOOK_IMPORT_ROWS.inc(result="duplicate")
             continue
 
         db.add(
@@ -238,10 +254,12 @@ async def import_books(
         created += 1
 
     await db.commit()
+    BOOK_IMPORT_ROWS.inc(created, result="created")
     return {"created": created, "stored_file": save_name}
 
 
 @router.post("/books/exports/", status_code=status.HTTP_201_CREATED)
+@rate_limit(cost=10, per_user=(200, 3600))  # 20 exports an hour
 async def create_export(
     fmt: str = Query("csv", pattern=r"^(csv|json)$"),
     title: Optional[str] = Query(None),
@@ -266,6 +284,7 @@ async def create_export(
         offset=0,
         sort_by=sort_by or "title",
         sort_dir=sort_dir or "asc",
+        as_rows=True,
     )
     fname = f"books_{uuid4().hex}.{fmt}"
     fullpath = os.path.join(settings.EXPORT_DIR, fname)
@@ -274,34 +293,26 @@ async def create_export(
         buf = StringIO(newline="")
         writer = csv.writer(buf, quoting=csv.QUOTE_MINIMAL)
         writer.writerow(["id", "title", "genre", "published_year", "author_name", "isbn"])
-        for b in rows:
+        for r in rows:
             writer.writerow(
                 [
-                    b.id,
-                    b.title or "",
-                    b.genre or "",
-                    b.published_year or "",
-                    b.author.name if b.author else "",
-                    b.isbn or "",
+                    r["id"],
+                    r["title"] or "",
+                    r["genre"] or "",
+                    r["published_year"] or "",
+                    r["author_name"] or "",
+                    r["isbn"] or "",
                 ]
             )
-        async with aiofiles.open(fullpath, "w", encoding="utf-8", newline="") as f:
-            await f.write(buf.getvalue())
+        payload = buf.getvalue().encode("utf-8")
     else:
-        data = [
-            {
-                "id": b.id,
-                "title": b.title,
-                "genre": b.genre,
-                "published_year": b.published_year,
-                "author_name": b.author.name if b.author else None,
-                "isbn": b.isbn,
-            }
-            for b in rows
-        ]
-        async with aiofiles.open(fullpath, "w", encoding="utf-8") as f:
-            await f.write(json.dumps(data, ensure_ascii=False))
+        # same encoder as the API responses; rows already have the export's keys
+        payload = dumps(rows)
+    async with aiofiles.open(fullpath, "wb") as f:
+        await f.write(payload)
 
+    BOOK_EXPORT_ROWS.inc(len(rows), format=fmt)
+    BOOK_EXPORT_BYTES.inc(len(payload), format=fmt)
     return {"filename": fname}
 
 
@@ -315,38 +326,29 @@ async def download_export(filename: str):
 
 
 @router.get("/books/representations/raw/")
+@rate_limit(cost=5)
 async def books_raw(
     q: str | None = Query(None),
     limit: int = Query(20, ge=1, le=200),
     offset: int = Query(0, ge=0),
     sort_by: str | None = Query("created_at"),
     sort_dir: str | None = Query("desc"),
-    session: AsyncSession = Depends(get_session),
+    session: AsyncSession = Depends(get_read_session),
 ):
     return await list_books_raw(session, q=q, limit=limit, offset=offset, sort_by=sort_by, sort_dir=sort_dir)
 
 
 @router.get("/books/stats/")
-async def books_stats_api(session: AsyncSession = Depends(get_session)):
+async def books_stats_api(session: AsyncSession = Depends(get_read_session)):
     return await books_kpis(session)
 
 
 @router.get("/books/{book_id}/recommendations", response_model=List[BookResponse], response_model_exclude_none=True)
 async def recommend_books(
     book_id: int,
-    by: str = Query("hybrid", pattern=r"^(author|genre|hybrid)$"),
+    by: str = Query("hybrid", pattern=r"^(author|genre|hybrid|content)$"),
     limit: int = Query(10, ge=1, le=50),
-    db: AsyncSession = Depends(get_session),
+    db: AsyncSession = Depends(get_read_session),
 ):
     rows = await recommend_for_book(db, book_id, by=by, limit=limit)
-    return [
-        BookResponse(
-            id=b.id,
-            title=b.title,
-            genre=b.genre,
-            published_year=b.published_year,
-            author_name=b.author.name if b.author else None,
-            isbn=b.isbn,
-        )
-        for b in rows
-    ]
+    return FastJSONResponse([book_payload(b) for b in rows])
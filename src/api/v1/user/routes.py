@@ -1,18 +1,25 @@
+import time
+from datetime import datetime, timezone
 from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, status, Body, Query, Response
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, status, Body, Query, Response
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from sqlalchemy.ext.asyncio import AsyncSession
 from pydantic import BaseModel, field_validator, model_validator, Field
-from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
 
-from src.core.security import create_access_token, get_current_user, hash_password, verify_password
+from src.core.config import settings
+from src.core.security import create_access_token, get_current_user, hash_password_async, verify_password_async
+from src.core.token import create_refresh_token, verify_token as decode_token
+from src.core.token_store import get_revocation_store
 from src.db.session import get_session
-from src.schemas.user import Token, UserCreate, UserResponse
+from src.middlewares.policies import rate_limit
+from src.schemas.user import Token, TokenRefresh, UserCreate, UserResponse
 from src.schemas.book import BookResponse
 from src.models.user_book_event import UserBookEvent
-from src.services.recommendations import recommend_for_user
+from src.services.book_ids import book_exists, confirm_book_ids, existing_book_ids
+from src.services.event_ingest import EVENTS_INGESTED, get_event_buffer, insert_events
+from src.services.rec_cache import cached_recommend_for_user, get_rec_cache, warm_user_recommendations
 from src.services.user_service import UserService
-from src.models.book import Book
 
 router = APIRouter()
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/v1/auth/tokens")
@@ -32,19 +39,69 @@ async def get_user_by_id(id: int, s: UserService = Depends(svc)):
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
 
 @router.post("/auth/tokens", response_model=Token)
+@rate_limit(per_ip=(10, 60))
 async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_session)):
     from src.repositories.user_repo import UserRepository
     repo = UserRepository(db)
     db_user = await repo.get_by_username(form_data.username)
-    if db_user is None or not verify_password(form_data.password, db_user.password):
+    if db_user is None or not await verify_password_async(form_data.password, db_user.password):
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid credentials")
-    access_token = create_access_token(data={"sub": form_data.username})
-    return {"access_token": access_token, "token_type": "bearer"}
+    return _issue_tokens(form_data.username)
+
+def _issue_tokens(username: str) -> dict:
+    return {
+        "access_token": create_access_token(data={"sub": username}),
+        "refresh_token": create_refresh_token(data={"sub": username}),
+        "token_type": "bearer",
+    }
+
+def _store_unavailable() -> HTTPException:
+    return HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Token store unavailable")
+
+async def _refresh_claims(token: str) -> dict:
+    payload = decode_token(token)
+    if not payload or payload.get("type") != "refresh" or not payload.get("jti") or not payload.get("sub"):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid refresh token")
+    try:
+        revoked_before = await get_revocation_store().revoked_before(payload["sub"])
+    except Exception:
+        raise _store_unavailable()
+    # the account was deleted, renamed or given a new password after this token was issued
+    if revoked_before and payload.get("iat", 0) <= revoked_before:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Refresh token revoked")
+    return payload
+
+async def _revoke(payload: dict) -> bool:
+    ttl = int(payload["exp"] - time.time())
+    try:
+        return await get_revocation_store().revoke(payload["jti"], ttl)
+    except Exception:
+        raise _store_unavailable()
+
+async def _revoke_subject(username: str) -> None:
+    try:
+        await get_revocation_store().revoke_subject(username, settings.REFRESH_TOKEN_EXPIRE_MINUTES * 60)
+    except Exception:
+        raise _store_unavailable()
+
+@router.post("/auth/tokens/refresh", response_model=Token)
+async def refresh_access_token(body: TokenRefresh):
+    payload = await _refresh_claims(body.refresh_token)
+    # rotation: the presented token is revoked atomically, so a replayed copy is rejected
+    if not await _revoke(payload):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Refresh token revoked")
+    return _issue_tokens(payload["sub"])
+
+@router.post("/auth/tokens/revoke", status_code=status.HTTP_204_NO_CONTENT)
+async def revoke_refresh_token(body: TokenRefresh):
+    await _revoke(await _refresh_claims(body.refresh_token))
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
 
 @router.post("/users", response_model=UserResponse, response_model_exclude_none=True)
+@rate_limit(per_ip=(5, 60))
 async def register_user(user: UserCreate, s: UserService = Depends(svc)):
+    hashed = await hash_password_async(user.password)
     try:
-        hashed = hash_password(user.password)
         return await s.register(username=user.username, password_hash=hashed)
     except ValueError:
         raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Username already registered")
@@ -53,8 +110,14 @@ async def register_user(user: UserCreate, s: UserService = Depends(svc)):
 
 @router.patch("/users/{id}", response_model=UserResponse, response_model_exclude_none=True)
 async def update_user(id: int, user_update: UserCreate, s: UserService = Depends(svc), current_user: dict = Depends(get_current_user)):
+    hashed = await hash_password_async(user_update.password)
+    try:
+        username = (await s.get_or_404(id)).username
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
+    # before the write: if the store is down the change is refused rather than left unenforced
+    await _revoke_subject(username)
     try:
-        hashed = hash_password(user_update.password)
         return await s.update(user_id=id, username=user_update.username, password_hash=hashed)
     except ValueError as e:
         if str(e) == "not_found":
@@ -67,6 +130,11 @@ async def update_user(id: int, user_update: UserCreate, s: UserService = Depends
 
 @router.delete("/users/{id}", response_model=UserResponse, response_model_exclude_none=True)
 async def delete_user(id: int, s: UserService = Depends(svc), current_user: dict = Depends(get_current_user)):
+    try:
+        username = (await s.get_or_404(id)).username
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
+    await _revoke_subject(username)
     try:
         return await s.delete(user_id=id)
     except ValueError:
@@ -92,36 +160,93 @@ class UserEventIn(BaseModel):
             raise ValueError('rating must be 1..5 when event="rate"')
         return self
 
+class UserEventBatchIn(BaseModel):
+    events: List[UserEventIn] = Field(..., min_length=1)
+
+    @field_validator("events", mode="before")
+    @classmethod
+    def _batch_size(cls, v):
+        # checked before the items are validated; the limit is read per request, not at import
+        if isinstance(v, list) and len(v) > settings.EVENTS_BATCH_MAX_ITEMS:
+            raise ValueError(f"at most {settings.EVENTS_BATCH_MAX_ITEMS} events per batch")
+        return v
+
+def _event_row(username: str, e: UserEventIn) -> dict:
+    return {"username": username, "book_id": e.book_id, "event": e.event, "rating": e.rating, "created_at": datetime.now(timezone.utc)}
+
+def _queue_full() -> HTTPException:
+    return HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Event queue is full, retry later", headers={"Retry-After": "1"})
+
 @router.post("/users/me/events", status_code=status.HTTP_204_NO_CONTENT)
-async def add_user_event(payload: UserEventIn = Body(...), db: AsyncSession = Depends(get_session), current_user: dict = Depends(get_current_user)):
+async def add_user_event(background: BackgroundTasks, payload: UserEventIn = Body(...), db: AsyncSession = Depends(get_session), current_user: dict = Depends(get_current_user)):
     username = current_user.get("sub")
     if not username:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
-    if not (await db.execute(select(Book.id).where(Book.id == payload.book_id))).scalar():
+    if not await book_exists(db, payload.book_id):
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Book not found")
+    buffer = get_event_buffer()
+    if buffer is not None:
+        # invalidated (and warmed, with RECS_WARM_ON_EVENT) by the flusher once the event is written
+        if not buffer.offer([_event_row(username, payload)]):
+            raise _queue_full()
+        return Response(status_code=status.HTTP_204_NO_CONTENT)
     evt = UserBookEvent(username=username, book_id=payload.book_id, event=payload.event, rating=payload.rating)
     try:
         db.add(evt)
         await db.commit()
-        return Response(status_code=status.HTTP_204_NO_CONTENT)
+    except IntegrityError:
+        # the bitmap still had a book another worker deleted
+        await db.rollback()
+        await confirm_book_ids(db, [payload.book_id])
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Book not found")
     except Exception:
         await db.rollback()
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Failed to record event")
+    EVENTS_INGESTED.inc(path="direct")
+    get_rec_cache().bump(username)
+    if settings.RECS_WARM_ON_EVENT:
+        background.add_task(warm_user_recommendations, username)
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
+
+@router.post("/users/me/events/batch", status_code=status.HTTP_202_ACCEPTED)
+@rate_limit(cost=5)
+async def add_user_events_batch(response: Response, background: BackgroundTasks, payload: UserEventBatchIn = Body(...), db: AsyncSession = Depends(get_session), current_user: dict = Depends(get_current_user)):
+    """202 when the events were queued for the write-behind flusher, 201 when they were written before returning."""
+    username = current_user.get("sub")
+    if not username:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
+    wanted = {e.book_id for e in payload.events}
+    existing = await existing_book_ids(db, wanted)
+    rows = [_event_row(username, e) for e in payload.events if e.book_id in existing]
+    buffer = get_event_buffer()
+    if buffer is not None:
+        if not buffer.offer(rows):
+            raise _queue_full()
+    else:
+        try:
+            try:
+                await insert_events(db, rows)
+                await db.commit()
+            except IntegrityError:
+                # a book deleted by another worker was still in the bitmap; ask the DB and retry once
+                await db.rollback()
+                existing = await confirm_book_ids(db, existing)
+                rows = [r for r in rows if r["book_id"] in existing]
+                await insert_events(db, rows)
+                await db.commit()
+        except Exception:
+            await db.rollback()
+            raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Failed to record events")
+        EVENTS_INGESTED.inc(len(rows), path="direct")
+        get_rec_cache().bump(username)
+        if settings.RECS_WARM_ON_EVENT and rows:
+            background.add_task(warm_user_recommendations, username)
+        response.status_code = status.HTTP_201_CREATED
+    return {"accepted": len(rows), "unknown_book_ids": sorted(wanted - existing)}
 
 @router.get("/users/me/recommendations", response_model=List[BookResponse], response_model_exclude_none=True)
 async def my_recommendations(limit: int = Query(10, ge=1, le=50), db: AsyncSession = Depends(get_session), current_user: dict = Depends(get_current_user)):
     username = current_user.get("sub")
     if not username:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
-    rows = await recommend_for_user(db, username=username, limit=limit)
-    return [
-        BookResponse(
-            id=b.id,
-            title=b.title,
-            genre=b.genre,
-            published_year=b.published_year,
-            author_name=b.author.name if b.author else None,
-            isbn=b.isbn,
-        )
-        for b in rows
-    ]
+    return await cached_recommend_for_user(db, username=username, limit=limit)
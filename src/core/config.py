@@ -1,5 +1,7 @@
+from functools import lru_cache
 from pydantic_settings import BaseSettings, SettingsConfigDict
 from pydantic import Field
+from typing import Optional
 
 class Settings(BaseSettings):
     POSTGRES_USER: str
@@ -8,9 +10,43 @@ class Settings(BaseSettings):
     POSTGRES_HOST: str
     POSTGRES_PORT: int
 
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT_SEC: float = 10.0
+    DB_POOL_RECYCLE_SEC: int = 1800
+    DB_PRE_PING: str = "idle"
+    DB_PRE_PING_IDLE_SEC: float = 30.0
+    DB_STATEMENT_CACHE_SIZE: int = 100
+    DB_REPLICA_URLS: str = ""
+    DB_REPLICA_HEALTH_SEC: float = 5.0
+    DB_SLOW_QUERY_MS: float = 200.0
+    DB_SLOW_QUERY_EXPLAIN: bool = False
+    SERVER_TIMING_ENABLED: bool = True
+    DB_N_PLUS_ONE_THRESHOLD: int = 0
+    METRICS_MULTIPROC_DIR: str = ""
+    METRICS_FLUSH_SEC: float = 1.0
+    PROFILE_ENABLED: bool = False
+    PROFILE_DIR: str = "/data/profiles"
+    PROFILE_TOKEN: str = ""
+    PROFILE_SAMPLE_RATE: float = 0.0
+    PROFILE_INTERVAL_MS: float = 5.0
+    PROFILE_FORMAT: str = "speedscope"
+    PROFILE_BLOCK_MS: float = 0.0
+    PROFILE_MAX_CONCURRENT: int = 4
+    LOOP_MONITOR_ENABLED: bool = True
+    LOOP_MONITOR_INTERVAL_MS: float = 50.0
+    LOOP_LAG_THRESHOLD_MS: float = 100.0
+
     SECRET_KEY: str
     ALGORITHM: str
     ACCESS_TOKEN_EXPIRE_MINUTES: int
+    AUTH_HASH_WORKERS: int = 4
+    AUTH_HASH_MAX_PENDING: int = 64
+    REFRESH_TOKEN_EXPIRE_MINUTES: int = 60 * 24 * 7
+    AUTH_REVOCATION_BACKEND: str = "redis"
+    AUTH_REDIS_URL: str = "redis://redis:6379/2"
+    AUTH_TOKEN_CACHE_SIZE: int = 10_000
+    AUTH_TOKEN_CACHE_MAX_TTL_SEC: float = 300.0
 
 
     EXPORT_DIR: str = "/data/out"
@@ -19,6 +55,43 @@ class Settings(BaseSettings):
     RATE_LIMIT_REQUESTS: int = 100
     RATE_LIMIT_WINDOW_SEC: int = 60
     RATE_LIMIT_REDIS_URL: str = "redis://redis:6379/1"
+    RATE_LIMIT_BACKEND: str = "redis"
+    RATE_LIMIT_USER_REQUESTS: int = 300
+    RATE_LIMIT_USER_WINDOW_SEC: int = 60
+    RATE_LIMIT_REDIS_MAX_CONNECTIONS: int = 50
+    RATE_LIMIT_REDIS_TIMEOUT_SEC: float = 0.1
+
+    ADMISSION_ENABLED: bool = True
+    ADMISSION_TARGET_LATENCY_MS: float = 250
+    ADMISSION_QUEUE_TIMEOUT_MS: float = 500
+    ADMISSION_INITIAL_LIMIT: int = 50
+    ADMISSION_MIN_LIMIT: int = 4
+    ADMISSION_MAX_LIMIT: int = 500
+    ADMISSION_MAX_QUEUE: int = 100
+
+    RECS_CACHE_MAXSIZE: int = 10_000
+    RECS_CACHE_TTL_SEC: float = 60.0
+    RECS_WARM_ON_EVENT: bool = False
+
+    EVENTS_WRITE_BEHIND: bool = False
+    EVENTS_QUEUE_MAX: int = 10_000
+    EVENTS_BATCH_SIZE: int = 500
+    EVENTS_FLUSH_MS: int = 200
+    EVENTS_FLUSH_RETRIES: int = 3
+    EVENTS_SPILL_DIR: Optional[str] = None
+    EVENTS_BATCH_MAX_ITEMS: int = 500
+    EVENTS_PARTITIONS_AHEAD: int = 3
+    EVENTS_RETENTION_MONTHS: int = 0
+    EVENTS_ARCHIVE_SCHEMA: Optional[str] = None
+    RECS_EVENTS_WINDOW_DAYS: int = 180
+
+    BOOK_IDS_RESYNC_SEC: float = 300.0
+
+    CONTENT_INDEX_DIM: int = 256
+    CONTENT_INDEX_TTL_SEC: float = 600.0
+    CONTENT_INDEX_SNAPSHOT_DIR: Optional[str] = None
+    CONTENT_INDEX_IVF_MIN_BOOKS: int = 20_000
+    CONTENT_INDEX_IVF_PROBES: int = 8
 
     model_config = SettingsConfigDict(
         env_file=".env",
@@ -42,8 +115,32 @@ class Settings(BaseSettings):
             f"{self.POSTGRES_PORT}/{self.POSTGRES_DB}"
         )
 
+    @property
+    def REPLICA_DATABASE_URLS(self) -> list[str]:
+        return [u.strip() for u in self.DB_REPLICA_URLS.split(",") if u.strip()]
+
     @property
     def DATABASE_URL(self) -> str:
         return self.SYNC_DATABASE_URL
 
-settings = Settings()
+@lru_cache(maxsize=None)
+def get_settings() -> Settings:
+    return Settings()
+
+class _LazySettings:
+    """Stands in for Settings; the environment is read on the first attribute access.
+
+    `from src.core.config import settings` is therefore free at import time, and a
+    module-level `settings.X` is what still pulls the environment in early.
+    """
+
+    def __getattr__(self, name):
+        return getattr(get_settings(), name)
+
+    def __setattr__(self, name, value):
+        setattr(get_settings(), name, value)
+
+    def __delattr__(self, name):
+        delattr(get_settings(), name)
+
+settings = _LazySettings()
@@ -0,0 +1,71 @@
+from __future__ import annotations
+
+import logging
+from typing import Optional
+
+from src.core.loop_watchdog import LoopWatchdog, Stack, format_stack, get_loop_watchdog
+from src.core.metrics import Counter, Histogram
+
+log = logging.getLogger(__name__)
+
+LOOP_LAG = Histogram(
+    "event_loop_lag_seconds",
+    "How late the event loop ran a timer it was asked to run: time the loop spent blocked.",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0),
+)
+LOOP_STALLS = Counter("event_loop_stalls_total", "Event-loop stalls longer than LOOP_LAG_THRESHOLD_MS.")
+
+
+class LoopMonitor:
+    """Records event-loop scheduling delay and logs whatever blocked the loop.
+
+    Every heartbeat of the shared `LoopWatchdog` is observed in LOOP_LAG; a heartbeat
+    late by `threshold` or more is logged as a stall, with the loop thread's stack if
+    the watchdog caught it while the blocking code was still running.
+    """
+
+    def __init__(self, interval: float, threshold: float, max_frames: int = 30):
+        self.interval = interval
+        self.threshold = threshold
+        self.max_frames = max_frames
+        self._watchdog: Optional[LoopWatchdog] = None
+
+    def start(self) -> None:
+        self._watchdog = get_loop_watchdog()
+        self._watchdog.subscribe(self._on_beat, self.interval, self.threshold)
+
+    async def stop(self) -> None:
+        if self._watchdog is not None:
+            self._watchdog.unsubscribe(self._on_beat)
+            self._watchdog = None
+
+    def _on_beat(self, lag: float, stack: Stack) -> None:
+        LOOP_LAG.observe(lag)
+        if lag >= self.threshold:
+            self._report(lag, stack[-self.max_frames:])
+
+    def _report(self, lag: float, stack: Stack) -> None:
+        LOOP_STALLS.inc()
+        log.warning(
+            "event loop blocked for %.0f ms%s",
+            lag * 1000,
+            f"; it was running:\n{format_stack(stack)}" if stack else " (too short to catch the stack)",
+            extra={"loop_lag_ms": round(lag * 1000, 1), "loop_blocked_in": stack[-1][0] if stack else None},
+        )
+
+
+_monitor: Optional[LoopMonitor] = None
+
+
+def start_loop_monitor(interval_ms: float, threshold_ms: float) -> LoopMonitor:
+    global _monitor
+    _monitor = LoopMonitor(interval_ms / 1000, threshold_ms / 1000)
+    _monitor.start()
+    return _monitor
+
+
+async def stop_loop_monitor() -> None:
+    global _monitor
+    if _monitor is not None:
+        await _monitor.stop()
+        _monitor = None
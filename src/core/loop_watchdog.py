@@ -0,0 +1,126 @@
+from __future__ import annotations
+
+import asyncio
+import sys
+import threading
+import time
+from types import FrameType
+from typing import Callable, Dict, List, Optional, Tuple
+
+Frame = Tuple[str, str, int]  # qualname, filename, first line
+Stack = Tuple[Frame, ...]  # outermost first
+Listener = Callable[[float, Stack], None]
+
+
+def frame_stack(frame: Optional[FrameType], limit: int = 128) -> Stack:
+    frames: List[Frame] = []
+    while frame is not None and len(frames) < limit:
+        code = frame.f_code
+        frames.append((getattr(code, "co_qualname", code.co_name), code.co_filename, code.co_firstlineno))
+        frame = frame.f_back
+    frames.reverse()
+    return tuple(frames)
+
+
+def format_stack(stack: Stack) -> str:
+    return "\n".join(f"  {name} ({filename}:{line})" for name, filename, line in stack)
+
+
+class LoopWatchdog:
+    """Measures how late the event loop runs a heartbeat and catches whatever blocks it.
+
+    A heartbeat callback on the loop is scheduled every `interval` seconds. A watchdog
+    thread notices when it is overdue by more than `threshold` and grabs the loop
+    thread's stack while the blocking code is still running. Each heartbeat then calls
+    every listener, on the loop, with its lag and the stack caught during that lag
+    (empty if the stall was too short to catch).
+
+    One per loop (see `get_loop_watchdog`), shared by the loop monitor and the request
+    profiler. Listeners subscribe with the interval and threshold they need; the
+    smallest of each is used, and the heartbeat and thread stop with the last listener.
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop):
+        self.loop = loop
+        self.loop_thread = threading.get_ident()  # constructed on the loop thread
+        self.interval = 0.0
+        self.threshold = 0.0
+        self.due = time.perf_counter()  # when the pending heartbeat should run
+        self._stall: Tuple[float, Stack] = (0.0, ())  # (heartbeat due time it was late after, stack)
+        self._listeners: Dict[Listener, Tuple[float, float]] = {}
+        self._handle: Optional[asyncio.TimerHandle] = None
+        self._stopped: Optional[threading.Event] = None
+
+    # loop thread ----------------------------------------------------------
+
+    def subscribe(self, listener: Listener, interval: float, threshold: float) -> None:
+        self._listeners[listener] = (interval, threshold)
+        self._tune()
+        if self._stopped is None:
+            self._stopped = threading.Event()
+            threading.Thread(target=self._watch, args=(self._stopped,), name="loop-watchdog", daemon=True).start()
+
+    def unsubscribe(self, listener: Listener) -> None:
+        if self._listeners.pop(listener, None) is None:
+            return
+        if self._listeners:
+            self._tune()
+            return
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+        if self._stopped is not None:
+            self._stopped.set()
+            self._stopped = None
+
+    def pending(self) -> Tuple[float, Stack]:
+        """Lag of the heartbeat not yet run, with its stack: a stall that just ended but is not reported yet."""
+        return max(0.0, time.perf_counter() - self.due), self._stack_for(self.due)
+
+    def _tune(self) -> None:
+        interval = min(i for i, _ in self._listeners.values())
+        self.threshold = min(t for _, t in self._listeners.values())
+        if self._handle is None or interval < self.interval:
+            # (re)schedule so a heartbeat already queued at a longer interval is not counted as late
+            if self._handle is not None:
+                self._handle.cancel()
+            self.due = time.perf_counter() + interval
+            self._handle = self.loop.call_later(interval, self._beat)
+        self.interval = interval
+
+    def _stack_for(self, due: float) -> Stack:
+        since, stack = self._stall
+        return stack if since == due else ()
+
+    def _beat(self) -> None:
+        now = time.perf_counter()
+        lag = max(0.0, now - self.due)
+        stack = self._stack_for(self.due)
+        self.due = now + self.interval
+        self._handle = self.loop.call_later(self.interval, self._beat)
+        for listener in list(self._listeners):
+            listener(lag, stack)
+
+    # watchdog thread ------------------------------------------------------
+
+    def _watch(self, stopped: threading.Event) -> None:
+        while not stopped.wait(max(self.threshold / 2, 0.001)):
+            due = self.due
+            if time.perf_counter() - due > self.threshold and self._stall[0] != due:
+                frame = sys._current_frames().get(self.loop_thread)
+                self._stall = (due, frame_stack(frame))
+                del frame
+
+
+_watchdog: Optional[LoopWatchdog] = None
+
+
+def get_loop_watchdog() -> LoopWatchdog:
+    """The watchdog for the running loop, created on first use."""
+    global _watchdog
+    loop = asyncio.get_running_loop()
+    if _watchdog is None or _watchdog.loop is not loop:
+        if _watchdog is not None and _watchdog._stopped is not None:
+            _watchdog._stopped.set()  # left running by a loop that has gone away
+        _watchdog = LoopWatchdog(loop)
+    return _watchdog
@@ -0,0 +1,284 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import math
+import os
+import uuid
+from bisect import bisect_left
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+LabelValues = Tuple[str, ...]
+
+
+class Counter:
+    """Monotonic counter, optionally split by label values.
+
+    Updates are plain dict writes: no locks, since each worker process owns its
+    metrics and the event loop is single-threaded. Multiple workers are merged
+    at scrape time from per-process snapshots (see `Registry.render_multiprocess`).
+    """
+
+    kind = "counter"
+    multiprocess_mode = "sum"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames: Tuple[str, ...] = tuple(labelnames)
+        self._values: Dict[LabelValues, float] = {}
+        REGISTRY.register(self)
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = tuple(str(labels[n]) for n in self.labelnames)
+        self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(tuple(str(labels[n]) for n in self.labelnames), 0.0)
+
+    def samples(self) -> List[Tuple[str, LabelValues, float]]:
+        return [(self.name, k, v) for k, v in self._values.items()]
+
+    def sample_labelnames(self, sample_name: str) -> Tuple[str, ...]:
+        return self.labelnames
+
+
+class Gauge(Counter):
+    """Value that can go up and down.
+
+    Across workers, gauges of live processes are summed, or with
+    `multiprocess_mode="max"` the largest one is reported.
+    """
+
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (), multiprocess_mode: str = "sum"):
+        super().__init__(name, documentation, labelnames)
+        self.multiprocess_mode = multiprocess_mode
+
+    def set(self, value: float, **labels: str) -> None:
+        self._values[tuple(str(labels[n]) for n in self.labelnames)] = float(value)
+
+    def dec(self, amount: float = 1.0, **labels: str) -> None:
+        self.inc(-amount, **labels)
+
+
+class CallbackGauge(Counter):
+    """Gauge whose samples are read from `callback` at scrape time."""
+
+    kind = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Iterable[str],
+        callback: Callable[[], Dict[LabelValues, float]],
+        multiprocess_mode: str = "sum",
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.callback = callback
+        self.multiprocess_mode = multiprocess_mode
+
+    def samples(self) -> List[Tuple[str, LabelValues, float]]:
+        self._values = self.callback()
+        return super().samples()
+
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram(Counter):
+    """Observations counted into cumulative `le` buckets, plus their sum and count."""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (), buckets: Iterable[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets: Tuple[float, ...] = tuple(sorted(buckets))
+        # per label set: a count for each bucket and +Inf (not cumulative), then the sum
+        self._series: Dict[LabelValues, List[float]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = tuple(str(labels[n]) for n in self.labelnames)
+        series = self._series.get(key)
+        if series is None:
+            series = self._series[key] = [0] * (len(self.buckets) + 1) + [0.0]
+        series[bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def value(self, **labels: str) -> float:
+        series = self._series.get(tuple(str(labels[n]) for n in self.labelnames))
+        return sum(series[:-1]) if series else 0
+
+    def samples(self) -> List[Tuple[str, LabelValues, float]]:
+        out: List[Tuple[str, LabelValues, float]] = []
+        bounds = [_num(b) for b in self.buckets] + ["+Inf"]
+        for key, series in self._series.items():
+            cumulative = 0
+            for bound, n in zip(bounds, series):
+                cumulative += n
+                out.append((f"{self.name}_bucket", key + (bound,), cumulative))
+            out.append((f"{self.name}_sum", key, series[-1]))
+            out.append((f"{self.name}_count", key, cumulative))
+        return out
+
+    def sample_labelnames(self, sample_name: str) -> Tuple[str, ...]:
+        return self.labelnames + ("le",) if sample_name.endswith("_bucket") else self.labelnames
+
+
+class Registry:
+    def __init__(self) -> None:
+        self._metrics: Dict[str, Counter] = {}
+
+    def register(self, metric: Counter) -> None:
+        if metric.name in self._metrics:
+            raise ValueError(f"metric {metric.name!r} already registered")
+        self._metrics[metric.name] = metric
+
+    def render(self) -> str:
+        """Prometheus text exposition format."""
+        return _render(self.snapshot())
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        return [
+            {
+                "name": m.name,
+                "doc": m.documentation,
+                "kind": m.kind,
+                "mode": m.multiprocess_mode,
+                "samples": [(name, m.sample_labelnames(name), key, value) for name, key, value in m.samples()],
+            }
+            for m in self._metrics.values()
+        ]
+
+    def write_snapshot(self, directory: str, snapshot: Optional[List[Dict[str, Any]]] = None) -> None:
+        """Publish this process's metrics as `<directory>/<pid>-<nonce>.json` (atomically replaced).
+
+        The nonce is drawn once per process, so a new worker that is handed a
+        dead worker's pid gets a file of its own instead of overwriting (and
+        shrinking) the totals the dead one left behind.
+        """
+        path = os.path.join(directory, f"{_instance_id()}.json")
+        tmp = f"{path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.snapshot() if snapshot is None else snapshot, f, separators=(",", ":"))
+        os.replace(tmp, path)
+
+    def render_multiprocess(self, directory: str, snapshot: Optional[List[Dict[str, Any]]] = None) -> str:
+        """Merge the snapshots of every worker sharing `directory`.
+
+        Counters and histograms are summed over all files, including workers that
+        have exited, so totals never go backwards while the directory lives; gauges
+        only over live workers. The directory must start empty with each
+        deployment (see `clear_multiprocess_dir`). Does file I/O: pass a
+        `snapshot` taken on the event loop and run this in a thread.
+        """
+        self.write_snapshot(directory, snapshot)
+        merged: Dict[str, Dict[str, Any]] = {}
+        for fname in os.listdir(directory):
+            if not fname.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(directory, fname)) as f:
+                    metrics = json.load(f)
+            except (OSError, ValueError):
+                continue  # being replaced or removed right now
+            pid = fname[:-5].split("-", 1)[0]
+            alive = _alive(int(pid)) if pid.isdigit() else False
+            for m in metrics:
+                if m["kind"] == "gauge" and not alive:
+                    continue
+                into = merged.setdefault(m["name"], {**m, "values": {}})
+                values = into["values"]
+                for name, labelnames, key, value in m["samples"]:
+                    k = (name, tuple(labelnames), tuple(key))
+                    if k not in values:
+                        values[k] = value
+                    elif m["mode"] == "max":
+                        values[k] = max(values[k], value)
+                    else:
+                        values[k] += value
+        for m in merged.values():
+            m["samples"] = [(name, labelnames, key, value) for (name, labelnames, key), value in m.pop("values").items()]
+        return _render(list(merged.values()))
+
+
+def _render(metrics: Iterable[Dict[str, Any]]) -> str:
+    lines: List[str] = []
+    for m in metrics:
+        lines.append(f"# HELP {m['name']} {m['doc']}")
+        lines.append(f"# TYPE {m['name']} {m['kind']}")
+        for name, labelnames, key, value in m["samples"]:
+            lines.append(f"{name}{_labels(tuple(labelnames), tuple(key))} {_num(value)}")
+    return "\n".join(lines) + "\n"
+
+
+_instance: Optional[Tuple[int, str]] = None
+
+
+def _instance_id() -> str:
+    # redrawn after a fork: a pre-forked worker must not share its parent's nonce
+    global _instance
+    if _instance is None or _instance[0] != os.getpid():
+        _instance = (os.getpid(), uuid.uuid4().hex[:12])
+    return f"{_instance[0]}-{_instance[1]}"
+
+
+def clear_multiprocess_dir(directory: str) -> None:
+    """Remove every worker snapshot; run once before the workers of a deployment start."""
+    os.makedirs(directory, exist_ok=True)
+    for fname in os.listdir(directory):
+        if fname.endswith((".json", ".json.tmp")):
+            try:
+                os.remove(os.path.join(directory, fname))
+            except FileNotFoundError:
+                pass
+
+
+def _alive(pid: int) -> bool:
+    if pid == os.getpid():
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _labels(names: Tuple[str, ...], values: LabelValues) -> str:
+    if not names:
+        return ""
+    inner = ",".join(f'{n}="{_escape(v)}"' for n, v in zip(names, values))
+    return "{" + inner + "}"
+
+
+def _escape(v: str) -> str:
+    return v.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _num(v: float) -> str:
+    if math.isinf(v):
+        return "+Inf" if v > 0 else "-Inf"
+    return str(int(v)) if float(v).is_integer() else repr(v)
+
+
+REGISTRY = Registry()
+
+
+
+async def write_snapshots_forever(directory: str, interval: float) -> None:
+    while True:
+        await asyncio.sleep(interval)
+        # snapshot on the loop, where the metrics are updated; write the file off it
+        await asyncio.to_thread(REGISTRY.write_snapshot, directory, REGISTRY.snapshot())
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Clear a METRICS_MULTIPROC_DIR before starting the workers.")
+    parser.add_argument("--clear", metavar="DIR", required=True)
+    clear_multiprocess_dir(parser.parse_args().clear)
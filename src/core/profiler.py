@@ -0,0 +1,194 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+from src.core.loop_watchdog import Frame, Stack, format_stack, frame_stack, get_loop_watchdog
+
+# asyncio's own "task running on each loop" map; read from the sampler thread to
+# attribute samples to the profiled request rather than whatever else is running
+_current_tasks: Optional[Dict] = getattr(asyncio.tasks, "_current_tasks", None)
+
+
+class Profile:
+    """Stack samples (and loop-blocking intervals) collected for one request."""
+
+    __slots__ = ("name", "started", "elapsed", "stacks", "blocks")
+
+    def __init__(self, name: str):
+        self.name = name
+        self.started = time.perf_counter()
+        self.elapsed = 0.0
+        self.stacks: Counter[Stack] = Counter()
+        self.blocks: List[Tuple[float, Stack]] = []
+
+    @property
+    def samples(self) -> int:
+        return sum(self.stacks.values())
+
+    def collapsed(self) -> str:
+        """Brendan Gregg's folded format, for flamegraph.pl / speedscope / inferno."""
+        return "".join(
+            ";".join(f"{name} ({os.path.basename(filename)}:{line})" for name, filename, line in stack) + f" {n}\n"
+            for stack, n in self.stacks.most_common()
+        )
+
+    def speedscope(self, interval: float) -> dict:
+        index: Dict[Frame, int] = {}
+        frames: List[dict] = []
+        samples: List[List[int]] = []
+        weights: List[float] = []
+        for stack, n in self.stacks.items():
+            ids = []
+            for frame in stack:
+                i = index.get(frame)
+                if i is None:
+                    i = index[frame] = len(frames)
+                    frames.append({"name": frame[0], "file": frame[1], "line": frame[2]})
+                ids.append(i)
+            samples.append(ids)
+            weights.append(n * interval * 1000)
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "name": self.name,
+            "exporter": "book-api request profiler",
+            "shared": {"frames": frames},
+            "profiles": [
+                {
+                    "type": "sampled",
+                    "name": self.name,
+                    "unit": "milliseconds",
+                    "startValue": 0,
+                    "endValue": sum(weights),
+                    "samples": samples,
+                    "weights": weights,
+                }
+            ],
+        }
+
+    def write(self, directory: str, fmt: str, interval: float) -> str:
+        os.makedirs(directory, exist_ok=True)
+        if fmt == "collapsed":
+            path = os.path.join(directory, f"{self.name}.collapsed.txt")
+            with open(path, "w") as f:
+                f.write(self.collapsed())
+        else:
+            path = os.path.join(directory, f"{self.name}.speedscope.json")
+            with open(path, "w") as f:
+                json.dump(self.speedscope(interval), f)
+        if self.blocks:
+            with open(os.path.join(directory, f"{self.name}.blocks.txt"), "w") as f:
+                for duration, stack in self.blocks:
+                    f.write(f"event loop blocked for {duration * 1000:.1f} ms in:\n{format_stack(stack)}\n\n")
+        return path
+
+
+class Sampler(threading.Thread):
+    """Samples the event-loop thread's stack every `interval` seconds while profiles are active.
+
+    A sample is credited to a profile only while that request's task is the one
+    running on the loop. With `block_threshold` set, the sampler also listens to the
+    shared loop watchdog while profiles are active and records each stall longer than
+    the threshold, with the stack the watchdog caught, in every profile active when it
+    ends (whichever request blocked, they all waited).
+    Code the request runs in worker threads (run_in_executor) is not sampled.
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, interval: float, block_threshold: float = 0.0):
+        super().__init__(name="request-profiler", daemon=True)
+        self.loop = loop
+        self.loop_thread = threading.get_ident()  # constructed on the loop thread
+        self.interval = interval
+        self.block_threshold = block_threshold
+        self.active: Dict[asyncio.Task, Profile] = {}
+        self._watchdog = get_loop_watchdog() if block_threshold else None
+        self._wake = threading.Event()
+        self._stopped = False
+
+    # loop thread ----------------------------------------------------------
+
+    def add(self, task: asyncio.Task, profile: Profile) -> None:
+        if self._watchdog is not None and not self.active:
+            self._watchdog.subscribe(self._on_beat, self.interval, self.block_threshold)
+        self.active[task] = profile
+        self._wake.set()
+
+    def remove(self, task: asyncio.Task) -> Optional[Profile]:
+        profile = self.active.pop(task, None)
+        if profile is not None:
+            if self._watchdog is not None:
+                # a stall this request ended with has not reached a heartbeat yet
+                self._record_stall([profile], *self._watchdog.pending())
+                if not self.active:
+                    self._watchdog.unsubscribe(self._on_beat)
+            profile.elapsed = time.perf_counter() - profile.started
+            profile.stacks = Counter(profile.stacks)  # detach from a sample the thread may still be adding
+        return profile
+
+    def _on_beat(self, lag: float, stack: Stack) -> None:
+        self._record_stall(list(self.active.values()), lag, stack)
+
+    def _record_stall(self, profiles: List[Profile], lag: float, stack: Stack) -> None:
+        if lag > self.block_threshold:
+            for profile in profiles:
+                profile.blocks.append((lag, stack))
+
+    def stop(self) -> None:
+        self._stopped = True
+        if self._watchdog is not None:
+            self._watchdog.unsubscribe(self._on_beat)
+        self._wake.set()
+
+    # sampler thread -------------------------------------------------------
+
+    def run(self) -> None:
+        while not self._stopped:
+            if not self.active:
+                self._wake.clear()
+                if not self.active:
+                    self._wake.wait()
+                continue
+            time.sleep(self.interval)
+            profile = self._running_profile()
+            if profile is None:
+                continue
+            frame = sys._current_frames().get(self.loop_thread)
+            if frame is None:
+                continue
+            profile.stacks[frame_stack(frame)] += 1
+            del frame
+
+    def _running_profile(self) -> Optional[Profile]:
+        if _current_tasks is None:
+            # no way to tell which task is running: credit the only profile, if any
+            return next(iter(self.active.values())) if len(self.active) == 1 else None
+        task = _current_tasks.get(self.loop)
+        return self.active.get(task) if task is not None else None
+
+
+_sampler: Optional[Sampler] = None
+
+
+def get_sampler(interval: float, block_threshold: float = 0.0) -> Sampler:
+    """The process-wide sampler for the running loop, started on first use."""
+    global _sampler
+    loop = asyncio.get_running_loop()
+    if _sampler is None or _sampler.loop is not loop or not _sampler.is_alive():
+        if _sampler is not None:
+            _sampler.stop()
+        _sampler = Sampler(loop, interval, block_threshold)
+        _sampler.start()
+    return _sampler
+
+
+def stop_sampler() -> None:
+    global _sampler
+    if _sampler is not None:
+        _sampler.stop()
+        _sampler = None
@@ -1,16 +1,85 @@
-import os
+from typing import Optional, Tuple
+
 from redis.asyncio import Redis
-RATE_REDIS_URL = os.getenv("RATE_LIMIT_REDIS_URL", "redis://redis:6379/1")
-_redis: Redis | None = None
 
-async def get_rate_redis() -> Redis:
+from src.core.config import settings
+
+_redis: Optional[Redis] = None
+
+# GCRA: one key per client holding its theoretical arrival time (TAT) in microseconds.
+# Redis' own clock is used so every app worker agrees on "now".
+# Returns {allowed, remaining, retry_after_ms, reset_ms}.
+GCRA_LUA = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) * 1000000 + tonumber(t[2])
+local interval = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3] or 1)
+local tat = tonumber(redis.call('GET', KEYS[1]) or now)
+if tat < now then tat = now end
+local new_tat = tat + interval * cost
+if new_tat - burst > now then
+    return {0, 0, math.ceil((new_tat - burst - now) / 1000), math.ceil((tat - now) / 1000)}
+end
+redis.call('SET', KEYS[1], new_tat, 'PX', math.ceil((new_tat - now) / 1000))
+return {1, math.floor((burst - (new_tat - now)) / interval), 0, math.ceil((new_tat - now) / 1000)}
+"""
+
+# Undo a charge GCRA_LUA allowed. Subtracting from whatever the TAT is now stays
+# correct when other workers have charged the key since.
+GCRA_REFUND_LUA = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) * 1000000 + tonumber(t[2])
+local tat = tonumber(redis.call('GET', KEYS[1]))
+if not tat then return 0 end
+tat = tat - tonumber(ARGV[1]) * tonumber(ARGV[2] or 1)
+if tat <= now then
+    redis.call('DEL', KEYS[1])
+else
+    redis.call('SET', KEYS[1], tat, 'PX', math.ceil((tat - now) / 1000))
+end
+return 1
+"""
+
+
+def get_rate_redis() -> Redis:
     global _redis
     if _redis is None:
-        _redis = Redis.from_url(RATE_REDIS_URL, encoding="utf-8", decode_responses=True)
+        # short timeouts: the limiter fails open rather than stall requests on a slow Redis
+        _redis = Redis.from_url(
+            settings.RATE_LIMIT_REDIS_URL,
+            encoding="utf-8",
+            decode_responses=True,
+            max_connections=settings.RATE_LIMIT_REDIS_MAX_CONNECTIONS,
+            socket_timeout=settings.RATE_LIMIT_REDIS_TIMEOUT_SEC,
+            socket_connect_timeout=settings.RATE_LIMIT_REDIS_TIMEOUT_SEC,
+        )
     return _redis
 
+
 async def close_rate_redis():
     global _redis
     if _redis:
         await _redis.close()
         _redis = None
+
+
+class RedisGCRA:
+    """Cluster-wide limit of `max_requests` per `window_seconds`, one EVALSHA per check."""
+
+    def __init__(self, redis: Redis, max_requests: int, window_seconds: float, prefix: str = "rl:"):
+        self.interval_us = int(window_seconds * 1_000_000 / max_requests)
+        self.burst_us = int(window_seconds * 1_000_000)
+        self.prefix = prefix
+        self._script = redis.register_script(GCRA_LUA)
+        self._refund = redis.register_script(GCRA_REFUND_LUA)
+
+    async def hit(self, key: str, cost: int = 1) -> Tuple[bool, int, float, float]:
+        """(allowed, remaining, retry_after_s, reset_in_s)"""
+        allowed, remaining, retry_ms, reset_ms = await self._script(
+            keys=[self.prefix + key], args=[self.interval_us, self.burst_us, cost]
+        )
+        return bool(allowed), int(remaining), retry_ms / 1000.0, reset_ms / 1000.0
+
+    async def refund(self, key: str, cost: int = 1) -> None:
+        await self._refund(keys=[self.prefix + key], args=[self.interval_us, cost])
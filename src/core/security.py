@@ -1,12 +1,18 @@
+import asyncio
+import hashlib
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Optional, Union
+from typing import Callable, Optional, TypeVar, Union
 
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import jwt, JWTError
 from passlib.context import CryptContext
 
 from src.core.config import settings
+from src.core.metrics import Counter, Gauge
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/v1/users/login")
 
@@ -18,6 +24,40 @@ def hash_password(password: str) -> str:
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
+AUTH_HASH_QUEUE_DEPTH = Gauge("auth_hash_queue_depth", "bcrypt hash/verify calls running or waiting in the auth thread pool.")
+AUTH_HASH_REJECTED = Counter("auth_hash_rejected_total", "bcrypt calls refused because the auth thread pool queue was full.")
+
+T = TypeVar("T")
+_hash_executor: Optional[ThreadPoolExecutor] = None
+_hash_pending = 0
+
+async def _run_in_hash_pool(fn: Callable[..., T], *args) -> T:
+    # bcrypt releases the GIL, so a small dedicated pool keeps it off the event loop
+    # without competing with the default executor used elsewhere
+    global _hash_executor, _hash_pending
+    if _hash_pending >= settings.AUTH_HASH_MAX_PENDING:
+        AUTH_HASH_REJECTED.inc()
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Authentication is busy, retry later",
+            headers={"Retry-After": "1"},
+        )
+    if _hash_executor is None:
+        _hash_executor = ThreadPoolExecutor(max_workers=settings.AUTH_HASH_WORKERS, thread_name_prefix="bcrypt")
+    _hash_pending += 1
+    AUTH_HASH_QUEUE_DEPTH.set(_hash_pending)
+    try:
+        return await asyncio.get_running_loop().run_in_executor(_hash_executor, fn, *args)
+    finally:
+        _hash_pending -= 1
+        AUTH_HASH_QUEUE_DEPTH.set(_hash_pending)
+
+async def hash_password_async(password: str) -> str:
+    return await _run_in_hash_pool(hash_password, password)
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    return await _run_in_hash_pool(verify_password, plain_password, hashed_password)
+
 def _jwt_encode(data: dict, expires_minutes: int) -> str:
     to_encode = data.copy()
     expire = datetime.utcnow() + timedelta(minutes=expires_minutes)
@@ -33,16 +73,94 @@ def create_access_token(data: dict, expires_delta: Optional[Union[int, timedelta
         minutes = settings.ACCESS_TOKEN_EXPIRE_MINUTES
     return _jwt_encode(data, minutes)
 
+AUTH_TOKEN_CACHE_REQUESTS = Counter(
+    "auth_token_cache_requests_total",
+    "Verified-token cache lookups by result.",
+    labelnames=("result",),
+)
+
+class VerifiedTokenCache:
+    """LRU of decoded access-token payloads keyed by a digest of the token.
+
+    An entry lives until the token's own `exp` (capped at `max_ttl_seconds`),
+    so a cached token is never accepted past the point `jwt.decode` would
+    have rejected it. Access tokens are not revocable: renaming or deleting
+    a user does not invalidate tokens already issued, cached or not.
+    """
+
+    def __init__(self, maxsize: int = 10_000, max_ttl_seconds: float = 300.0):
+        self.maxsize = maxsize
+        self.max_ttl_seconds = max_ttl_seconds
+        self._entries: OrderedDict[bytes, tuple[dict, float]] = OrderedDict()
+
+    @staticmethod
+    def _key(token: str) -> bytes:
+        return hashlib.sha256(token.encode()).digest()
+
+    def get(self, token: str) -> Optional[dict]:
+        key = self._key(token)
+        entry = self._entries.get(key)
+        if entry is not None:
+            if entry[1] > time.time():
+                self._entries.move_to_end(key)
+                AUTH_TOKEN_CACHE_REQUESTS.inc(result="hit")
+                return entry[0]
+            del self._entries[key]
+        AUTH_TOKEN_CACHE_REQUESTS.inc(result="miss")
+        return None
+
+    def put(self, token: str, payload: dict) -> None:
+        if self.maxsize <= 0:
+            return
+        expires_at = time.time() + self.max_ttl_seconds
+        if isinstance(payload.get("exp"), (int, float)):
+            expires_at = min(expires_at, payload["exp"])
+        self._entries[self._key(token)] = (payload, expires_at)
+        self._entries.move_to_end(self._key(token))
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def discard(self, token: str) -> None:
+        self._entries.pop(self._key(token), None)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+_token_cache: Optional[VerifiedTokenCache] = None
+
+def get_token_cache() -> VerifiedTokenCache:
+    global _token_cache
+    if _token_cache is None:
+        _token_cache = VerifiedTokenCache(settings.AUTH_TOKEN_CACHE_SIZE, settings.AUTH_TOKEN_CACHE_MAX_TTL_SEC)
+    return _token_cache
+
 def verify_token(token: str) -> dict:
+    token_cache = get_token_cache()
+    payload = token_cache.get(token)
+    if payload is not None:
+        return dict(payload)
     try:
         payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
-        return payload
     except JWTError:
+        payload = None
+    if payload is None or payload.get("type") == "refresh":
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Could not validate credentials",
             headers={"WWW-Authenticate": "Bearer"},
         )
+    token_cache.put(token, payload)
+    return dict(payload)
+
+# scope["state"] key under which RateLimiterMiddleware leaves the (token, payload) it verified
+VERIFIED_TOKEN = "verified_token"
+
+def _verified_payload(request: Request, token: str = Depends(oauth2_scheme)) -> dict:
+    # reuse the middleware's verification so a request is one cache lookup, not two
+    verified = request.scope.get("state", {}).get(VERIFIED_TOKEN)
+    if verified is not None and verified[0] == token:
+        return dict(verified[1])
+    return verify_token(token)
 
-def get_current_user(payload: dict = Depends(lambda t=Depends(oauth2_scheme): verify_token(t))) -> dict:
+def get_current_user(payload: dict = Depends(_verified_payload)) -> dict:
     return payload
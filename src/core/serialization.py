@@ -0,0 +1,29 @@
+from __future__ import annotations
+
+from typing import Any
+
+from pydantic_core import to_json, to_jsonable_python
+from starlette.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is in requirements; pydantic-core is the fallback
+    orjson = None
+
+
+def dumps(obj: Any) -> bytes:
+    """UTF-8 JSON for API payloads and export files; models and enums are encoded too."""
+    if orjson is not None:
+        return orjson.dumps(obj, default=to_jsonable_python, option=orjson.OPT_NON_STR_KEYS)
+    return to_json(obj)
+
+
+class FastJSONResponse(JSONResponse):
+    """For handlers that return ready-made dicts: one encode, no response_model pass.
+
+    Returning a Response makes FastAPI skip validating and re-serialising the
+    content, so the route's `response_model` only documents the shape.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
@@ -1,13 +1,12 @@
+import time
 from datetime import datetime, timedelta
 from typing import Union
+from uuid import uuid4
 
 from jose import jwt, JWTError
 
 from src.core.config import settings
 
-ACCESS_TOKEN_EXPIRE_MINUTES = settings.ACCESS_TOKEN_EXPIRE_MINUTES
-REFRESH_TOKEN_EXPIRE_MINUTES = 60 * 24 * 7  
-
 def create_access_token(data: dict, expires_delta: Union[timedelta, int, None] = None) -> str:
     to_encode = data.copy()
     if isinstance(expires_delta, timedelta):
@@ -15,18 +14,19 @@ def create_access_token(data: dict, expires_delta: Union[timedelta, int, None] =
     elif isinstance(expires_delta, int):
         expire = datetime.utcnow() + timedelta(minutes=expires_delta)
     else:
-        expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+        expire = datetime.utcnow() + timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     to_encode.update({"exp": expire})
     return jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
 
 def create_refresh_token(data: dict, expires_delta: Union[timedelta, int, None] = None) -> str:
-    to_encode = data.copy()
+    # iat is kept fractional so that a token issued right after a subject-wide revocation survives it
+    to_encode = {"jti": uuid4().hex, **data, "type": "refresh", "iat": time.time()}
     if isinstance(expires_delta, timedelta):
         expire = datetime.utcnow() + expires_delta
     elif isinstance(expires_delta, int):
         expire = datetime.utcnow() + timedelta(minutes=expires_delta)
     else:
-        expire = datetime.utcnow() + timedelta(minutes=REFRESH_TOKEN_EXPIRE_MINUTES)
+        expire = datetime.utcnow() + timedelta(minutes=settings.REFRESH_TOKEN_EXPIRE_MINUTES)
     to_encode.update({"exp": expire})
     return jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
 
@@ -0,0 +1,90 @@
+from __future__ import annotations
+
+import time
+from typing import Optional
+
+from redis.asyncio import Redis
+
+from src.core.config import settings
+
+
+class MemoryRevocationStore:
+    """Single-process store, for tests and local runs without Redis."""
+
+    def __init__(self) -> None:
+        self._revoked: dict[str, float] = {}
+        self._subjects: dict[str, tuple[float, float]] = {}
+
+    async def revoke(self, jti: str, ttl_seconds: int) -> bool:
+        now = time.time()
+        if self._revoked.get(jti, 0) > now:
+            return False
+        self._revoked[jti] = now + max(ttl_seconds, 1)
+        if len(self._revoked) > 10_000:
+            self._revoked = {k: v for k, v in self._revoked.items() if v > now}
+        return True
+
+    async def is_revoked(self, jti: str) -> bool:
+        return self._revoked.get(jti, 0) > time.time()
+
+    async def revoke_subject(self, sub: str, ttl_seconds: int) -> None:
+        now = time.time()
+        self._subjects[sub] = (now, now + max(ttl_seconds, 1))
+
+    async def revoked_before(self, sub: str) -> float:
+        revoked_at, expires_at = self._subjects.get(sub, (0.0, 0.0))
+        return revoked_at if expires_at > time.time() else 0.0
+
+    async def close(self) -> None:
+        pass
+
+
+class RedisRevocationStore:
+    """Revoked refresh-token ids in Redis, each kept until the token would have expired anyway."""
+
+    def __init__(self, url: str) -> None:
+        self._redis = Redis.from_url(url, encoding="utf-8", decode_responses=True)
+
+    async def revoke(self, jti: str, ttl_seconds: int) -> bool:
+        """Mark `jti` revoked; False if it already was (i.e. the token was replayed)."""
+        return bool(await self._redis.set(f"auth:revoked:{jti}", "1", nx=True, ex=max(ttl_seconds, 1)))
+
+    async def is_revoked(self, jti: str) -> bool:
+        return bool(await self._redis.exists(f"auth:revoked:{jti}"))
+
+    async def revoke_subject(self, sub: str, ttl_seconds: int) -> None:
+        """Revoke every token issued to `sub` up to now; kept as long as such a token could live."""
+        await self._redis.set(f"auth:revoked-before:{sub}", repr(time.time()), ex=max(ttl_seconds, 1))
+
+    async def revoked_before(self, sub: str) -> float:
+        """Tokens for `sub` issued at or before this time are revoked; 0.0 if none are."""
+        value = await self._redis.get(f"auth:revoked-before:{sub}")
+        return float(value) if value else 0.0
+
+    async def close(self) -> None:
+        await self._redis.close()
+
+
+_store: Optional[MemoryRevocationStore | RedisRevocationStore] = None
+
+
+def get_revocation_store() -> MemoryRevocationStore | RedisRevocationStore:
+    global _store
+    if _store is None:
+        if settings.AUTH_REVOCATION_BACKEND == "memory":
+            _store = MemoryRevocationStore()
+        else:
+            _store = RedisRevocationStore(settings.AUTH_REDIS_URL)
+    return _store
+
+
+def set_revocation_store(store: Optional[MemoryRevocationStore | RedisRevocationStore]) -> None:
+    global _store
+    _store = store
+
+
+async def close_revocation_store() -> None:
+    global _store
+    if _store is not None:
+        await _store.close()
+        _store = None
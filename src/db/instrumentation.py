@@ -0,0 +1,172 @@
+from __future__ import annotations
+
+import logging
+import re
+import time
+from collections import Counter
+from contextvars import ContextVar
+from typing import List, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from src.core.config import settings
+
+log = logging.getLogger(__name__)
+
+
+class QueryStats:
+    """Statements executed while handling one request (or one `track_queries` block)."""
+
+    __slots__ = ("count", "total", "slowest", "slowest_statement", "statements", "parent")
+
+    def __init__(self, keep_statements: bool = False):
+        self.parent: Optional[QueryStats] = None
+        self.count = 0
+        self.total = 0.0
+        self.slowest = 0.0
+        self.slowest_statement: Optional[str] = None
+        self.statements: Optional[List[str]] = [] if keep_statements else None
+
+    def record(self, statement: str, duration: float) -> None:
+        self.count += 1
+        self.total += duration
+        if duration > self.slowest:
+            self.slowest = duration
+            self.slowest_statement = statement
+        if self.statements is not None:
+            self.statements.append(statement)
+
+    def repeated(self, min_count: int = 2) -> List[Tuple[str, int]]:
+        """Statement shapes run at least `min_count` times: the usual N+1 signature."""
+        if not self.statements:
+            return []
+        shapes = Counter(statement_shape(s) for s in self.statements)
+        return [(shape, n) for shape, n in shapes.most_common() if n >= min_count]
+
+
+_PARAM_LIST = re.compile(r"\(\s*(?:\?|%\(\w+\)s|%s|\$\d+|:\w+)(?:\s*,\s*(?:\?|%\(\w+\)s|%s|\$\d+|:\w+))*\s*\)")
+_LITERAL = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_SPACE = re.compile(r"\s+")
+
+
+def statement_shape(statement: str) -> str:
+    """`statement` with literals and expanded IN-lists folded, so per-row variants compare equal."""
+    shape = _LITERAL.sub("?", statement)
+    shape = _PARAM_LIST.sub("(...)", shape)
+    return _SPACE.sub(" ", shape).strip()
+
+
+_current: ContextVar[Optional[QueryStats]] = ContextVar("query_stats", default=None)
+
+
+def current_query_stats() -> Optional[QueryStats]:
+    return _current.get()
+
+
+class track_queries:
+    """Collect QueryStats for statements run in this context (and tasks it spawns)."""
+
+    def __init__(self, keep_statements: bool = False):
+        self.stats = QueryStats(keep_statements)
+        self._token = None
+
+    def __enter__(self) -> QueryStats:
+        self.stats.parent = _current.get()
+        self._token = _current.set(self.stats)
+        return self.stats
+
+    def __exit__(self, *exc) -> None:
+        _current.reset(self._token)
+
+
+def _explain(conn, statement: str, parameters) -> Optional[str]:
+    # plain EXPLAIN: ANALYZE would run the statement a second time (nextval(), FOR UPDATE,
+    # functions with side effects) inside the caller's transaction. The savepoint keeps a
+    # failing EXPLAIN from aborting that transaction.
+    cursor = conn.connection.dbapi_connection.cursor()
+    try:
+        cursor.execute("SAVEPOINT query_stats_explain")
+        try:
+            cursor.execute("EXPLAIN " + statement, parameters)
+            plan = "\n".join(row[0] for row in cursor.fetchall())
+        except Exception:
+            cursor.execute("ROLLBACK TO SAVEPOINT query_stats_explain")
+            raise
+        cursor.execute("RELEASE SAVEPOINT query_stats_explain")
+        return plan
+    finally:
+        cursor.close()
+
+
+def _log_slow(conn, statement: str, parameters, duration: float, executemany: bool) -> None:
+    plan = None
+    if (
+        settings.DB_SLOW_QUERY_EXPLAIN
+        and not executemany
+        and conn.dialect.name == "postgresql"
+        and statement.lstrip()[:6].upper() == "SELECT"
+    ):
+        try:
+            plan = _explain(conn, statement, parameters)
+        except Exception as e:
+            plan = f"EXPLAIN failed: {e}"
+    log.warning(
+        "slow query %.1f ms: %s%s",
+        duration * 1000,
+        statement,
+        f"\n{plan}" if plan else "",
+        extra={"db_duration_ms": round(duration * 1000, 3), "db_statement": statement, "db_plan": plan},
+    )
+
+
+def _before(conn, cursor, statement, parameters, context, executemany):
+    # kept on the execution context, not the pooled connection: a statement that fails
+    # never reaches _after, and its start must not be paired with a later statement
+    context._query_start = time.perf_counter()
+
+
+def _record(statement: str, duration: float) -> None:
+    stats = _current.get()
+    while stats is not None:  # nested blocks (a test around a request) all see the statement
+        stats.record(statement, duration)
+        stats = stats.parent
+
+
+def _after(conn, cursor, statement, parameters, context, executemany):
+    start = getattr(context, "_query_start", None)
+    if start is None:
+        return
+    context._query_start = None
+    duration = time.perf_counter() - start
+    _record(statement, duration)
+    threshold = settings.DB_SLOW_QUERY_MS
+    if threshold > 0 and duration * 1000 >= threshold:
+        # EXPLAIN goes through a raw DBAPI cursor, so it does not re-enter these hooks
+        _log_slow(conn, statement, parameters, duration, executemany)
+
+
+def _failed(exception_context) -> None:
+    # a failed statement still went to the database: count it, and drop its start time
+    context = exception_context.execution_context
+    start = getattr(context, "_query_start", None)
+    if start is not None:
+        context._query_start = None
+        _record(exception_context.statement, time.perf_counter() - start)
+
+
+def instrument_engine(engine: Engine) -> None:
+    """Time every statement on `engine` (pass `async_engine.sync_engine` for async engines)."""
+    if not event.contains(engine, "before_cursor_execute", _before):
+        event.listen(engine, "before_cursor_execute", _before)
+        event.listen(engine, "after_cursor_execute", _after)
+        event.listen(engine, "handle_error", _failed)
+
+
+def server_timing(stats: QueryStats, app_seconds: float) -> List[Tuple[bytes, bytes]]:
+    value = (
+        f'db;dur={stats.total * 1000:.1f};desc="{stats.count} queries", '
+        f"db-slowest;dur={stats.slowest * 1000:.1f}, "
+        f"app;dur={app_seconds * 1000:.1f}"
+    )
+    return [(b"server-timing", value.encode())]
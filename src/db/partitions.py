@@ -0,0 +1,134 @@
+import argparse
+import logging
+import re
+from datetime import date, datetime, timezone
+from typing import List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+
+log = logging.getLogger(__name__)
+
+PARENT = "user_book_events"
+DEFAULT = f"{PARENT}_default"
+# any constant works; it only has to be the same in every process that maintains partitions
+_LOCK_KEY = 0x75626570
+_NAME = re.compile(rf"^{PARENT}_y(\d{{4}})m(\d{{2}})$")
+
+
+def _month(d: date, offset: int = 0) -> date:
+    idx = d.year * 12 + (d.month - 1) + offset
+    return date(idx // 12, idx % 12 + 1, 1)
+
+
+def partition_name(month: date) -> str:
+    return f"{PARENT}_y{month.year:04d}m{month.month:02d}"
+
+
+def is_partitioned(conn: Connection) -> bool:
+    if conn.dialect.name != "postgresql":
+        return False
+    return bool(conn.execute(text(
+        "SELECT 1 FROM pg_partitioned_table pt JOIN pg_class c ON c.oid = pt.partrelid WHERE c.relname = :t"
+    ), {"t": PARENT}).scalar())
+
+
+def ensure_partitions(conn: Connection, months_ahead: int = 3, start: Optional[date] = None) -> List[str]:
+    """Create monthly partitions from `start` (default: this month) through `months_ahead` months out."""
+    if not is_partitioned(conn):
+        return []
+    first = _month(start or datetime.now(timezone.utc).date())
+    last = _month(datetime.now(timezone.utc).date(), months_ahead)
+    created: List[str] = []
+    m = first
+    while m <= last:
+        name = partition_name(m)
+        exists = conn.execute(text("SELECT to_regclass(:n)"), {"n": name}).scalar()
+        if not exists:
+            _create_partition(conn, name, m, _month(m, 1))
+            created.append(name)
+        m = _month(m, 1)
+    return created
+
+
+def _create_partition(conn: Connection, name: str, start: date, end: date) -> None:
+    """CREATE ... PARTITION OF, moving rows the DEFAULT partition already holds for that range.
+
+    Postgres refuses to create a partition whose range has rows in the default
+    partition, so those are moved: detach the default, create the partition,
+    move the rows across, attach the default again. All in the caller's transaction.
+    """
+    bounds = {"lo": f"{start.isoformat()} 00:00:00+00", "hi": f"{end.isoformat()} 00:00:00+00"}
+    create = text(
+        f"CREATE TABLE {name} PARTITION OF {PARENT} "
+        f"FOR VALUES FROM ('{bounds['lo']}') TO ('{bounds['hi']}')"
+    )
+    has_default = conn.execute(text("SELECT to_regclass(:n)"), {"n": DEFAULT}).scalar()
+    stranded = has_default and conn.execute(text(
+        f"SELECT EXISTS (SELECT 1 FROM {DEFAULT} WHERE created_at >= CAST(:lo AS timestamptz) AND created_at < CAST(:hi AS timestamptz))"
+    ), bounds).scalar()
+    if not stranded:
+        conn.execute(create)
+        return
+    conn.execute(text(f"ALTER TABLE {PARENT} DETACH PARTITION {DEFAULT}"))
+    conn.execute(create)
+    moved = conn.execute(text(
+        f"WITH moved AS (DELETE FROM {DEFAULT} WHERE created_at >= CAST(:lo AS timestamptz) AND created_at < CAST(:hi AS timestamptz) RETURNING *) "
+        f"INSERT INTO {PARENT} SELECT * FROM moved"
+    ), bounds).rowcount
+    conn.execute(text(f"ALTER TABLE {PARENT} ATTACH PARTITION {DEFAULT} DEFAULT"))
+    log.info("moved %s rows from %s into %s", moved, DEFAULT, name)
+
+
+def expire_partitions(conn: Connection, retain_months: int, archive_schema: Optional[str] = None) -> List[str]:
+    """Detach partitions wholly older than `retain_months`; drop them or move them to `archive_schema`."""
+    if not is_partitioned(conn) or retain_months <= 0:
+        return []
+    cutoff = _month(datetime.now(timezone.utc).date(), -retain_months)
+    children = conn.execute(text(
+        "SELECT c.relname FROM pg_inherits i "
+        "JOIN pg_class c ON c.oid = i.inhrelid JOIN pg_class p ON p.oid = i.inhparent "
+        "WHERE p.relname = :t"
+    ), {"t": PARENT}).scalars().all()
+    expired: List[str] = []
+    for name in sorted(children):
+        match = _NAME.match(name)
+        if not match or date(int(match.group(1)), int(match.group(2)), 1) >= cutoff:
+            continue
+        conn.execute(text(f"ALTER TABLE {PARENT} DETACH PARTITION {name}"))
+        if archive_schema:
+            conn.execute(text(f'CREATE SCHEMA IF NOT EXISTS "{archive_schema}"'))
+            conn.execute(text(f'ALTER TABLE {name} SET SCHEMA "{archive_schema}"'))
+        else:
+            conn.execute(text(f"DROP TABLE {name}"))
+        expired.append(name)
+    return expired
+
+
+def maintain(conn: Connection, months_ahead: int, retain_months: int, archive_schema: Optional[str] = None) -> None:
+    """Run from one scheduled job, not at app startup; the advisory lock serialises overlapping runs."""
+    if not is_partitioned(conn):
+        return
+    conn.execute(text("SELECT pg_advisory_xact_lock(:k)"), {"k": _LOCK_KEY})
+    created = ensure_partitions(conn, months_ahead)
+    expired = expire_partitions(conn, retain_months, archive_schema)
+    if created or expired:
+        log.info("user_book_events partitions: created=%s expired=%s", created, expired)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    from src.core.config import settings
+    from src.db.session import get_sync_engine
+
+    parser = argparse.ArgumentParser(description="Create upcoming and expire old user_book_events partitions.")
+    parser.add_argument("--ahead", type=int, default=settings.EVENTS_PARTITIONS_AHEAD, help="months of future partitions to keep ready")
+    parser.add_argument("--retain", type=int, default=settings.EVENTS_RETENTION_MONTHS, help="months of history to keep (0 keeps all)")
+    parser.add_argument("--archive-schema", default=settings.EVENTS_ARCHIVE_SCHEMA, help="move expired partitions here instead of dropping")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+    with get_sync_engine().begin() as conn:
+        maintain(conn, args.ahead, args.retain, args.archive_schema)
+
+
+if __name__ == "__main__":
+    main()
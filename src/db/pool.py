@@ -0,0 +1,98 @@
+from __future__ import annotations
+
+import time
+from typing import Any, Dict, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.exc import DisconnectionError, TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+from src.core.config import settings
+from src.core.metrics import CallbackGauge, Counter
+
+_pools: Dict[str, AsyncAdaptedQueuePool] = {}
+
+
+def _pool_states() -> Dict[Tuple[str, str], float]:
+    states: Dict[Tuple[str, str], float] = {}
+    for name, pool in _pools.items():
+        states[(name, "checked_out")] = pool.checkedout()
+        states[(name, "idle")] = pool.checkedin()
+        states[(name, "overflow")] = max(pool.overflow(), 0)
+        states[(name, "size")] = pool.size()
+    return states
+
+
+DB_POOL_CONNECTIONS = CallbackGauge(
+    "db_pool_connections",
+    "Pooled DB connections by state (checked_out, idle, overflow) and pool size.",
+    labelnames=("engine", "state"),
+    callback=_pool_states,
+)
+DB_POOL_CHECKOUTS = Counter("db_pool_checkouts_total", "Connections handed out by the pool.", labelnames=("engine",))
+DB_POOL_WAIT_SECONDS = Counter("db_pool_wait_seconds_total", "Time spent waiting for a pooled connection.", labelnames=("engine",))
+DB_POOL_TIMEOUTS = Counter("db_pool_timeouts_total", "Checkouts that gave up after pool_timeout.", labelnames=("engine",))
+DB_POOL_PINGS = Counter("db_pool_pings_total", "Liveness pings on checkout, by result.", labelnames=("engine", "result"))
+
+
+class TimedQueuePool(AsyncAdaptedQueuePool):
+    """Queue pool that records how long checkouts wait for a free connection."""
+
+    engine_name = "primary"
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            # only pool exhaustion: connect and auth failures are not timeouts
+            DB_POOL_TIMEOUTS.inc(engine=self.engine_name)
+            raise
+        finally:
+            DB_POOL_WAIT_SECONDS.inc(time.perf_counter() - start, engine=self.engine_name)
+
+
+def pool_kwargs() -> Dict[str, Any]:
+    """create_async_engine() arguments for the configured pool and asyncpg driver."""
+    return {
+        "poolclass": TimedQueuePool,
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT_SEC,
+        "pool_recycle": settings.DB_POOL_RECYCLE_SEC,
+        "pool_pre_ping": settings.DB_PRE_PING == "always",
+        "connect_args": {
+            # asyncpg's own cache and SQLAlchemy's prepared-statement cache; both must be 0 behind pgbouncer
+            "statement_cache_size": settings.DB_STATEMENT_CACHE_SIZE,
+            "prepared_statement_cache_size": settings.DB_STATEMENT_CACHE_SIZE,
+        },
+    }
+
+
+def instrument_pool(engine: AsyncEngine, name: str = "primary") -> None:
+    """Pool gauges/counters, plus the DB_PRE_PING="idle" strategy: ping only
+    connections that sat in the pool longer than DB_PRE_PING_IDLE_SEC."""
+    sync_engine = engine.sync_engine
+    pool = sync_engine.pool
+    if isinstance(pool, TimedQueuePool):
+        pool.engine_name = name
+    if isinstance(pool, AsyncAdaptedQueuePool):
+        _pools[name] = pool
+    idle_ping = settings.DB_PRE_PING == "idle"
+
+    @event.listens_for(sync_engine, "checkout")
+    def _checkout(dbapi_connection, record, proxy):
+        DB_POOL_CHECKOUTS.inc(engine=name)
+        checked_in_at = record.info.get("checked_in_at")
+        if idle_ping and checked_in_at is not None and time.monotonic() - checked_in_at > settings.DB_PRE_PING_IDLE_SEC:
+            try:
+                sync_engine.dialect.do_ping(dbapi_connection)
+            except Exception:
+                DB_POOL_PINGS.inc(engine=name, result="stale")
+                raise DisconnectionError("stale pooled connection")  # pool retries with a fresh one
+            DB_POOL_PINGS.inc(engine=name, result="ok")
+
+    @event.listens_for(sync_engine, "checkin")
+    def _checkin(dbapi_connection, record):
+        record.info["checked_in_at"] = time.monotonic()
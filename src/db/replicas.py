@@ -0,0 +1,130 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+from typing import List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError, OperationalError
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
+
+from src.core.metrics import CallbackGauge, Counter
+from src.db.instrumentation import instrument_engine
+from src.db.pool import instrument_pool, pool_kwargs
+
+log = logging.getLogger(__name__)
+
+DB_READ_ROUTED = Counter("db_read_sessions_total", "Read-only sessions by the engine that served them.", labelnames=("engine",))
+
+
+class Replica:
+    __slots__ = ("name", "engine", "sessionmaker", "healthy")
+
+    def __init__(self, name: str, engine: AsyncEngine):
+        self.name = name
+        self.engine = engine
+        self.sessionmaker = async_sessionmaker(bind=engine, expire_on_commit=False, autoflush=False)
+        self.healthy = True
+
+    def in_use(self) -> int:
+        pool = self.engine.sync_engine.pool
+        return pool.checkedout() if hasattr(pool, "checkedout") else 0
+
+
+class ReplicaSet:
+    """Read replicas balanced by least checked-out connections, round-robin on ties.
+
+    A replica that fails a health check or a connection attempt is skipped
+    until a later health check succeeds; with none healthy, reads go to the primary.
+    """
+
+    def __init__(self, replicas: List[Replica]):
+        self.replicas = replicas
+        self._next = 0
+
+    @classmethod
+    def from_urls(cls, urls: List[str]) -> "ReplicaSet":
+        replicas = []
+        for i, url in enumerate(urls):
+            engine = create_async_engine(url, echo=False, future=True, **pool_kwargs())
+            instrument_pool(engine, f"replica{i}")
+            instrument_engine(engine.sync_engine)
+            replicas.append(Replica(f"replica{i}", engine))
+        return cls(replicas)
+
+    def pick(self) -> Optional[Replica]:
+        healthy = [r for r in self.replicas if r.healthy]
+        if not healthy:
+            return None
+        self._next = (self._next + 1) % len(healthy)
+        ordered = healthy[self._next:] + healthy[:self._next]
+        return min(ordered, key=Replica.in_use)
+
+    def mark_down(self, replica: Replica, exc: BaseException) -> None:
+        if replica.healthy:
+            log.warning("read replica %s marked down: %s", replica.name, exc)
+        replica.healthy = False
+
+    async def check(self, timeout: float = 2.0) -> None:
+        for replica in self.replicas:
+            try:
+                async with replica.engine.connect() as conn:
+                    await asyncio.wait_for(conn.execute(text("SELECT 1")), timeout)
+            except Exception as e:
+                self.mark_down(replica, e)
+            else:
+                if not replica.healthy:
+                    log.info("read replica %s is back", replica.name)
+                replica.healthy = True
+
+    async def check_forever(self, interval: float) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            await self.check()
+
+    async def dispose(self) -> None:
+        for replica in self.replicas:
+            await replica.engine.dispose()
+
+    def healthy_count(self) -> int:
+        return sum(r.healthy for r in self.replicas)
+
+
+_replicas: Optional[ReplicaSet] = None
+
+
+def get_replica_set() -> Optional[ReplicaSet]:
+    return _replicas
+
+
+def set_replica_set(replicas: Optional[ReplicaSet]) -> None:
+    global _replicas
+    _replicas = replicas
+
+
+DB_REPLICAS_HEALTHY = CallbackGauge(
+    "db_replicas_healthy",
+    "Read replicas currently passing health checks.",
+    labelnames=(),
+    callback=lambda: {(): _replicas.healthy_count()} if _replicas else {},
+    multiprocess_mode="max",
+)
+
+
+async def open_replica_session() -> Optional[AsyncSession]:
+    """Session on a healthy replica with its connection already checked out, or None."""
+    replicas = _replicas
+    while replicas is not None:
+        replica = replicas.pick()
+        if replica is None:
+            return None
+        session = replica.sessionmaker()
+        try:
+            await session.connection()
+        except (OperationalError, DBAPIError, OSError) as e:
+            await session.close()
+            replicas.mark_down(replica, e)
+            continue
+        DB_READ_ROUTED.inc(engine=replica.name)
+        return session
+    return None
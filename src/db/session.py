@@ -1,48 +1,93 @@
-from typing import AsyncGenerator, Generator
-from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
-from sqlalchemy.orm import sessionmaker
-from sqlalchemy import create_engine
+from typing import Any, AsyncGenerator, Callable, Generator, Optional
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.engine import Engine
 from src.core.config import settings
+from src.db.instrumentation import instrument_engine
+from src.db.pool import instrument_pool, pool_kwargs
+from src.db.replicas import DB_READ_ROUTED, open_replica_session
 
-ASYNC_DATABASE_URL = (
-    f"postgresql+asyncpg://{settings.POSTGRES_USER}:{settings.POSTGRES_PASSWORD}"
-    f"@{settings.POSTGRES_HOST}:{settings.POSTGRES_PORT}/{settings.POSTGRES_DB}"
-)
+# Engines are built on first use: importing this module (tests, CLI tools, alembic)
+# neither reads the environment nor opens pools, and the psycopg2 engine only exists
+# for the sync scripts.
+_async_engine: Optional[AsyncEngine] = None
+_sync_engine: Optional[Engine] = None
 
-SYNC_DATABASE_URL = (
-    f"postgresql+psycopg2://{settings.POSTGRES_USER}:{settings.POSTGRES_PASSWORD}"
-    f"@{settings.POSTGRES_HOST}:{settings.POSTGRES_PORT}/{settings.POSTGRES_DB}"
-)
+def get_async_engine() -> AsyncEngine:
+    global _async_engine
+    if _async_engine is None:
+        _async_engine = create_async_engine(settings.ASYNC_DATABASE_URL, echo=False, future=True, **pool_kwargs())
+        instrument_pool(_async_engine, "primary")
+        instrument_engine(_async_engine.sync_engine)
+    return _async_engine
 
-async_engine = create_async_engine(
-    ASYNC_DATABASE_URL,
-    echo=False,
-    future=True,
-    pool_pre_ping=True,
-)
+def get_sync_engine() -> Engine:
+    global _sync_engine
+    if _sync_engine is None:
+        from sqlalchemy import create_engine
+        _sync_engine = create_engine(settings.SYNC_DATABASE_URL, echo=False, future=True, pool_pre_ping=True)
+        instrument_engine(_sync_engine)
+    return _sync_engine
+
+async def dispose_engines() -> None:
+    global _async_engine, _sync_engine
+    if _async_engine is not None:
+        await _async_engine.dispose()
+        _async_engine = None
+    if _sync_engine is not None:
+        _sync_engine.dispose()
+        _sync_engine = None
+
+class _LazySessionmaker:
+    """Stands in for a sessionmaker; binds to the current engine on each call."""
+
+    def __init__(self, get_engine: Callable[[], Any], make: Callable[[Any], Any]):
+        self._get_engine = get_engine
+        self._make = make
+        self._maker = None
+
+    def _current(self):
+        engine = self._get_engine()
+        if self._maker is None or self._maker.kw["bind"] is not engine:
+            self._maker = self._make(engine)
+        return self._maker
+
+    def __call__(self, **kw):
+        return self._current()(**kw)
 
-AsyncSessionLocal = async_sessionmaker(
-    bind=async_engine,
-    expire_on_commit=False,
-    autoflush=False,
+    def __getattr__(self, name):
+        return getattr(self._current(), name)
+
+def _sync_sessionmaker(engine: Engine):
+    from sqlalchemy.orm import sessionmaker
+    return sessionmaker(bind=engine, autocommit=False, autoflush=False)
+
+AsyncSessionLocal = _LazySessionmaker(
+    get_async_engine, lambda engine: async_sessionmaker(bind=engine, expire_on_commit=False, autoflush=False)
 )
+SessionLocal = _LazySessionmaker(get_sync_engine, _sync_sessionmaker)
+
+def __getattr__(name: str):
+    # old module attributes, kept for callers that import them directly
+    if name == "async_engine":
+        return get_async_engine()
+    if name == "sync_engine":
+        return get_sync_engine()
+    if name in ("ASYNC_DATABASE_URL", "SYNC_DATABASE_URL"):
+        return getattr(settings, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 async def get_session() -> AsyncGenerator[AsyncSession, None]:
     async with AsyncSessionLocal() as session:
         yield session
 
-sync_engine = create_engine(
-    SYNC_DATABASE_URL,
-    echo=False,
-    future=True,
-    pool_pre_ping=True,
-)
-
-SessionLocal = sessionmaker(
-    bind=sync_engine,
-    autocommit=False,
-    autoflush=False,
-)
+async def get_read_session() -> AsyncGenerator[AsyncSession, None]:
+    """For read-only endpoints that tolerate replication lag; falls back to the primary."""
+    session = await open_replica_session()
+    if session is None:
+        DB_READ_ROUTED.inc(engine="primary")
+        session = AsyncSessionLocal()
+    async with session:
+        yield session
 
 def get_db() -> Generator:
     db = SessionLocal()
@@ -1,20 +1,156 @@
+import asyncio
+import logging
+import os
+from contextlib import asynccontextmanager
+from typing import Optional
 from fastapi import FastAPI
-from src.api.v1.author import routes as author_routes
-from src.api.v1.book import routes as book_routes
-from src.api.v1.user import routes as user_routes
-from src.middlewares.rate_limiter import RateLimiterMiddleware
+from fastapi.responses import PlainTextResponse
+from src.core.config import get_settings
+from src.core.metrics import REGISTRY
 
-app = FastAPI()
+log = logging.getLogger(__name__)
 
-app.add_middleware(
-    RateLimiterMiddleware,
-    max_requests=3,
-    window_seconds=30,
-    identify_by="ip_path",
-    exclude_paths={"/docs", "/openapi.json", "/redoc"},
-)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # imported here so that building the app (tests, tooling) does not pull them in twice
+    from src.core.metrics import write_snapshots_forever
+    from src.core.loop_monitor import start_loop_monitor, stop_loop_monitor
+    from src.core.profiler import stop_sampler
+    from src.core.redis_rate import close_rate_redis
+    from src.core.token_store import close_revocation_store
+    from src.db.replicas import ReplicaSet, get_replica_set, set_replica_set
+    from src.db.session import AsyncSessionLocal, dispose_engines
+    from src.services.book_ids import resync_book_ids, resync_book_ids_forever
+    from src.services.content_index import refresh_content_index_forever, warm_content_index
+    from src.services.event_ingest import start_event_buffer, stop_event_buffer
+    from src.services.rec_cache import events_recorded
 
-app.include_router(user_routes.router, prefix="/api/v1", tags=["users"])
-app.include_router(author_routes.router, prefix="/api/v1", tags=["authors"])
-app.include_router(book_routes.router, prefix="/api/v1", tags=["books"])
+    settings = get_settings()
+    if settings.LOOP_MONITOR_ENABLED:
+        start_loop_monitor(settings.LOOP_MONITOR_INTERVAL_MS, settings.LOOP_LAG_THRESHOLD_MS)
+    try:
+        async with AsyncSessionLocal() as db:
+            await resync_book_ids(db)
+            await warm_content_index(db)
+    except Exception:
+        log.exception("startup warm-up failed; caches will be built on first use")
+    resync_task = asyncio.create_task(resync_book_ids_forever(AsyncSessionLocal, settings.BOOK_IDS_RESYNC_SEC))
+    index_task = asyncio.create_task(refresh_content_index_forever(AsyncSessionLocal))
+    replica_task = None
+    if settings.REPLICA_DATABASE_URLS:
+        replicas = ReplicaSet.from_urls(settings.REPLICA_DATABASE_URLS)
+        await replicas.check()
+        set_replica_set(replicas)
+        replica_task = asyncio.create_task(replicas.check_forever(settings.DB_REPLICA_HEALTH_SEC))
+    metrics_task = None
+    if settings.METRICS_MULTIPROC_DIR:
+        os.makedirs(settings.METRICS_MULTIPROC_DIR, exist_ok=True)
+        metrics_task = asyncio.create_task(write_snapshots_forever(settings.METRICS_MULTIPROC_DIR, settings.METRICS_FLUSH_SEC))
+    if settings.EVENTS_WRITE_BEHIND:
+        start_event_buffer(
+            AsyncSessionLocal,
+            max_queue=settings.EVENTS_QUEUE_MAX,
+            batch_size=settings.EVENTS_BATCH_SIZE,
+            flush_interval_ms=settings.EVENTS_FLUSH_MS,
+            on_flushed=events_recorded,
+            flush_retries=settings.EVENTS_FLUSH_RETRIES,
+            spill_dir=settings.EVENTS_SPILL_DIR,
+        )
+    yield
+    resync_task.cancel()
+    index_task.cancel()
+    await asyncio.gather(resync_task, index_task, return_exceptions=True)
+    if replica_task is not None:
+        replica_task.cancel()
+        await get_replica_set().dispose()
+        set_replica_set(None)
+    await stop_event_buffer()
+    await close_revocation_store()
+    await close_rate_redis()
+    await dispose_engines()
+    stop_sampler()
+    await stop_loop_monitor()
+    if metrics_task is not None:
+        metrics_task.cancel()
+        REGISTRY.write_snapshot(settings.METRICS_MULTIPROC_DIR)
 
+async def metrics():
+    directory = get_settings().METRICS_MULTIPROC_DIR
+    if directory:
+        body = await asyncio.to_thread(REGISTRY.render_multiprocess, directory, REGISTRY.snapshot())
+    else:
+        body = REGISTRY.render()
+    return PlainTextResponse(body, media_type="text/plain; version=0.0.4")
+
+def create_app() -> FastAPI:
+    from src.api.v1.author import routes as author_routes
+    from src.api.v1.book import routes as book_routes
+    from src.api.v1.user import routes as user_routes
+    from src.middlewares.admission import AdmissionControlMiddleware
+    from src.middlewares.http_metrics import HTTPMetricsMiddleware
+    from src.middlewares.profiling import ProfilingMiddleware
+    from src.middlewares.query_stats import QueryStatsMiddleware
+    from src.middlewares.rate_limiter import RateLimiterMiddleware
+
+    settings = get_settings()
+    app = FastAPI(lifespan=lifespan)
+
+    # innermost, so the timing covers only the handler and its queries
+    if settings.SERVER_TIMING_ENABLED:
+        app.add_middleware(QueryStatsMiddleware)
+
+    # just outside the query stats, so a profile covers the handler and everything it awaits
+    if settings.PROFILE_ENABLED:
+        app.add_middleware(
+            ProfilingMiddleware,
+            directory=settings.PROFILE_DIR,
+            token=settings.PROFILE_TOKEN,
+            sample_rate=settings.PROFILE_SAMPLE_RATE,
+            interval_ms=settings.PROFILE_INTERVAL_MS,
+            fmt=settings.PROFILE_FORMAT,
+            block_ms=settings.PROFILE_BLOCK_MS,
+            max_concurrent=settings.PROFILE_MAX_CONCURRENT,
+        )
+
+    # added before the rate limiter so it sits inside it: over-limit clients never take a slot
+    if settings.ADMISSION_ENABLED:
+        app.add_middleware(
+            AdmissionControlMiddleware,
+            target_latency_ms=settings.ADMISSION_TARGET_LATENCY_MS,
+            queue_timeout_ms=settings.ADMISSION_QUEUE_TIMEOUT_MS,
+            initial_limit=settings.ADMISSION_INITIAL_LIMIT,
+            min_limit=settings.ADMISSION_MIN_LIMIT,
+            max_limit=settings.ADMISSION_MAX_LIMIT,
+            max_queue=settings.ADMISSION_MAX_QUEUE,
+        )
+
+    app.add_middleware(
+        RateLimiterMiddleware,
+        max_requests=settings.RATE_LIMIT_REQUESTS,
+        window_seconds=settings.RATE_LIMIT_WINDOW_SEC,
+        identify_by="ip_path",
+        backend=settings.RATE_LIMIT_BACKEND,
+        user_max_requests=settings.RATE_LIMIT_USER_REQUESTS,
+        user_window_seconds=settings.RATE_LIMIT_USER_WINDOW_SEC,
+        exclude_paths={"/docs", "/openapi.json", "/redoc", "/metrics"},
+    )
+    # outermost: counts and times everything, including 429s and shed requests
+    app.add_middleware(HTTPMetricsMiddleware)
+
+    app.include_router(user_routes.router, prefix="/api/v1", tags=["users"])
+    app.include_router(author_routes.router, prefix="/api/v1", tags=["authors"])
+    app.include_router(book_routes.router, prefix="/api/v1", tags=["books"])
+    app.add_api_route("/metrics", metrics, methods=["GET"], include_in_schema=False)
+    return app
+
+_app: Optional[FastAPI] = None
+
+def __getattr__(name: str):
+    # `src.main:app` (uvicorn, tests) is built on first access: importing this module for
+    # create_app() or the lifespan does not read settings or import the routers
+    global _app
+    if name == "app":
+        if _app is None:
+            _app = create_app()
+        return _app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
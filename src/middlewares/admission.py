@@ -0,0 +1,196 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from collections import deque
+from typing import Deque, Dict, Iterable, Optional, Tuple
+
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from src.core.metrics import Counter, Gauge
+from src.middlewares.base import ASGIMiddleware
+from src.middlewares.policies import route_policy
+from src.middlewares.templates import RouteTemplates, flat_routes
+
+ADMISSION_LIMIT = Gauge("admission_concurrency_limit", "Current adaptive in-flight limit, by route class.", labelnames=("route_class",))
+ADMISSION_INFLIGHT = Gauge("admission_inflight", "Requests currently admitted, by route class.", labelnames=("route_class",))
+ADMISSION_REJECTED = Counter("admission_rejected_total", "Requests shed by admission control, by route class and reason.", labelnames=("route_class", "reason"))
+
+HEAVY_COST = 10
+# the limit only grows from completions admitted while at least this share of it was in use
+SATURATION = 0.9
+
+
+class AIMDLimit:
+    """Concurrency limit that grows by ~1 per round trip while latency stays under
+    `target_latency` and is multiplied by `backoff` when it does not.
+
+    Growth needs evidence that more concurrency is wanted: only requests admitted
+    while the limit was (nearly) reached count, so quiet periods leave the limit
+    where it is instead of drifting up to `max_limit`.
+
+    Requests over the limit wait in FIFO order for up to the caller's deadline.
+    """
+
+    __slots__ = ("name", "limit", "min_limit", "max_limit", "target_latency", "backoff",
+                 "max_queue", "inflight", "_waiters", "_last_decrease")
+
+    def __init__(self, name: str, *, initial: int, min_limit: int, max_limit: int,
+                 target_latency: float, backoff: float = 0.9, max_queue: int = 100):
+        self.name = name
+        self.limit = float(initial)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.target_latency = target_latency
+        self.backoff = backoff
+        self.max_queue = max_queue
+        self.inflight = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        self._last_decrease = 0.0
+        ADMISSION_LIMIT.set(self.limit, route_class=name)
+
+    def _has_room(self) -> bool:
+        return self.inflight < int(self.limit)
+
+    async def acquire(self, timeout: float) -> Optional[str]:
+        """None when admitted, otherwise the reason for shedding."""
+        if self._has_room() and not self._waiters:
+            self._admit()
+            return None
+        if len(self._waiters) >= self.max_queue:
+            return "queue_full"
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), timeout)
+            return None
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if waiter.done():
+                self.release(None)  # handed a slot just as we gave up
+            else:
+                waiter.cancel()
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            return "timeout"
+        finally:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+
+    def saturated(self) -> bool:
+        """Call right after `acquire` admits a request: was the limit in use?"""
+        return self.inflight >= self.limit * SATURATION
+
+    def _admit(self) -> None:
+        self.inflight += 1
+        ADMISSION_INFLIGHT.set(self.inflight, route_class=self.name)
+
+    def release(self, latency: Optional[float], saturated: bool = False) -> None:
+        self.inflight -= 1
+        if latency is not None:
+            self._adjust(latency, saturated)
+        while self._waiters and self._has_room():
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                self._admit()
+                waiter.set_result(None)
+        ADMISSION_INFLIGHT.set(self.inflight, route_class=self.name)
+
+    def _adjust(self, latency: float, saturated: bool) -> None:
+        now = time.monotonic()
+        if latency > self.target_latency:
+            # one decrease per target-latency period, so a burst of slow responses
+            # that were all admitted under the old limit only counts once
+            if now - self._last_decrease >= self.target_latency:
+                self.limit = max(self.min_limit, self.limit * self.backoff)
+                self._last_decrease = now
+        elif saturated:
+            self.limit = min(self.max_limit, self.limit + 1.0 / self.limit)
+        ADMISSION_LIMIT.set(self.limit, route_class=self.name)
+
+
+class AdmissionControlMiddleware(ASGIMiddleware):
+    """Caps in-flight requests per route class and sheds the excess with a fast 503.
+
+    Classes: "read" (GET/HEAD), "write" (other methods) and "heavy" (routes whose
+    @rate_limit cost is >= HEAVY_COST, e.g. imports/exports). Latency is measured
+    to the response start so long streaming bodies do not count as slowness.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        *,
+        target_latency_ms: float = 250,
+        queue_timeout_ms: float = 500,
+        initial_limit: int = 50,
+        min_limit: int = 4,
+        max_limit: int = 500,
+        max_queue: int = 100,
+        exclude_paths: Optional[Iterable[str]] = None,
+    ) -> None:
+        super().__init__(app)
+        self.queue_timeout = queue_timeout_ms / 1000.0
+        self.exclude_paths = set(exclude_paths or {"/docs", "/openapi.json", "/redoc", "/metrics"})
+        self._templates = RouteTemplates()
+        self._heavy: Optional[set[Tuple[str, str]]] = None
+        self.limits: Dict[str, AIMDLimit] = {
+            name: AIMDLimit(
+                name,
+                initial=max(min_limit, initial_limit // (4 if name == "heavy" else 1)),
+                min_limit=min_limit,
+                max_limit=max_limit,
+                target_latency=target_latency_ms / 1000.0,
+                max_queue=max_queue,
+            )
+            for name in ("read", "write", "heavy")
+        }
+
+    def _route_class(self, scope: Scope) -> str:
+        if self._heavy is None:
+            self._heavy = {
+                (method, getattr(route, "path_format", route.path))
+                for route in flat_routes(getattr(scope.get("app"), "routes", ()))
+                if (policy := route_policy(route)) is not None and policy.cost >= HEAVY_COST
+                for method in getattr(route, "methods", None) or ()
+            }
+        method = scope["method"]
+        if self._heavy and (method, self._templates.resolve(scope)) in self._heavy:
+            return "heavy"
+        return "read" if method in ("GET", "HEAD") else "write"
+
+    async def handle(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["path"] in self.exclude_paths:
+            await self.app(scope, receive, send)
+            return
+        limit = self.limits[self._route_class(scope)]
+        reason = await limit.acquire(self.queue_timeout)
+        if reason is not None:
+            ADMISSION_REJECTED.inc(route_class=limit.name, reason=reason)
+            response = JSONResponse(
+                status_code=503,
+                content={"detail": "Server is busy, retry later"},
+                headers={"Retry-After": "1"},
+            )
+            await response(scope, receive, send)
+            return
+
+        saturated = limit.saturated()
+        start = time.monotonic()
+        latency: Optional[float] = None
+
+        async def timed_send(message: Message) -> None:
+            nonlocal latency
+            if message["type"] == "http.response.start":
+                latency = time.monotonic() - start
+                if message["status"] >= 500:
+                    latency = float("inf")
+            await send(message)
+
+        try:
+            await self.app(scope, receive, timed_send)
+        except Exception:
+            latency = float("inf")
+            raise
+        finally:
+            limit.release(latency, saturated)
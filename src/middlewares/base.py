@@ -0,0 +1,43 @@
+from __future__ import annotations
+
+from typing import Iterable, Tuple
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+RawHeaders = Iterable[Tuple[bytes, bytes]]
+
+
+class ASGIMiddleware:
+    """Base for raw ASGI middlewares.
+
+    Unlike BaseHTTPMiddleware there is no extra task or response re-streaming:
+    subclasses see the scope, decide, and either answer directly or call
+    `self.app`, optionally through `with_headers(send, ...)`. Non-HTTP scopes
+    (lifespan, websocket) pass straight through.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        await self.handle(scope, receive, send)
+
+    async def handle(self, scope: Scope, receive: Receive, send: Send) -> None:
+        await self.app(scope, receive, send)
+
+
+def with_headers(send: Send, headers: RawHeaders) -> Send:
+    """Wrap `send` so `headers` are appended to the response start message."""
+    async def wrapped(message: Message) -> None:
+        if message["type"] == "http.response.start":
+            message["headers"] = [*message.get("headers", ()), *headers]
+        await send(message)
+    return wrapped
+
+
+def client_ip(scope: Scope) -> str:
+    client = scope.get("client")
+    return client[0] if client else "unknown"
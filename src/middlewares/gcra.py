@@ -0,0 +1,71 @@
+from __future__ import annotations
+
+from collections import OrderedDict
+from typing import Tuple
+
+from src.core.metrics import Counter, Gauge
+
+RATE_LIMIT_KEYS = Gauge("rate_limit_local_keys", "Clients tracked by the in-process rate limiter.")
+RATE_LIMIT_EVICTIONS = Counter("rate_limit_local_evictions_total", "In-process limiter keys dropped, by reason.", labelnames=("reason",))
+
+
+class LocalGCRA:
+    """In-process GCRA: one float (the theoretical arrival time) per key.
+
+    A key whose TAT is in the past is indistinguishable from a new key, so idle
+    keys can be dropped without changing any decision. Keys are kept in LRU
+    order; `sweep` trims idle ones from the cold end and `max_keys` caps the
+    total for traffic (e.g. scanners) that never goes idle.
+    """
+
+    __slots__ = ("max_requests", "interval", "burst", "max_keys", "_tats")
+
+    def __init__(self, max_requests: int, window_seconds: float, max_keys: int = 100_000):
+        self.max_requests = max_requests
+        self.interval = window_seconds / max_requests
+        self.burst = float(window_seconds)
+        self.max_keys = max_keys
+        self._tats: OrderedDict[str, float] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._tats)
+
+    def hit(self, key: str, now: float, cost: int = 1) -> Tuple[bool, int, float, float]:
+        """(allowed, remaining, retry_after_s, reset_in_s)"""
+        tat = max(self._tats.get(key, now), now)
+        new_tat = tat + self.interval * cost
+        if new_tat - self.burst > now:
+            return False, 0, new_tat - self.burst - now, tat - now
+        if key in self._tats:
+            self._tats.move_to_end(key)
+        self._tats[key] = new_tat
+        if len(self._tats) > self.max_keys:
+            self._tats.popitem(last=False)
+            RATE_LIMIT_EVICTIONS.inc(reason="capacity")
+        remaining = int((self.burst - (new_tat - now)) / self.interval + 1e-9)
+        return True, remaining, 0.0, new_tat - now
+
+    def refund(self, key: str, now: float, cost: int = 1) -> None:
+        """Give back a charge `hit` allowed, e.g. when another limit rejected the request."""
+        tat = self._tats.get(key)
+        if tat is None:
+            return
+        tat -= self.interval * cost
+        if tat <= now:
+            del self._tats[key]
+        else:
+            self._tats[key] = tat
+
+    def sweep(self, now: float, limit: int = 1000) -> int:
+        """Drop up to `limit` idle keys from the least recently used end."""
+        dropped = 0
+        while self._tats and dropped < limit:
+            key, tat = next(iter(self._tats.items()))
+            if tat > now:
+                break
+            del self._tats[key]
+            dropped += 1
+        if dropped:
+            RATE_LIMIT_EVICTIONS.inc(dropped, reason="idle")
+        RATE_LIMIT_KEYS.set(len(self._tats))
+        return dropped
@@ -0,0 +1,53 @@
+from __future__ import annotations
+
+import time
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from src.core.metrics import Counter, Gauge, Histogram
+from src.middlewares.base import ASGIMiddleware
+from src.middlewares.templates import RouteTemplates
+
+HTTP_REQUESTS = Counter("http_requests_total", "Finished HTTP requests by route template and status.", labelnames=("method", "route", "status"))
+HTTP_LATENCY = Histogram(
+    "http_request_duration_seconds",
+    "Time from request start to the end of the response, by route template.",
+    labelnames=("method", "route"),
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0),
+)
+HTTP_INFLIGHT = Gauge("http_requests_in_progress", "Requests being handled, by route template.", labelnames=("method", "route"))
+
+_METHODS = frozenset({"GET", "HEAD", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"})
+
+
+class HTTPMetricsMiddleware(ASGIMiddleware):
+    """Request count, latency and in-flight gauges per route template.
+
+    Labels use the template (/api/v1/books/{book_id}), never the raw path, and
+    unknown methods and paths collapse into one bucket, so series stay bounded.
+    Meant to be outermost so rate-limited and shed requests are counted too.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        super().__init__(app)
+        self._templates = RouteTemplates()
+
+    async def handle(self, scope: Scope, receive: Receive, send: Send) -> None:
+        method = scope["method"] if scope["method"] in _METHODS else "OTHER"
+        route = self._templates.resolve(scope)
+        status = 500
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        HTTP_INFLIGHT.inc(method=method, route=route)
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            HTTP_INFLIGHT.dec(method=method, route=route)
+            HTTP_LATENCY.observe(time.perf_counter() - start, method=method, route=route)
+            HTTP_REQUESTS.inc(method=method, route=route, status=status)
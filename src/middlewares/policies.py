@@ -0,0 +1,55 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Callable, Optional, Tuple, TypeVar
+
+Limit = Tuple[int, float]  # (requests, window_seconds)
+F = TypeVar("F", bound=Callable)
+
+
+@dataclass(frozen=True)
+class RatePolicy:
+    """How a route is charged by RateLimiterMiddleware.
+
+    `cost` is taken from every budget the request counts against, so limits
+    are in cost units: `cost=20, per_user=(200, 3600)` is ten calls an hour.
+    `per_ip` / `per_user` give the route a budget of its own instead of the
+    shared default one; `per_user` applies only to requests with a valid
+    bearer token.
+    """
+
+    cost: int = 1
+    per_ip: Optional[Limit] = None
+    per_user: Optional[Limit] = None
+    exempt: bool = False
+
+
+def rate_limit(
+    *,
+    cost: int = 1,
+    per_ip: Optional[Limit] = None,
+    per_user: Optional[Limit] = None,
+    exempt: bool = False,
+) -> Callable[[F], F]:
+    """Attach a RatePolicy to an endpoint; place it below the @router.<method> decorator."""
+    policy = RatePolicy(cost=cost, per_ip=per_ip, per_user=per_user, exempt=exempt)
+    for limit in (per_ip, per_user):
+        if limit is not None:
+            check_cost(cost, limit)
+
+    def decorate(fn: F) -> F:
+        fn.__rate_policy__ = policy
+        return fn
+    return decorate
+
+
+def check_cost(cost: int, limit: Limit) -> None:
+    """A GCRA budget bursts up to `limit[0]` units; a larger cost could never be admitted."""
+    if cost < 1 or limit[0] < 1:
+        raise ValueError(f"rate limit cost and budget must be positive, got cost={cost} limit={limit}")
+    if cost > limit[0]:
+        raise ValueError(f"cost {cost} exceeds the budget of {limit[0]} units per {limit[1]}s: every request would be rejected")
+
+
+def route_policy(route) -> Optional[RatePolicy]:
+    return getattr(getattr(route, "endpoint", None), "__rate_policy__", None)
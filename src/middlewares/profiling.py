@@ -0,0 +1,89 @@
+from __future__ import annotations
+
+import asyncio
+import hmac
+import logging
+import random
+import time
+from typing import Optional
+from uuid import uuid4
+
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from src.core.metrics import Counter
+from src.core.profiler import Profile, get_sampler
+from src.middlewares.base import ASGIMiddleware, with_headers
+from src.middlewares.templates import RouteTemplates
+
+log = logging.getLogger(__name__)
+
+PROFILES_WRITTEN = Counter("request_profiles_total", "Requests profiled, by trigger.", labelnames=("trigger",))
+
+
+class ProfilingMiddleware(ASGIMiddleware):
+    """Opt-in statistical profiling of single requests.
+
+    A request is profiled when it carries `X-Profile: <token>` matching the
+    configured admin token, or at random with probability `sample_rate`. Its
+    stacks are written to `directory` as speedscope JSON or collapsed stacks,
+    and the file name is returned in `X-Profile-File`.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        *,
+        directory: str,
+        token: str = "",
+        sample_rate: float = 0.0,
+        interval_ms: float = 5.0,
+        fmt: str = "speedscope",
+        block_ms: float = 0.0,
+        max_concurrent: int = 4,
+    ) -> None:
+        super().__init__(app)
+        self.directory = directory
+        self.token = token.encode()
+        self.sample_rate = sample_rate
+        self.interval = interval_ms / 1000
+        self.fmt = fmt
+        self.block_threshold = block_ms / 1000
+        self.max_concurrent = max_concurrent
+        self._templates = RouteTemplates()
+
+    def _trigger(self, scope: Scope) -> Optional[str]:
+        if self.token:
+            for name, value in scope["headers"]:
+                if name == b"x-profile":
+                    return "token" if hmac.compare_digest(value, self.token) else None
+        if self.sample_rate and random.random() < self.sample_rate:
+            return "sampled"
+        return None
+
+    async def handle(self, scope: Scope, receive: Receive, send: Send) -> None:
+        trigger = self._trigger(scope)
+        task = asyncio.current_task()
+        sampler = get_sampler(self.interval, self.block_threshold) if trigger else None
+        if sampler is None or task is None or len(sampler.active) >= self.max_concurrent:
+            await self.app(scope, receive, send)
+            return
+
+        route = self._templates.resolve(scope).strip("/").replace("/", "_").replace("{", "").replace("}", "") or "root"
+        profile = Profile(f"{time.strftime('%Y%m%dT%H%M%S')}-{scope['method']}-{route}-{uuid4().hex[:8]}")
+        ext = "collapsed.txt" if self.fmt == "collapsed" else "speedscope.json"
+        sampler.add(task, profile)
+        try:
+            await self.app(scope, receive, with_headers(send, [(b"x-profile-file", f"{profile.name}.{ext}".encode())]))
+        finally:
+            sampler.remove(task)
+            PROFILES_WRITTEN.inc(trigger=trigger)
+            try:
+                path = await asyncio.to_thread(profile.write, self.directory, self.fmt, self.interval)
+            except OSError:
+                log.exception("could not write request profile %s", profile.name)
+            else:
+                log.info(
+                    "profiled %s %s: %d samples over %.1f ms -> %s",
+                    scope["method"], scope["path"], profile.samples, profile.elapsed * 1000, path,
+                    extra={"profile_path": path, "profile_samples": profile.samples, "profile_blocks": len(profile.blocks)},
+                )
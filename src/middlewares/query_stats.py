@@ -0,0 +1,47 @@
+from __future__ import annotations
+
+import logging
+import time
+
+from starlette.types import Message, Receive, Scope, Send
+
+from src.core.config import settings
+from src.db.instrumentation import server_timing, track_queries
+from src.middlewares.base import ASGIMiddleware
+
+log = logging.getLogger(__name__)
+
+
+class QueryStatsMiddleware(ASGIMiddleware):
+    """Counts SQL statements per request; adds a Server-Timing header and a debug log line."""
+
+    async def handle(self, scope: Scope, receive: Receive, send: Send) -> None:
+        start = time.perf_counter()
+        threshold = settings.DB_N_PLUS_ONE_THRESHOLD
+        with track_queries(keep_statements=threshold > 0) as stats:
+
+            async def send_with_timing(message: Message) -> None:
+                if message["type"] == "http.response.start":
+                    message["headers"] = [*message.get("headers", ()), *server_timing(stats, time.perf_counter() - start)]
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_with_timing)
+            finally:
+                log.debug(
+                    "%s %s: %d queries, %.1f ms in db",
+                    scope["method"], scope["path"], stats.count, stats.total * 1000,
+                    extra={
+                        "http_method": scope["method"],
+                        "http_path": scope["path"],
+                        "db_queries": stats.count,
+                        "db_time_ms": round(stats.total * 1000, 3),
+                        "db_slowest_ms": round(stats.slowest * 1000, 3),
+                        "db_slowest_statement": stats.slowest_statement,
+                    },
+                )
+                for shape, n in stats.repeated(threshold):
+                    log.warning(
+                        "possible N+1 in %s %s: %d x %s", scope["method"], scope["path"], n, shape,
+                        extra={"http_method": scope["method"], "http_path": scope["path"], "db_repeats": n, "db_statement": shape},
+                    )
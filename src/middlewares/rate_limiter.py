@@ -1,14 +1,61 @@
 from __future__ import annotations
-import math, threading, time
-from collections import defaultdict, deque
-from typing import Deque, Dict, Iterable, Optional, Set
-from fastapi import Request
-from starlette.middleware.base import BaseHTTPMiddleware, RequestResponseEndpoint
-from starlette.responses import JSONResponse, Response
-from starlette.types import ASGIApp
+import logging, math, time
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from fastapi import HTTPException
+from redis.exceptions import RedisError
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+from src.core.metrics import Counter
+from src.core.redis_rate import RedisGCRA, get_rate_redis
+from src.core.security import VERIFIED_TOKEN, verify_token
+from src.middlewares.base import ASGIMiddleware, client_ip, with_headers
+from src.middlewares.gcra import LocalGCRA
+from src.middlewares.policies import Limit, RatePolicy, check_cost, route_policy
+from src.middlewares.templates import RouteTemplates, flat_routes
 
-class RateLimiterMiddleware(BaseHTTPMiddleware):
-    """Simple in-memory sliding-window limiter (single-process only)."""
+log = logging.getLogger(__name__)
+
+RATE_LIMIT_DECISIONS = Counter("rate_limit_decisions_total", "Rate limiter decisions by backend and outcome.", labelnames=("backend", "result"))
+RATE_LIMIT_BACKEND_ERRORS = Counter("rate_limit_backend_errors_total", "Redis rate limiter calls that failed and fell back to the local limiter.")
+
+Decision = Tuple[bool, int, int, int]  # allowed, remaining, retry_after, reset_in (whole seconds)
+
+class Budget:
+    """One GCRA limit; `local` is always kept, `redis` is attached lazily."""
+
+    __slots__ = ("name", "max_requests", "window_seconds", "local", "redis")
+
+    def __init__(self, name: str, limit: Limit, max_keys: int):
+        self.name = name
+        self.max_requests, self.window_seconds = int(limit[0]), float(limit[1])
+        self.local = LocalGCRA(self.max_requests, self.window_seconds, max_keys=max_keys)
+        self.redis: Optional[RedisGCRA] = None
+
+Charge = Tuple[Budget, str, Optional[RedisGCRA]]  # budget, key, the Redis limiter that took it (None: local)
+
+class _Rule:
+    """A route's policy resolved to concrete budgets and how each is keyed."""
+
+    __slots__ = ("cost", "budgets", "needs_user")
+
+    def __init__(self, cost: int, budgets: List[Tuple[Budget, str]]):
+        self.cost = cost
+        self.budgets = budgets
+        self.needs_user = any(kind == "user" for _, kind in budgets)
+
+class RateLimiterMiddleware(ASGIMiddleware):
+    """GCRA limiter: `max_requests` per `window_seconds` per client, bursts allowed up to the full window.
+
+    Routes may declare their own cost and budgets with `@rate_limit(...)`
+    (see src/middlewares/policies.py); the policies are compiled into a
+    (method, route template) table on the first request. Authenticated
+    requests are also charged to a per-user budget (`user_max_requests`).
+
+    With `backend="redis"` limits are enforced cluster-wide by a Lua script;
+    if Redis is unreachable the in-process limiter is used until
+    `redis_retry_seconds` have passed. With `identify_by="ip_path"` the path is
+    reduced to its route template so /books/1 and /books/2 share a budget.
+    """
 
     def __init__(
         self,
@@ -19,6 +66,12 @@ class RateLimiterMiddleware(BaseHTTPMiddleware):
         identify_by: str = "ip_path",
         exclude_paths: Optional[Iterable[str]] = None,
         include_methods: Optional[Set[str]] = None,
+        backend: str = "local",
+        redis_retry_seconds: float = 5.0,
+        max_keys: int = 100_000,
+        sweep_interval_seconds: float = 1.0,
+        user_max_requests: Optional[int] = None,
+        user_window_seconds: int = 60,
     ) -> None:
         super().__init__(app)
         self.max_requests = int(max_requests)
@@ -28,53 +81,173 @@ class RateLimiterMiddleware(BaseHTTPMiddleware):
         self.identify_by = identify_by
         self.exclude_paths = set(exclude_paths or {"/docs", "/openapi.json", "/redoc", "/health", "/healthz"})
         self.include_methods = set(include_methods or {"GET", "POST", "PUT", "PATCH", "DELETE", "HEAD"})
-        self._buckets: Dict[str, Deque[float]] = defaultdict(deque)
-        self._lock = threading.Lock()
+        if backend not in {"local", "redis"}:
+            raise ValueError("backend must be 'local' or 'redis'")
+        self.backend = backend
+        self.redis_retry_seconds = redis_retry_seconds
+        self.max_keys = max_keys
+        self._redis_down_until = 0.0
+        self._templates = RouteTemplates()
+        self.sweep_interval_seconds = sweep_interval_seconds
+        self._next_sweep = 0.0
+        self._budgets: List[Budget] = []
+        self._default_ip = self._budget("ip", (self.max_requests, self.window_seconds))
+        self._default_user = self._budget("user", (user_max_requests, user_window_seconds)) if user_max_requests else None
+        self._default_rule = self._rule(RatePolicy(), "")
+        self._rules: Optional[Dict[Tuple[str, str], _Rule]] = None
+
+    def _budget(self, name: str, limit: Limit) -> Budget:
+        budget = Budget(name, limit, self.max_keys)
+        self._budgets.append(budget)
+        return budget
+
+    def _rule(self, policy: RatePolicy, route_key: str) -> _Rule:
+        if policy.exempt:
+            return _Rule(0, [])
+        budgets: List[Tuple[Budget, str]] = []
+        if policy.per_ip:
+            budgets.append((self._budget(f"{route_key}:ip", policy.per_ip), "ip"))
+        else:
+            budgets.append((self._default_ip, self.identify_by))
+        if policy.per_user:
+            budgets.append((self._budget(f"{route_key}:user", policy.per_user), "user"))
+        elif self._default_user is not None:
+            budgets.append((self._default_user, "user"))
+        for budget, _ in budgets:
+            check_cost(policy.cost, (budget.max_requests, budget.window_seconds))
+        return _Rule(policy.cost, budgets)
+
+    def _compile(self, app) -> Dict[Tuple[str, str], _Rule]:
+        rules: Dict[Tuple[str, str], _Rule] = {}
+        for route in flat_routes(getattr(app, "routes", ())):
+            policy = route_policy(route)
+            if policy is None:
+                continue
+            template = getattr(route, "path_format", route.path)
+            for method in getattr(route, "methods", None) or ():
+                rules[(method, template)] = self._rule(policy, f"{method} {template}")
+        return rules
+
+    def _identifier(self, scope: Scope, template: str) -> str:
+        ip = client_ip(scope)
+        return ip if self.identify_by == "ip" else f"{ip}:{template}"
 
-    def _identifier(self, request: Request) -> str:
-        ip = request.client.host if request.client else "unknown"
-        return ip if self.identify_by == "ip" else f"{ip}:{request.url.path}"
+    @staticmethod
+    def _user(scope: Scope) -> Optional[str]:
+        for name, value in scope["headers"]:
+            if name == b"authorization":
+                scheme, _, token = value.decode("latin-1").partition(" ")
+                if scheme.lower() != "bearer" or not token:
+                    return None
+                try:
+                    payload = verify_token(token)
+                except HTTPException:
+                    return None
+                scope.setdefault("state", {})[VERIFIED_TOKEN] = (token, payload)
+                return payload.get("sub")
+        return None
 
-    def _cleanup(self, dq: Deque[float], now: float) -> None:
-        win = self.window_seconds
-        while dq and (now - dq[0]) >= win:
-            dq.popleft()
+    def _redis(self, budget: Budget) -> Optional[RedisGCRA]:
+        if budget.redis is None:
+            client = get_rate_redis()
+            if client is None:
+                return None
+            budget.redis = RedisGCRA(client, budget.max_requests, budget.window_seconds, prefix=f"rl:{budget.name}:")
+        return budget.redis
 
-    async def dispatch(self, request: Request, call_next: RequestResponseEndpoint) -> Response:
-        if request.method == "OPTIONS" or request.url.path in self.exclude_paths:
-            return await call_next(request)
-        if request.method not in self.include_methods:
-            return await call_next(request)
+    async def _check(self, budget: Budget, key: str, now: float, cost: int = 1, charged: Optional[List[Charge]] = None) -> Decision:
+        """Charge `key` against `budget`; an allowed charge is appended to `charged` so it can be refunded."""
+        if self.backend == "redis" and now >= self._redis_down_until:
+            limiter = self._redis(budget)
+            if limiter is not None:
+                try:
+                    allowed, remaining, retry_after, reset_in = await limiter.hit(key, cost)
+                except (RedisError, OSError) as e:
+                    RATE_LIMIT_BACKEND_ERRORS.inc()
+                    self._redis_down_until = now + self.redis_retry_seconds
+                    log.warning("redis rate limiter unavailable, using local limits for %ss: %s", self.redis_retry_seconds, e)
+                else:
+                    RATE_LIMIT_DECISIONS.inc(backend="redis", result="allowed" if allowed else "limited")
+                    if allowed and charged is not None:
+                        charged.append((budget, key, limiter))
+                    return allowed, remaining, int(math.ceil(retry_after)), int(math.ceil(reset_in))
+        decision = self._check_local(budget, key, now, cost)
+        if decision[0] and charged is not None:
+            charged.append((budget, key, None))
+        return decision
+
+    def _check_local(self, budget: Budget, key: str, now: float, cost: int = 1) -> Decision:
+        # decisions never await, so the event loop serialises them without a lock
+        if now >= self._next_sweep:
+            for b in self._budgets:
+                b.local.sweep(now)
+            self._next_sweep = now + self.sweep_interval_seconds
+        allowed, remaining, retry_after, reset_in = budget.local.hit(key, now, cost)
+        RATE_LIMIT_DECISIONS.inc(backend="local", result="allowed" if allowed else "limited")
+        return allowed, remaining, int(math.ceil(retry_after)), int(math.ceil(reset_in))
+
+    async def _refund(self, charged: List[Charge], now: float, cost: int) -> None:
+        """Give back charges to budgets that allowed a request a later budget rejected."""
+        for budget, key, limiter in charged:
+            if limiter is None:
+                budget.local.refund(key, now, cost)
+                continue
+            try:
+                await limiter.refund(key, cost)
+            except (RedisError, OSError) as e:
+                RATE_LIMIT_BACKEND_ERRORS.inc()
+                log.warning("could not refund rate limit charge for %s: %s", budget.name, e)
+
+    async def handle(self, scope: Scope, receive: Receive, send: Send) -> None:
+        method = scope["method"]
+        if method == "OPTIONS" or method not in self.include_methods or scope["path"] in self.exclude_paths:
+            await self.app(scope, receive, send)
+            return
+        if self._rules is None:
+            self._rules = self._compile(scope.get("app"))
+        template = self._templates.resolve(scope)
+        rule = self._rules.get((method, template), self._default_rule)
+        if not rule.budgets:
+            await self.app(scope, receive, send)
+            return
 
         now = time.time()
-        ident = self._identifier(request)
-
-        with self._lock:
-            dq = self._buckets[ident]
-            self._cleanup(dq, now)
-            if len(dq) >= self.max_requests:
-                oldest = dq[0]
-                retry_after = max(0, int(math.ceil(self.window_seconds - (now - oldest))))
-                return JSONResponse(
-                    status_code=429,
-                    content={"detail": "Rate limit exceeded. Try again later."},
-                    headers={
-                        "Retry-After": str(retry_after),
-                        "X-RateLimit-Limit": str(self.max_requests),
-                        "X-RateLimit-Remaining": "0",
-                        "X-RateLimit-Reset": str(int(now + retry_after)),
-                    },
-                )
-            dq.append(now)
-            remaining = self.max_requests - len(dq)
-            oldest = dq[0]
-            reset_in = max(0, int(math.ceil(self.window_seconds - (now - oldest))))
-
-        response = await call_next(request)
-        try:
-            response.headers["X-RateLimit-Limit"] = str(self.max_requests)
-            response.headers["X-RateLimit-Remaining"] = str(remaining)
-            response.headers["X-RateLimit-Reset"] = str(int(now + reset_in))
-        except Exception:
-            pass
-        return response
+        user = self._user(scope) if rule.needs_user else None
+        tightest: Optional[Tuple[Budget, Decision]] = None
+        charged: List[Charge] = []
+        for budget, kind in rule.budgets:
+            if kind == "user":
+                if user is None:
+                    continue
+                key = user
+            else:
+                key = client_ip(scope) if kind == "ip" else self._identifier(scope, template)
+            decision = await self._check(budget, key, now, rule.cost, charged)
+            if not decision[0]:
+                # a rejected request must not use up the budgets that allowed it
+                await self._refund(charged, now, rule.cost)
+                await self._reject(budget, decision, now, scope, receive, send)
+                return
+            if tightest is None or decision[1] < tightest[1][1]:
+                tightest = (budget, decision)
+
+        budget, (_, remaining, _, reset_in) = tightest
+        await self.app(scope, receive, with_headers(send, (
+            (b"x-ratelimit-limit", str(budget.max_requests).encode()),
+            (b"x-ratelimit-remaining", str(remaining).encode()),
+            (b"x-ratelimit-reset", str(int(now + reset_in)).encode()),
+        )))
+
+    async def _reject(self, budget: Budget, decision: Decision, now: float, scope: Scope, receive: Receive, send: Send) -> None:
+        retry_after = decision[2]
+        response = JSONResponse(
+            status_code=429,
+            content={"detail": "Rate limit exceeded. Try again later."},
+            headers={
+                "Retry-After": str(retry_after),
+                "X-RateLimit-Limit": str(budget.max_requests),
+                "X-RateLimit-Remaining": "0",
+                "X-RateLimit-Reset": str(int(now + retry_after)),
+            },
+        )
+        await response(scope, receive, send)
@@ -0,0 +1,61 @@
+from __future__ import annotations
+
+from collections import OrderedDict
+from typing import Any, Iterable, Iterator, Optional
+
+from starlette.routing import Match
+from starlette.types import Scope
+
+UNMATCHED = "<unmatched>"
+
+
+def flat_routes(routes: Iterable[Any]) -> Iterator[Any]:
+    """Routes with included routers expanded.
+
+    FastAPI keeps `include_router` children behind a router object instead of
+    copying them into `app.routes`; its effective candidates carry the full
+    path template, methods and endpoint of each child route.
+    """
+    for route in routes:
+        candidates = getattr(route, "effective_candidates", None)
+        if callable(candidates):
+            yield from flat_routes(candidates())
+            yield from flat_routes(route.effective_low_priority_routes())
+        else:
+            yield route
+
+
+class RouteTemplates:
+    """Maps a request path to its route template, e.g. /api/v1/books/123 -> /api/v1/books/{id}.
+
+    Paths that match no route collapse into one bucket so probing random URLs
+    cannot create unbounded limiter keys. Recent lookups are memoised.
+    """
+
+    def __init__(self, maxsize: int = 4096):
+        self.maxsize = maxsize
+        self._cache: OrderedDict[tuple[str, str], str] = OrderedDict()
+
+    def resolve(self, scope: Scope) -> str:
+        key = (scope.get("method", ""), scope["path"])
+        template = self._cache.get(key)
+        if template is not None:
+            self._cache.move_to_end(key)
+            return template
+        template = self._match(scope) or UNMATCHED
+        self._cache[key] = template
+        if len(self._cache) > self.maxsize:
+            self._cache.popitem(last=False)
+        return template
+
+    @staticmethod
+    def _match(scope: Scope) -> Optional[str]:
+        app = scope.get("app")
+        partial = None
+        for route in flat_routes(getattr(app, "routes", ())):
+            match, _ = route.matches(scope)
+            if match == Match.FULL:
+                return getattr(route, "path_format", None) or getattr(route, "path", None)
+            if match == Match.PARTIAL and partial is None:
+                partial = getattr(route, "path_format", None) or getattr(route, "path", None)
+        return partial
@@ -1,4 +1,5 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Index, CheckConstraint
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Index, CheckConstraint, PrimaryKeyConstraint, Sequence
+from sqlalchemy.ext.compiler import compiles
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from src.db.base import Base
@@ -6,12 +7,15 @@ from src.db.base import Base
 class UserBookEvent(Base):
     __tablename__ = "user_book_events"
     __table_args__ = (
+        # Postgres partitions by created_at, and the partition key must be part of the primary key
+        # (alembic 0003). SQLite keeps PRIMARY KEY (id) so id stays an auto-assigned rowid there.
+        PrimaryKeyConstraint("id", "created_at", name="user_book_events_pkey", info={"sqlite_columns": ("id",)}),
         CheckConstraint("event in ('view','like','rate')", name="ck_user_book_events_event_allowed"),
         CheckConstraint("(rating is NULL) OR (rating BETWEEN 1 AND 5)", name="ck_user_book_events_rating_range"),
     )
 
-    id = Column(Integer, primary_key=True)
-    username = Column(String(50), nullable=False, index=True)
+    id = Column(Integer, Sequence("user_book_events_id_seq"), nullable=False)
+    username = Column(String(50), nullable=False)
     book_id = Column(Integer, ForeignKey("books.id", ondelete="CASCADE"), nullable=False, index=True)
     event = Column(String(20), nullable=False)
     rating = Column(Integer, nullable=True)
@@ -20,3 +24,11 @@ class UserBookEvent(Base):
     book = relationship("Book", backref="user_events")
 
 Index("ix_user_book_event_user_book", UserBookEvent.username, UserBookEvent.book_id)
+Index("ix_user_book_events_username_created_at", UserBookEvent.username, UserBookEvent.created_at)
+
+@compiles(PrimaryKeyConstraint, "sqlite")
+def _sqlite_primary_key(constraint, compiler, **kw):
+    columns = constraint.info.get("sqlite_columns")
+    if columns:
+        return "PRIMARY KEY (%s)" % ", ".join(columns)
+    return compiler.visit_primary_key_constraint(constraint, **kw)
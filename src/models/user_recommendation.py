@@ -0,0 +1,12 @@
+from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey
+from sqlalchemy.sql import func
+from src.db.base import Base
+
+class UserRecommendation(Base):
+    __tablename__ = "user_recommendations"
+
+    username = Column(String(50), primary_key=True)
+    rank = Column(Integer, primary_key=True)
+    book_id = Column(Integer, ForeignKey("books.id", ondelete="CASCADE"), nullable=False)
+    score = Column(Float, nullable=False)
+    computed_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False, index=True)
@@ -5,10 +5,18 @@ from typing import Optional, Tuple, List
 import sqlalchemy as sa
 from sqlalchemy import select, func
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import contains_eager, joinedload
 
 from src.models.book import Book
 from src.models.author import Author
 
+_SORT_COLUMNS = {
+    "title": Book.title,
+    "author": Author.name,
+    "year": Book.published_year,
+    "isbn": Book.isbn,
+}
+
 
 class BookRepository:
     def __init__(self, db: AsyncSession):
@@ -27,7 +35,15 @@ class BookRepository:
         isbn: Optional[str] = None,
         year_from: Optional[int] = None,
         year_to: Optional[int] = None,
+        sort_by: Optional[str] = None,
+        sort_dir: str = "asc",
+        as_rows: bool = False,
     ) -> Tuple[List[Book], int]:
+        """A page of books and the total count.
+
+        With `as_rows`, items are plain dicts of the BookResponse fields read
+        straight from the columns, which skips building ORM objects.
+        """
         filters = []
         join_author = author_name is not None
 
@@ -48,21 +64,36 @@ class BookRepository:
         if year_to is not None:
             filters.append(Book.published_year <= year_to)
 
-        base_select = select(Book)
         base_count = select(func.count()).select_from(Book)
-
         if join_author:
-            base_select = base_select.join(Author)
             base_count = base_count.join(Author)
 
+        # authors come back in the same statement, so rendering a page costs no extra queries
+        if as_rows:
+            base_select = select(
+                Book.id, Book.title, Book.genre, Book.published_year, Author.name.label("author_name"), Book.isbn
+            ).outerjoin(Author)
+        elif join_author or sort_by == "author":
+            base_select = select(Book).outerjoin(Author).options(contains_eager(Book.author))
+        else:
+            base_select = select(Book).options(joinedload(Book.author))
+
+        sort_column = _SORT_COLUMNS.get(sort_by)
+        if sort_column is None:
+            order = (Book.id.desc(),)
+        elif sort_dir == "desc":
+            order = (sort_column.desc(), Book.id.desc())
+        else:
+            order = (sort_column.asc(), Book.id.asc())
+
         stmt = (
             base_select.where(*filters)
-            .order_by(Book.id.desc())
+            .order_by(*order)
             .limit(limit)
             .offset(offset)
         )
         res = await self.db.execute(stmt)
-        items = res.scalars().all()
+        items = [dict(row) for row in res.mappings()] if as_rows else res.scalars().all()
 
         count_stmt = base_count.where(*filters)
         total_res = await self.db.execute(count_stmt)
@@ -71,7 +102,7 @@ class BookRepository:
         return items, total
 
     async def get(self, book_id: int) -> Optional[Book]:
-        res = await self.db.execute(select(Book).where(Book.id == book_id))
+        res = await self.db.execute(select(Book).options(joinedload(Book.author)).where(Book.id == book_id))
         return res.scalars().first()
 
     async def create(
@@ -109,6 +109,22 @@ class BookResponse(BookInDBBase):
     pass
 
 
+def book_payload(book) -> dict:
+    """A Book as the BookResponse JSON object, built without validation.
+
+    None fields are left out, as `response_model_exclude_none` does.
+    """
+    payload = {
+        "id": book.id,
+        "title": book.title,
+        "genre": book.genre,
+        "published_year": book.published_year,
+        "author_name": book.author.name if book.author else None,
+        "isbn": book.isbn,
+    }
+    return {k: v for k, v in payload.items() if v is not None}
+
+
 class PaginatedBooks(BaseModel):
     items: List[BookResponse]
     total: int
@@ -13,6 +13,7 @@ class UserResponse(BaseModel):
 class Token(BaseModel):
     access_token: str
     token_type: str
+    refresh_token: Optional[str] = None
 
 class TokenRefresh(BaseModel):
     refresh_token: str
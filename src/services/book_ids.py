@@ -0,0 +1,140 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+from typing import Iterable, Optional
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.core.metrics import Counter
+from src.models.book import Book
+
+log = logging.getLogger(__name__)
+
+BOOK_ID_LOOKUPS = Counter(
+    "book_id_lookups_total",
+    "Book existence checks by how they were answered: bitmap hit, invalid id or DB fallback.",
+    labelnames=("result",),
+)
+
+
+class BookIdSet:
+    """Bitmap over integer book ids, one bit per id.
+
+    A set bit means the book exists. A clear bit proves nothing: sequence ids
+    are allocated in one order but may commit in another, so a lower id can
+    appear after a higher one was loaded, and other workers create books too.
+    Clear bits are reported as unknown and left to the DB.
+    """
+
+    __slots__ = ("_bits",)
+
+    def __init__(self, ids: Iterable[int] = ()):
+        self._bits = bytearray()
+        for i in ids:
+            self.add(i)
+
+    def add(self, book_id: int) -> None:
+        byte = book_id >> 3
+        if byte >= len(self._bits):
+            self._bits.extend(bytes(byte + 1 - len(self._bits)))
+        self._bits[byte] |= 1 << (book_id & 7)
+
+    def discard(self, book_id: int) -> None:
+        byte = book_id >> 3
+        if byte < len(self._bits):
+            self._bits[byte] &= ~(1 << (book_id & 7)) & 0xFF
+
+    def lookup(self, book_id: int) -> Optional[bool]:
+        """True when the book is known to exist, False for ids no sequence hands out, None otherwise."""
+        if book_id <= 0:
+            return False
+        byte = book_id >> 3
+        if byte < len(self._bits) and self._bits[byte] & (1 << (book_id & 7)):
+            return True
+        return None
+
+
+_ids: Optional[BookIdSet] = None
+_ids_lock = asyncio.Lock()
+
+
+async def load_book_ids(db: AsyncSession) -> BookIdSet:
+    result = await db.stream_scalars(select(Book.id).execution_options(yield_per=50_000))
+    ids = BookIdSet()
+    async for book_id in result:
+        ids.add(book_id)
+    return ids
+
+
+async def get_book_ids(db: AsyncSession) -> BookIdSet:
+    global _ids
+    if _ids is not None:
+        return _ids
+    async with _ids_lock:
+        if _ids is None:
+            _ids = await load_book_ids(db)
+    return _ids
+
+
+def loaded_book_ids() -> Optional[BookIdSet]:
+    return _ids
+
+
+async def resync_book_ids(db: AsyncSession) -> None:
+    global _ids
+    _ids = await load_book_ids(db)
+
+
+async def resync_book_ids_forever(session_factory, interval: float) -> None:
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            async with session_factory() as db:
+                await resync_book_ids(db)
+        except Exception:
+            log.exception("book id bitmap resync failed")
+
+
+async def confirm_book_ids(db: AsyncSession, book_ids: Iterable[int]) -> set[int]:
+    """Ask the DB which ids exist and correct the bitmap accordingly."""
+    wanted = set(book_ids)
+    if not wanted:
+        return set()
+    found = set((await db.execute(select(Book.id).where(Book.id.in_(wanted)))).scalars().all())
+    ids = loaded_book_ids()
+    if ids is not None:
+        for i in found:
+            ids.add(i)
+        for i in wanted - found:
+            ids.discard(i)
+    return found
+
+
+async def existing_book_ids(db: AsyncSession, book_ids: Iterable[int]) -> set[int]:
+    """Subset of `book_ids` that exist; only ids the bitmap cannot answer hit the DB."""
+    ids = await get_book_ids(db)
+    found: set[int] = set()
+    unknown: list[int] = []
+    absent = 0
+    for i in set(book_ids):
+        hit = ids.lookup(i)
+        if hit is None:
+            unknown.append(i)
+        elif hit:
+            found.add(i)
+        else:
+            absent += 1
+    if found:
+        BOOK_ID_LOOKUPS.inc(len(found), result="hit")
+    if absent:
+        BOOK_ID_LOOKUPS.inc(absent, result="absent")
+    if unknown:
+        BOOK_ID_LOOKUPS.inc(len(unknown), result="db")
+        found |= await confirm_book_ids(db, unknown)
+    return found
+
+
+async def book_exists(db: AsyncSession, book_id: int) -> bool:
+    return book_id in await existing_book_ids(db, [book_id])
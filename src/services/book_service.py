@@ -4,6 +4,9 @@ from sqlalchemy import select
 from src.repositories.book_repo import BookRepository
 from src.models.book import Book
 from src.models.author import Author
+from src.services.book_ids import loaded_book_ids
+from src.services.content_index import loaded_content_index
+from src.services.rec_engine import invalidate_catalog
 
 class BookService:
     def __init__(self, db: AsyncSession):
@@ -21,6 +24,21 @@ class BookService:
     async def _author_by_name(self, name: str) -> Optional[Author]:
         return (await self.db.execute(select(Author).where(Author.name == name))).scalars().first()
 
+    async def _after_write(self, obj: Book, author_name: Optional[str] = None, deleted: bool = False) -> None:
+        invalidate_catalog()
+        ids = loaded_book_ids()
+        if ids is not None:
+            if deleted: ids.discard(obj.id)
+            else: ids.add(obj.id)
+        index = loaded_content_index()
+        if index is None: return
+        if deleted:
+            index.remove(obj.id); return
+        if author_name is None and obj.author_id is not None:
+            author = await self.db.get(Author, obj.author_id)
+            author_name = author.name if author else None
+        index.upsert(obj.id, obj.title, obj.genre, author_name)
+
     async def create(self, *, title: str, genre: str, published_year: int, author_name: str, isbn: Optional[str]) -> Book:
         author = await self._author_by_name(author_name.strip())
         if not author: raise ValueError("author_not_found")
@@ -29,19 +47,24 @@ class BookService:
         try:
             obj = await self.repo.create(title=title, genre=genre, published_year=published_year, author_id=author.id, isbn=isbn)
             await self.repo.save()
-            return obj
         except Exception:
             await self.repo.rollback(); raise
+        await self._after_write(obj, author.name)
+        return obj
 
-    async def update(self, *, book_id: int, title: str, genre: str, published_year: int, author_name: Optional[str], isbn: Optional[str] = None) -> Book:
+    async def update(self, *, book_id: int, title: Optional[str] = None, genre: Optional[str] = None, published_year: Optional[int] = None, author_name: Optional[str] = None, isbn: Optional[str] = None) -> Book:
+        """Fields left as None keep their current value."""
         obj = await self.get_or_404(book_id)
+        if title is None: title = obj.title
+        if genre is None: genre = obj.genre
+        if published_year is None: published_year = obj.published_year
         if author_name is not None:
             if not author_name.strip(): raise ValueError("bad_author_name")
             author = await self._author_by_name(author_name.strip())
             if not author: raise ValueError("author_not_found")
-            new_author_id = author.id
+            new_author_id, new_author_name = author.id, author.name
         else:
-            new_author_id = obj.author_id
+            new_author_id, new_author_name = obj.author_id, None
 
         if isbn is not None:
             if isbn and await self.repo.get_by_isbn(isbn, exclude_id=obj.id): raise ValueError("isbn_conflict")
@@ -53,9 +76,10 @@ class BookService:
         try:
             obj = await self.repo.update(obj, title=title, genre=genre, published_year=published_year, author_id=new_author_id, isbn=isbn)
             await self.repo.save()
-            return obj
         except Exception:
             await self.repo.rollback(); raise
+        await self._after_write(obj, new_author_name)
+        return obj
 
     async def delete(self, *, book_id: int) -> None:
         obj = await self.get_or_404(book_id)
@@ -64,3 +88,4 @@ class BookService:
             await self.repo.save()
         except Exception:
             await self.repo.rollback(); raise
+        await self._after_write(obj, deleted=True)
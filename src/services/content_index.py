@@ -0,0 +1,370 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import re
+import shutil
+import tempfile
+import time
+import zlib
+from itertools import chain
+from typing import Any, Iterable, Optional, Sequence
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.core.config import settings
+from src.models.author import Author
+from src.models.book import Book
+
+log = logging.getLogger(__name__)
+
+_WORD = re.compile(r"\w+", re.UNICODE)
+
+# weight of each feature family before L2 normalisation
+TITLE_WORD_WEIGHT = 1.0
+TITLE_TRIGRAM_WEIGHT = 0.5
+GENRE_WEIGHT = 2.0
+AUTHOR_WEIGHT = 3.0
+
+
+def _tokens(title: Optional[str], genre: Optional[str], author_name: Optional[str]) -> Iterable[tuple[str, float]]:
+    text = (title or "").lower()
+    for w in _WORD.findall(text):
+        yield "w:" + w, TITLE_WORD_WEIGHT
+    padded = f"  {text} "
+    for i in range(len(padded) - 2):
+        yield "t:" + padded[i:i + 3], TITLE_TRIGRAM_WEIGHT
+    if genre:
+        yield "g:" + genre.lower(), GENRE_WEIGHT
+    if author_name:
+        yield "a:" + author_name.strip().lower(), AUTHOR_WEIGHT
+
+
+def embed(title: Optional[str], genre: Optional[str], author_name: Optional[str], dim: int) -> np.ndarray:
+    """Signed feature hashing into a unit-length float32 vector.
+
+    crc32 keeps buckets stable across processes so snapshots stay valid.
+    """
+    vec = np.zeros(dim, dtype=np.float32)
+    for tok, weight in _tokens(title, genre, author_name):
+        h = zlib.crc32(tok.encode("utf-8"))
+        vec[h % dim] += weight if (h >> 31) & 1 else -weight
+    norm = float(np.linalg.norm(vec))
+    if norm:
+        vec /= norm
+    return vec
+
+
+class ContentIndex:
+    """Contiguous float32 matrix of book embeddings, queried with dot products.
+
+    Small catalogs are searched exhaustively. After `train`, rows are also filed into
+    inverted lists (IVF) and a lookup scores only the lists nearest the query, so its
+    cost grows with sqrt(N) instead of N, at the price of occasionally missing a
+    neighbour that was filed under a list not probed.
+    """
+
+    def __init__(self, dim: int, capacity: int = 1024):
+        self.dim = dim
+        self.ids = np.zeros(capacity, dtype=np.int64)
+        self.matrix = np.zeros((capacity, dim), dtype=np.float32)
+        self.size = 0
+        self._pos: dict[int, int] = {}
+        self.centroids: Optional[np.ndarray] = None
+        self.probes = 8
+        self.cluster = np.zeros(capacity, dtype=np.int32)  # list of each row, once trained
+        self._lists: list[list[int]] = []
+        # while a replacement is being built, writes are recorded here and replayed onto it
+        self.journal: Optional[list[tuple[str, tuple]]] = None
+
+    def __len__(self) -> int:
+        return self.size
+
+    def __contains__(self, book_id: int) -> bool:
+        return book_id in self._pos
+
+    def _writable(self, min_capacity: int) -> None:
+        # a snapshot loaded with mmap_mode="r" is copied into memory on first write
+        if not self.matrix.flags.writeable or not self.ids.flags.writeable or not self.cluster.flags.writeable:
+            self.matrix = np.array(self.matrix)
+            self.ids = np.array(self.ids)
+            self.cluster = np.array(self.cluster)
+        if min_capacity > len(self.ids):
+            cap = max(min_capacity, 2 * len(self.ids), 1024)
+            matrix = np.zeros((cap, self.dim), dtype=np.float32)
+            matrix[:self.size] = self.matrix[:self.size]
+            ids = np.zeros(cap, dtype=np.int64)
+            ids[:self.size] = self.ids[:self.size]
+            cluster = np.zeros(cap, dtype=np.int32)
+            cluster[:self.size] = self.cluster[:self.size]
+            self.matrix, self.ids, self.cluster = matrix, ids, cluster
+
+    def upsert(self, book_id: int, title: Optional[str], genre: Optional[str], author_name: Optional[str]) -> None:
+        if self.journal is not None:
+            self.journal.append(("upsert", (book_id, title, genre, author_name)))
+        pos = self._pos.get(book_id)
+        self._writable(self.size + (pos is None))
+        new = pos is None
+        if new:
+            pos = self.size
+            self.size += 1
+            self._pos[book_id] = pos
+            self.ids[pos] = book_id
+        vec = embed(title, genre, author_name, self.dim)
+        self.matrix[pos] = vec
+        if self.centroids is not None:
+            c = int(np.argmax(self.centroids @ vec))
+            if new:
+                self._lists[c].append(pos)
+            elif c != self.cluster[pos]:
+                self._lists[self.cluster[pos]].remove(pos)
+                self._lists[c].append(pos)
+            self.cluster[pos] = c
+
+    def remove(self, book_id: int) -> None:
+        if self.journal is not None:
+            self.journal.append(("remove", (book_id,)))
+        pos = self._pos.pop(book_id, None)
+        if pos is None:
+            return
+        self._writable(self.size)
+        last = self.size - 1
+        if self.centroids is not None:
+            self._lists[self.cluster[pos]].remove(pos)
+            if pos != last:
+                moved = self._lists[self.cluster[last]]
+                moved[moved.index(last)] = pos
+                self.cluster[pos] = self.cluster[last]
+        if pos != last:
+            self.matrix[pos] = self.matrix[last]
+            self.ids[pos] = self.ids[last]
+            self._pos[int(self.ids[pos])] = pos
+        self.size = last
+
+    def train(self, n_lists: int, probes: int, iterations: int = 10, seed: int = 0) -> None:
+        """File every row into one of `n_lists` inverted lists (spherical k-means on a sample);
+        lookups then score the `probes` lists nearest the query."""
+        data = self.matrix[:self.size]
+        n_lists = max(1, min(n_lists, self.size))
+        rng = np.random.default_rng(seed)
+        sample = data[np.sort(rng.choice(self.size, min(self.size, 64 * n_lists), replace=False))]
+        centroids = sample[rng.choice(len(sample), n_lists, replace=False)]
+        for _ in range(iterations):
+            assign = np.argmax(sample @ centroids.T, axis=1)
+            order = np.argsort(assign, kind="stable")
+            starts = np.searchsorted(assign[order], np.arange(n_lists))
+            sums = np.add.reduceat(sample[order], np.minimum(starts, len(sample) - 1), axis=0)
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            # an empty list keeps its centroid (reduceat gave it a neighbour's row, ignore that)
+            keep = (np.bincount(assign, minlength=n_lists) == 0)[:, None] | (norms == 0)
+            centroids = np.where(keep, centroids, sums / np.where(norms == 0, 1, norms)).astype(np.float32)
+        self._writable(self.size)
+        for start in range(0, self.size, 65536):
+            chunk = self.matrix[start:start + 65536]
+            self.cluster[start:start + len(chunk)] = np.argmax(chunk @ centroids.T, axis=1)
+        # store each list's rows next to each other: a lookup then reads a few contiguous
+        # runs of the matrix instead of gathering rows from all over it
+        order = np.argsort(self.cluster[:self.size], kind="stable")
+        self.matrix[:self.size] = self.matrix[order]
+        self.ids[:self.size] = self.ids[order]
+        self.cluster[:self.size] = self.cluster[order]
+        self._pos = {int(b): i for i, b in enumerate(self.ids[:self.size])}
+        self.centroids, self.probes = centroids, probes
+        self._build_lists()
+
+    def _build_lists(self) -> None:
+        cluster = self.cluster[:self.size]
+        order = np.argsort(cluster, kind="stable")
+        bounds = np.searchsorted(cluster[order], np.arange(len(self.centroids) + 1))
+        self._lists = [order[a:b].tolist() for a, b in zip(bounds[:-1], bounds[1:])]
+
+    def _scores(self, rows: list[int]) -> list[tuple[Optional[np.ndarray], np.ndarray]]:
+        """(positions scored, scores) per query row; positions None means every row."""
+        if self.centroids is None:
+            return [(None, s) for s in self.matrix[rows] @ self.matrix[:self.size].T]
+        probes = min(self.probes, len(self.centroids))
+        nearest = np.argpartition(-(self.matrix[rows] @ self.centroids.T), probes - 1, axis=1)[:, :probes]
+        out = []
+        for r, lists in zip(rows, nearest):
+            positions = np.fromiter(chain.from_iterable(self._lists[c] for c in lists), dtype=np.int64)
+            out.append((positions, self.matrix[positions] @ self.matrix[r]))
+        return out
+
+    def similar_many(self, book_ids: Sequence[int], limit: int) -> list[list[int]]:
+        """Nearest neighbours for several books: one matrix product over the catalog,
+        or over the probed inverted lists once the index is trained."""
+        rows = [self._pos.get(b) for b in book_ids]
+        present = [r for r in rows if r is not None]
+        out: list[list[int]] = [[] for _ in book_ids]
+        if not present or limit <= 0:
+            return out
+        scored = iter(self._scores(present))
+        for i, r in enumerate(rows):
+            if r is None:
+                continue
+            positions, s = next(scored)
+            s[r if positions is None else positions == r] = -np.inf
+            k = min(limit, len(s))
+            top = np.argpartition(-s, k - 1)[:k]
+            top = top[np.argsort(-s[top], kind="stable")]
+            top = top[np.isfinite(s[top])]
+            out[i] = self.ids[top if positions is None else positions[top]].tolist()
+        return out
+
+    def similar(self, book_id: int, limit: int) -> list[int]:
+        return self.similar_many([book_id], limit)[0]
+
+    def replay(self, journal: Iterable[tuple[str, tuple]]) -> None:
+        for op, args in journal:
+            getattr(self, op)(*args)
+
+    def save(self, directory: str) -> None:
+        """Write a snapshot into a build directory of its own, then repoint `current` at it.
+
+        Swapping a symlink is atomic, so a reader never pairs ids from one build
+        with a matrix from another, even with several workers saving at once.
+        """
+        os.makedirs(directory, exist_ok=True)
+        build = tempfile.mkdtemp(prefix=f"build-{time.time_ns()}-", dir=directory)
+        np.save(os.path.join(build, "ids.npy"), np.ascontiguousarray(self.ids[:self.size]))
+        np.save(os.path.join(build, "matrix.npy"), np.ascontiguousarray(self.matrix[:self.size]))
+        if self.centroids is not None:
+            np.save(os.path.join(build, "centroids.npy"), self.centroids)
+            np.save(os.path.join(build, "cluster.npy"), np.ascontiguousarray(self.cluster[:self.size]))
+        link = os.path.join(directory, f".current-{os.path.basename(build)}")
+        os.symlink(os.path.basename(build), link)
+        os.replace(link, os.path.join(directory, "current"))
+        # keep the previous build: a reader may be between resolving `current` and opening it
+        builds = sorted(n for n in os.listdir(directory) if n.startswith("build-"))
+        live = os.path.basename(os.path.realpath(os.path.join(directory, "current")))
+        for name in builds[:-2]:
+            if name != live:
+                shutil.rmtree(os.path.join(directory, name), ignore_errors=True)
+
+    @staticmethod
+    def snapshot_age(directory: str) -> Optional[float]:
+        """Seconds since the current snapshot was written, or None if there is none."""
+        try:
+            return max(0.0, time.time() - os.path.getmtime(os.path.join(directory, "current", "matrix.npy")))
+        except OSError:
+            return None
+
+    @classmethod
+    def load(cls, directory: str, probes: int = 8) -> "ContentIndex":
+        build = os.path.realpath(os.path.join(directory, "current"))
+        ids = np.load(os.path.join(build, "ids.npy"), mmap_mode="r")
+        matrix = np.load(os.path.join(build, "matrix.npy"), mmap_mode="r")
+        if len(ids) != len(matrix):
+            raise ValueError(f"content index snapshot {build} is inconsistent: {len(ids)} ids, {len(matrix)} rows")
+        idx = cls(dim=matrix.shape[1], capacity=0)
+        idx.ids, idx.matrix, idx.size = ids, matrix, len(ids)
+        idx._pos = {int(b): i for i, b in enumerate(ids)}
+        idx.cluster = np.zeros(len(ids), dtype=np.int32)
+        if os.path.exists(os.path.join(build, "centroids.npy")):
+            cluster = np.load(os.path.join(build, "cluster.npy"), mmap_mode="r")
+            if len(cluster) != len(ids):
+                raise ValueError(f"content index snapshot {build} is inconsistent: {len(ids)} ids, {len(cluster)} list entries")
+            idx.cluster, idx.probes = cluster, probes
+            idx.centroids = np.load(os.path.join(build, "centroids.npy"))
+            idx._build_lists()
+        return idx
+
+
+def _index_from_rows(rows: Sequence[Any], dim: int, ivf_min_books: int = 0, probes: int = 8) -> ContentIndex:
+    idx = ContentIndex(dim=dim, capacity=max(len(rows), 1))
+    for book_id, title, genre, author_name in rows:
+        idx.upsert(book_id, title, genre, author_name)
+    if ivf_min_books and len(idx) >= ivf_min_books:
+        idx.train(n_lists=int(2 * np.sqrt(len(idx))), probes=probes)
+    return idx
+
+
+async def build_content_index(db: AsyncSession, dim: int) -> ContentIndex:
+    rows = (await db.execute(
+        select(Book.id, Book.title, Book.genre, Author.name).outerjoin(Author, Author.id == Book.author_id)
+    )).all()
+    # hashing every title is pure-Python CPU work: keep it off the event loop
+    return await asyncio.to_thread(
+        _index_from_rows, rows, dim, settings.CONTENT_INDEX_IVF_MIN_BOOKS, settings.CONTENT_INDEX_IVF_PROBES
+    )
+
+
+_index: Optional[ContentIndex] = None
+_index_built_at: float = 0.0
+_index_lock = asyncio.Lock()
+
+
+def loaded_content_index() -> Optional[ContentIndex]:
+    return _index
+
+
+async def _rebuild(db: AsyncSession) -> ContentIndex:
+    """Build a fresh index while the current one keeps serving, then swap it in."""
+    global _index, _index_built_at
+    old = _index
+    if old is not None:
+        old.journal = []
+    try:
+        new = await build_content_index(db, settings.CONTENT_INDEX_DIM)
+        if settings.CONTENT_INDEX_SNAPSHOT_DIR:
+            await asyncio.to_thread(new.save, settings.CONTENT_INDEX_SNAPSHOT_DIR)
+    except BaseException:
+        if old is not None:
+            old.journal = None
+        raise
+    journal = old.journal if old is not None else []
+    if old is not None:
+        old.journal = None
+    # no await between replaying and swapping: no write can slip in between
+    new.replay(journal)
+    _index, _index_built_at = new, time.monotonic()
+    return new
+
+
+async def get_content_index(db: AsyncSession) -> ContentIndex:
+    """The loaded index; built here only when nothing is loaded yet.
+
+    Refreshing a stale index is `refresh_content_index_forever`'s job, so
+    requests never wait for a rebuild once an index exists.
+    """
+    if _index is not None:
+        return _index
+    async with _index_lock:
+        if _index is None:
+            await _rebuild(db)
+    return _index
+
+
+async def refresh_content_index_forever(session_factory) -> None:
+    while True:
+        age = time.monotonic() - _index_built_at if _index is not None else settings.CONTENT_INDEX_TTL_SEC
+        await asyncio.sleep(max(settings.CONTENT_INDEX_TTL_SEC - age, 0.0))
+        try:
+            async with _index_lock:
+                async with session_factory() as db:
+                    await _rebuild(db)
+        except Exception:
+            log.exception("content index rebuild failed; serving the previous one")
+            await asyncio.sleep(min(settings.CONTENT_INDEX_TTL_SEC, 60.0))
+
+
+async def warm_content_index(db: AsyncSession) -> None:
+    """Load the snapshot if present, otherwise build from the DB (and write a snapshot).
+
+    A loaded snapshot keeps its age, so an old one is refreshed on schedule
+    rather than served for another full TTL.
+    """
+    global _index, _index_built_at
+    snap = settings.CONTENT_INDEX_SNAPSHOT_DIR
+    age = ContentIndex.snapshot_age(snap) if snap else None
+    if age is not None:
+        try:
+            _index = await asyncio.to_thread(ContentIndex.load, snap, settings.CONTENT_INDEX_IVF_PROBES)
+            _index_built_at = time.monotonic() - age
+            return
+        except Exception:
+            log.exception("failed to load content index snapshot from %s", snap)
+    await get_content_index(db)
@@ -0,0 +1,268 @@
+from __future__ import annotations
+
+import asyncio
+import glob
+import json
+import logging
+import os
+import time
+from datetime import datetime
+from typing import Callable, Iterable, Optional
+
+from sqlalchemy import insert, select
+from sqlalchemy.exc import DBAPIError, InterfaceError, OperationalError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.core.metrics import Counter
+from src.models.book import Book
+from src.models.user_book_event import UserBookEvent
+
+log = logging.getLogger(__name__)
+
+EVENTS_INGESTED = Counter("user_events_ingested_total", "User book events accepted, by write path.", labelnames=("path",))
+EVENTS_REJECTED = Counter("user_events_rejected_total", "User book events refused because the write-behind queue was full.")
+EVENTS_FLUSHED = Counter("user_events_flushed_total", "User book events written by the write-behind flusher.")
+EVENTS_DROPPED = Counter("user_events_dropped_total", "Buffered user book events dropped at flush time.", labelnames=("reason",))
+EVENT_FLUSHES = Counter("user_event_flushes_total", "Write-behind flush batches.")
+EVENT_FLUSH_RETRIES = Counter("user_event_flush_retries_total", "Write-behind flush attempts retried after a transient DB error.")
+EVENTS_REQUEUED = Counter("user_events_requeued_total", "Buffered user book events put back on the queue after a failed flush.")
+EVENTS_SPILLED = Counter("user_events_spilled_total", "Buffered user book events written to EVENTS_SPILL_DIR after a failed flush.")
+
+
+def _transient(e: BaseException) -> bool:
+    """Errors a retry can fix: lost connections, failovers, timeouts."""
+    if isinstance(e, DBAPIError):
+        return e.connection_invalidated or isinstance(e, (OperationalError, InterfaceError))
+    return isinstance(e, (OSError, asyncio.TimeoutError))
+
+
+def _spill(directory: str, rows: list[dict]) -> str:
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"events-{os.getpid()}-{time.time_ns()}.jsonl")
+    with open(path + ".tmp", "w") as f:
+        for r in rows:
+            f.write(json.dumps({**r, "created_at": r["created_at"].isoformat() if r.get("created_at") else None}) + "\n")
+    os.replace(path + ".tmp", path)
+    return path
+
+
+def _claim_spilled(directory: str) -> list[dict]:
+    """Read and delete spill files; a file another worker renamed first is skipped."""
+    rows: list[dict] = []
+    for path in sorted(glob.glob(os.path.join(directory, "events-*.jsonl"))):
+        claimed = f"{path}.{os.getpid()}.claimed"
+        try:
+            os.replace(path, claimed)
+        except FileNotFoundError:
+            continue
+        with open(claimed) as f:
+            for line in f:
+                r = json.loads(line)
+                if r.get("created_at"):
+                    r["created_at"] = datetime.fromisoformat(r["created_at"])
+                rows.append(r)
+        os.remove(claimed)
+    return rows
+
+
+async def insert_events(db: AsyncSession, rows: list[dict]) -> None:
+    """One multi-row INSERT for a batch of user_book_events rows."""
+    if rows:
+        await db.execute(insert(UserBookEvent), rows)
+
+
+class EventBuffer:
+    """Bounded in-process queue of user events flushed in batches by a background task.
+
+    A batch is written when `batch_size` events are waiting or `flush_interval_ms`
+    has passed since the first one arrived, whichever comes first.
+
+    Transient DB errors are retried `flush_retries` times with exponential
+    backoff. A batch that still fails goes back on the queue while there is
+    room, so a failover costs latency rather than events; when there is no
+    room, or the buffer is shutting down, it is written to `spill_dir` and
+    re-queued by the next buffer that starts. Only rows that fail for good
+    (or have nowhere to go) are dropped.
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable[[], AsyncSession],
+        *,
+        max_queue: int = 10_000,
+        batch_size: int = 500,
+        flush_interval_ms: int = 200,
+        on_flushed: Optional[Callable[[set[str]], None]] = None,
+        flush_retries: int = 3,
+        retry_delay_ms: int = 100,
+        spill_dir: Optional[str] = None,
+    ):
+        self.session_factory = session_factory
+        self.flush_retries = flush_retries
+        self.retry_delay = retry_delay_ms / 1000.0
+        self.spill_dir = spill_dir
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval_ms / 1000.0
+        self.on_flushed = on_flushed
+        self._queue: asyncio.Queue[dict] = asyncio.Queue(maxsize=max_queue)
+        self._task: Optional[asyncio.Task] = None
+        self._inflight: Optional[asyncio.Future] = None
+        self._pending: list[dict] = []
+        self._closing = False
+
+    @property
+    def depth(self) -> int:
+        return self._queue.qsize()
+
+    def offer(self, rows: Iterable[dict]) -> bool:
+        """Enqueue all rows or none; False means the caller should back off."""
+        rows = list(rows)
+        if self._closing or self._queue.maxsize - self._queue.qsize() < len(rows):
+            EVENTS_REJECTED.inc(len(rows))
+            return False
+        for r in rows:
+            self._queue.put_nowait(r)
+        EVENTS_INGESTED.inc(len(rows), path="buffered")
+        return True
+
+    def start(self) -> None:
+        if self._task is None:
+            if self.spill_dir:
+                self._restore_spilled()
+            self._task = asyncio.create_task(self._run(), name="user-event-flusher")
+
+    async def stop(self) -> None:
+        """Refuse new events, then flush everything still queued."""
+        self._closing = True
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._inflight is not None:
+            await self._inflight
+            self._inflight = None
+        leftover, self._pending = self._pending, []
+        leftover.extend(self._drain(self._queue.qsize()))
+        for i in range(0, len(leftover), self.batch_size):
+            await self._flush(leftover[i:i + self.batch_size])
+
+    def _drain(self, limit: int) -> list[dict]:
+        batch: list[dict] = []
+        while len(batch) < limit and not self._queue.empty():
+            batch.append(self._queue.get_nowait())
+        return batch
+
+    def _restore_spilled(self) -> None:
+        # runs once at startup, before the app serves: plain file I/O is fine here
+        try:
+            rows = _claim_spilled(self.spill_dir)
+        except OSError:
+            log.exception("failed to read spilled user events from %s", self.spill_dir)
+            return
+        room = self._queue.maxsize - self._queue.qsize()
+        for r in rows[:room]:
+            self._queue.put_nowait(r)
+        if rows[room:]:
+            _spill(self.spill_dir, rows[room:])
+        if rows:
+            log.info("re-queued %d spilled user events", min(len(rows), room))
+
+    async def _run(self) -> None:
+        # the batch being collected lives on self so stop() can flush it after cancelling us
+        while True:
+            self._pending = [await self._queue.get()]
+            deadline = time.monotonic() + self.flush_interval
+            while len(self._pending) < self.batch_size:
+                self._pending.extend(self._drain(self.batch_size - len(self._pending)))
+                remaining = deadline - time.monotonic()
+                if len(self._pending) >= self.batch_size or remaining <= 0:
+                    break
+                try:
+                    self._pending.append(await asyncio.wait_for(self._queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+            batch, self._pending = self._pending, []
+            self._inflight = asyncio.ensure_future(self._flush(batch))
+            await asyncio.shield(self._inflight)
+            self._inflight = None
+
+    async def _write(self, batch: list[dict]) -> list[dict]:
+        async with self.session_factory() as db:
+            # books deleted since the request was validated would fail the whole INSERT
+            wanted = {r["book_id"] for r in batch}
+            existing = set((await db.execute(select(Book.id).where(Book.id.in_(wanted)))).scalars().all())
+            rows = [r for r in batch if r["book_id"] in existing]
+            await insert_events(db, rows)
+            await db.commit()
+        return rows
+
+    async def _flush(self, batch: list[dict]) -> None:
+        if not batch:
+            return
+        delay = self.retry_delay
+        for attempt in range(self.flush_retries + 1):
+            try:
+                rows = await self._write(batch)
+                break
+            except Exception as e:
+                if not _transient(e):
+                    EVENTS_DROPPED.inc(len(batch), reason="error")
+                    log.exception("failed to flush %d user events", len(batch))
+                    return
+                if attempt == self.flush_retries:
+                    log.warning("flushing %d user events failed %d times: %s", len(batch), attempt + 1, e)
+                    await self._keep(batch)
+                    return
+                EVENT_FLUSH_RETRIES.inc()
+                log.warning("flushing %d user events failed, retrying in %.2fs: %s", len(batch), delay, e)
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 5.0)
+        if len(rows) != len(batch):
+            EVENTS_DROPPED.inc(len(batch) - len(rows), reason="book_missing")
+        EVENT_FLUSHES.inc()
+        EVENTS_FLUSHED.inc(len(rows))
+        if self.on_flushed is not None:
+            self.on_flushed({r["username"] for r in rows})
+
+    async def _keep(self, batch: list[dict]) -> None:
+        """Requeue a batch that could not be written; spill it to disk if it does not fit."""
+        if not self._closing and self._queue.maxsize - self._queue.qsize() >= len(batch):
+            for r in batch:
+                self._queue.put_nowait(r)
+            EVENTS_REQUEUED.inc(len(batch))
+            return
+        if self.spill_dir:
+            try:
+                path = await asyncio.to_thread(_spill, self.spill_dir, batch)
+            except OSError:
+                log.exception("failed to spill %d user events to %s", len(batch), self.spill_dir)
+            else:
+                EVENTS_SPILLED.inc(len(batch))
+                log.warning("spilled %d user events to %s", len(batch), path)
+                return
+        EVENTS_DROPPED.inc(len(batch), reason="error")
+        log.error("dropped %d user events: no room to requeue and no spill directory", len(batch))
+
+
+_buffer: Optional[EventBuffer] = None
+
+
+def get_event_buffer() -> Optional[EventBuffer]:
+    return _buffer
+
+
+def start_event_buffer(session_factory: Callable[[], AsyncSession], **kwargs) -> EventBuffer:
+    global _buffer
+    _buffer = EventBuffer(session_factory, **kwargs)
+    _buffer.start()
+    return _buffer
+
+
+async def stop_event_buffer() -> None:
+    global _buffer
+    if _buffer is not None:
+        await _buffer.stop()
+        _buffer = None
@@ -0,0 +1,148 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.core.config import settings
+from src.core.metrics import Counter
+from src.db.session import AsyncSessionLocal
+from src.schemas.book import BookResponse
+from src.services.recommendations import precomputed_for_user, recommend_for_user
+
+log = logging.getLogger(__name__)
+
+RECS_CACHE_REQUESTS = Counter(
+    "recs_cache_requests_total",
+    "Per-user recommendation cache lookups by result.",
+    labelnames=("result",),
+)
+
+
+class RecommendationCache:
+    """Per-user LRU of recommendation lists, invalidated by a version counter.
+
+    The version is bumped whenever the user records an event; entries computed
+    against an older version are treated as misses. Entries also expire after
+    `ttl_seconds` so that events handled by another worker are picked up.
+    """
+
+    def __init__(self, maxsize: int = 10_000, ttl_seconds: float = 60.0):
+        self.maxsize = maxsize
+        self.ttl_seconds = ttl_seconds
+        self._versions: OrderedDict[str, int] = OrderedDict()
+        self._entries: OrderedDict[str, tuple[int, float, Dict[int, List[BookResponse]]]] = OrderedDict()
+
+    def version(self, username: str) -> int:
+        return self._versions.get(username, 0)
+
+    def bump(self, username: str) -> int:
+        v = self._versions.pop(username, 0) + 1
+        self._versions[username] = v
+        while len(self._versions) > self.maxsize:
+            self._versions.popitem(last=False)
+        self._entries.pop(username, None)
+        return v
+
+    def bump_many(self, usernames: Iterable[str]) -> None:
+        for u in usernames:
+            self.bump(u)
+
+    def get(self, username: str, limit: int) -> Optional[List[BookResponse]]:
+        entry = self._entries.get(username)
+        if entry is not None:
+            version, expires_at, by_limit = entry
+            if version == self.version(username) and expires_at > time.monotonic():
+                items = by_limit.get(limit)
+                if items is not None:
+                    self._entries.move_to_end(username)
+                    RECS_CACHE_REQUESTS.inc(result="hit")
+                    return items
+            else:
+                del self._entries[username]
+        RECS_CACHE_REQUESTS.inc(result="miss")
+        return None
+
+    def put(self, username: str, limit: int, version: int, items: List[BookResponse]) -> None:
+        if version != self.version(username):
+            return
+        entry = self._entries.get(username)
+        if entry is None or entry[0] != version:
+            entry = (version, time.monotonic() + self.ttl_seconds, {})
+            self._entries[username] = entry
+        entry[2][limit] = items
+        self._entries.move_to_end(username)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        self._versions.clear()
+        self._entries.clear()
+
+
+_rec_cache: Optional[RecommendationCache] = None
+
+
+def get_rec_cache() -> RecommendationCache:
+    global _rec_cache
+    if _rec_cache is None:
+        _rec_cache = RecommendationCache(maxsize=settings.RECS_CACHE_MAXSIZE, ttl_seconds=settings.RECS_CACHE_TTL_SEC)
+    return _rec_cache
+
+
+async def cached_recommend_for_user(db: AsyncSession, username: str, limit: int = 10) -> List[BookResponse]:
+    rec_cache = get_rec_cache()
+    items = rec_cache.get(username, limit)
+    if items is not None:
+        return items
+    version = rec_cache.version(username)
+    rows = await precomputed_for_user(db, username=username, limit=limit)
+    if not rows:
+        rows = await recommend_for_user(db, username=username, limit=limit)
+    items = [
+        BookResponse(
+            id=b.id,
+            title=b.title,
+            genre=b.genre,
+            published_year=b.published_year,
+            author_name=b.author.name if b.author else None,
+            isbn=b.isbn,
+        )
+        for b in rows
+    ]
+    rec_cache.put(username, limit, version, items)
+    return items
+
+
+async def warm_user_recommendations(username: str, limit: int = 10) -> None:
+    try:
+        async with AsyncSessionLocal() as db:
+            await cached_recommend_for_user(db, username=username, limit=limit)
+    except Exception:
+        log.exception("failed to warm recommendations for %s", username)
+
+
+_warming: set[asyncio.Task] = set()
+
+
+async def _warm_many(usernames: List[str]) -> None:
+    # one after another: a large flush should not open a session per user at once
+    for username in usernames:
+        await warm_user_recommendations(username)
+
+
+def events_recorded(usernames: Iterable[str]) -> None:
+    """Invalidate the users' cached recommendations; with RECS_WARM_ON_EVENT, recompute them in the background.
+
+    Called by the write-behind flusher once their events are in the database.
+    """
+    usernames = list(usernames)
+    get_rec_cache().bump_many(usernames)
+    if settings.RECS_WARM_ON_EVENT and usernames:
+        task = asyncio.get_running_loop().create_task(_warm_many(usernames))
+        _warming.add(task)
+        task.add_done_callback(_warming.discard)
@@ -0,0 +1,123 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from typing import Optional, Sequence
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.models.book import Book
+
+YEAR_BUCKET = 10
+CATALOG_TTL_SEC = 300.0
+# relative weight of a shared genre / author / decade when scoring a candidate
+FEATURE_WEIGHTS = np.array([1.0, 2.0, 0.5], dtype=np.float32)
+
+
+class CatalogMatrix:
+    """Book x feature incidence matrix (genre, author, year bucket).
+
+    Every book has exactly one column per feature family, so the sparse matrix is
+    stored CSR-style as an (n_books, 3) array of column indices.
+    """
+
+    __slots__ = ("ids", "cols", "years", "n_features", "_no_author_col")
+
+    def __init__(self, ids: Sequence[int], genres: Sequence[Optional[str]], author_ids: Sequence[Optional[int]], years: Sequence[int]):
+        order = np.argsort(np.asarray(ids, dtype=np.int64), kind="stable")
+        self.ids = np.asarray(ids, dtype=np.int64)[order]
+        self.years = np.asarray(years, dtype=np.int32)[order]
+        genre_arr = np.asarray([g or "" for g in genres], dtype=object)[order]
+        author_arr = np.asarray([-1 if a is None else a for a in author_ids], dtype=np.int64)[order]
+
+        genre_vals, genre_codes = np.unique(genre_arr, return_inverse=True)
+        author_vals, author_codes = np.unique(author_arr, return_inverse=True)
+        year_vals, year_codes = np.unique(self.years // YEAR_BUCKET, return_inverse=True)
+        n_genres, n_authors = len(genre_vals), len(author_vals)
+
+        self.cols = np.empty((len(self.ids), 3), dtype=np.int32)
+        self.cols[:, 0] = genre_codes
+        self.cols[:, 1] = n_genres + author_codes
+        self.cols[:, 2] = n_genres + n_authors + year_codes
+        self.n_features = n_genres + n_authors + len(year_vals)
+        # books without an author must not share an "author" feature with each other
+        self._no_author_col = n_genres if n_authors and author_vals[0] == -1 else None
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def score(self, book_ids: Sequence[int], weights: Sequence[float]) -> np.ndarray:
+        """Affinity of every catalog book for a user given their (book_id, weight) interactions."""
+        scores = np.zeros(len(self.ids), dtype=np.float32)
+        if not len(self.ids) or not len(book_ids):
+            return scores
+        q = np.asarray(book_ids, dtype=np.int64)
+        w = np.asarray(weights, dtype=np.float32)
+        pos = np.searchsorted(self.ids, q)
+        pos[pos >= len(self.ids)] = 0
+        known = self.ids[pos] == q
+        pos, w = pos[known], w[known]
+        if not len(pos):
+            return scores
+
+        profile = np.bincount(self.cols[pos].ravel(), weights=np.repeat(w, 3), minlength=self.n_features).astype(np.float32)
+        if self._no_author_col is not None:
+            profile[self._no_author_col] = 0.0
+        scores = (profile[self.cols] * FEATURE_WEIGHTS).sum(axis=1)
+        scores[pos] = -np.inf
+        return scores
+
+    def top_n_scored(self, book_ids: Sequence[int], weights: Sequence[float], limit: int) -> list[tuple[int, float]]:
+        """(book_id, score) of the best `limit` unseen books, best first; newer books win ties."""
+        scores = self.score(book_ids, weights)
+        candidates = np.flatnonzero(scores > 0)
+        if not len(candidates) or limit <= 0:
+            return []
+        # fold the publication year in as a tie-breaker far below one feature weight
+        ranked = scores[candidates] + (self.years[candidates] - 1800).astype(np.float32) * 1e-5
+        k = min(limit, len(candidates))
+        top = np.argpartition(-ranked, k - 1)[:k]
+        top = top[np.argsort(-ranked[top], kind="stable")]
+        return list(zip(self.ids[candidates[top]].tolist(), scores[candidates[top]].tolist()))
+
+    def top_n(self, book_ids: Sequence[int], weights: Sequence[float], limit: int) -> list[int]:
+        return [i for i, _ in self.top_n_scored(book_ids, weights, limit)]
+
+
+CATALOG_COLUMNS = (Book.id, Book.genre, Book.author_id, Book.published_year)
+
+
+def catalog_from_rows(rows: Sequence[tuple]) -> CatalogMatrix:
+    return CatalogMatrix(
+        ids=[r[0] for r in rows],
+        genres=[r[1] for r in rows],
+        author_ids=[r[2] for r in rows],
+        years=[r[3] for r in rows],
+    )
+
+
+async def load_catalog(db: AsyncSession) -> CatalogMatrix:
+    return catalog_from_rows((await db.execute(select(*CATALOG_COLUMNS))).all())
+
+
+_catalog: Optional[CatalogMatrix] = None
+_catalog_loaded_at: float = 0.0
+_catalog_lock = asyncio.Lock()
+
+
+async def get_catalog(db: AsyncSession) -> CatalogMatrix:
+    global _catalog, _catalog_loaded_at
+    if _catalog is not None and (time.monotonic() - _catalog_loaded_at) < CATALOG_TTL_SEC:
+        return _catalog
+    async with _catalog_lock:
+        if _catalog is None or (time.monotonic() - _catalog_loaded_at) >= CATALOG_TTL_SEC:
+            _catalog = await load_catalog(db)
+            _catalog_loaded_at = time.monotonic()
+    return _catalog
+
+
+def invalidate_catalog() -> None:
+    global _catalog
+    _catalog = None
@@ -1,11 +1,26 @@
-from typing import List, Sequence, Optional
+import argparse
+import itertools
+import logging
+import os
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Iterable, Iterator, List, Optional, Sequence
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import and_, func, case, desc, select
-from sqlalchemy.orm import selectinload
+from sqlalchemy.orm import Session, selectinload
+from sqlalchemy import and_, delete, exists, func, case, insert, select, true
+from src.core.config import settings
 from src.models.book import Book
 from src.models.user_book_event import UserBookEvent
+from src.models.user_recommendation import UserRecommendation
+from src.services.content_index import get_content_index
+from src.services.rec_engine import CATALOG_COLUMNS, CatalogMatrix, catalog_from_rows, get_catalog
+
+log = logging.getLogger(__name__)
 
 async def recommend_for_book(db: AsyncSession, book_id: int, by: str = "hybrid", limit: int = 10) -> List[Book]:
+    if by == "content":
+        index = await get_content_index(db)
+        return await books_by_ids(db, index.similar(book_id, limit))
     base = (await db.execute(select(Book).options(selectinload(Book.author)).where(Book.id == book_id))).scalars().first()
     if not base: return []
     recs: list[Book] = []
@@ -22,31 +37,137 @@ async def recommend_for_book(db: AsyncSession, book_id: int, by: str = "hybrid",
         recs.extend((await db.execute(q)).scalars().all())
     return recs[:limit]
 
-async def recommend_for_user(db: AsyncSession, username: str, limit: int = 10) -> List[Book]:
-    w = (case((UserBookEvent.event=="like",3), else_=1) + case((UserBookEvent.event=="rate",2), else_=0))
-    genre_scores: Sequence[tuple[str,int]] = (await db.execute(
-        select(Book.genre, func.sum(w)).join(Book, Book.id==UserBookEvent.book_id)
-        .where(UserBookEvent.username==username, Book.genre.isnot(None))
-        .group_by(Book.genre).order_by(desc(func.sum(w))).limit(5)
-    )).all()
-    author_scores: Sequence[tuple[Optional[int],int]] = (await db.execute(
-        select(Book.author_id, func.sum(w)).join(Book, Book.id==UserBookEvent.book_id)
-        .where(UserBookEvent.username==username, Book.author_id.isnot(None))
-        .group_by(Book.author_id).order_by(desc(func.sum(w))).limit(5)
+EVENT_WEIGHT = case((UserBookEvent.event=="like",3), else_=1) + case((UserBookEvent.event=="rate",2), else_=0)
+
+def recent_events(*conditions):
+    """Event filter limited to RECS_EVENTS_WINDOW_DAYS so partitioned scans prune old months."""
+    days = settings.RECS_EVENTS_WINDOW_DAYS
+    if days > 0:
+        conditions += (UserBookEvent.created_at >= datetime.now(timezone.utc) - timedelta(days=days),)
+    return and_(*conditions) if conditions else true()
+
+async def _user_book_weights(db: AsyncSession, username: str) -> Sequence[tuple[int,int]]:
+    return (await db.execute(
+        select(UserBookEvent.book_id, func.sum(EVENT_WEIGHT))
+        .where(recent_events(UserBookEvent.username==username))
+        .group_by(UserBookEvent.book_id)
     )).all()
-    top_genres = [g for (g,_) in genre_scores]; top_author_ids = [a for (a,_) in author_scores]
-    recs: list[Book] = []; taken: set[int] = set()
-    if top_author_ids:
-        q = (select(Book).options(selectinload(Book.author))
-             .where(Book.author_id.in_(top_author_ids))
-             .order_by(Book.published_year.desc(), Book.title.asc()).limit(limit))
-        for b in (await db.execute(q)).scalars().all():
-            if b.id not in taken:
-                recs.append(b); taken.add(b.id)
-                if len(recs)>=limit: return recs
-    if top_genres and len(recs)<limit:
-        q = (select(Book).options(selectinload(Book.author))
-             .where(Book.genre.in_(top_genres), Book.id.not_in(taken))
-             .order_by(Book.published_year.desc(), Book.title.asc()).limit(limit-len(recs)))
-        recs.extend((await db.execute(q)).scalars().all())
-    return recs[:limit]
+
+async def books_by_ids(db: AsyncSession, ids: Sequence[int]) -> List[Book]:
+    if not ids: return []
+    rows = (await db.execute(select(Book).options(selectinload(Book.author)).where(Book.id.in_(ids)))).scalars().all()
+    by_id = {b.id: b for b in rows}
+    return [by_id[i] for i in ids if i in by_id]
+
+async def precomputed_for_user(db: AsyncSession, username: str, limit: int = 10) -> Optional[List[Book]]:
+    """Rows written by the batch job, or None if missing or older than the user's latest event."""
+    computed_at = (select(func.max(UserRecommendation.computed_at))
+                   .where(UserRecommendation.username==username).scalar_subquery())
+    newer_event = (await db.execute(
+        select(exists().where(recent_events(UserBookEvent.username==username, UserBookEvent.created_at>=computed_at)))
+    )).scalar()
+    if newer_event: return None
+    q = (select(Book).options(selectinload(Book.author))
+         .join(UserRecommendation, UserRecommendation.book_id==Book.id)
+         .where(UserRecommendation.username==username)
+         .order_by(UserRecommendation.rank).limit(limit))
+    return list((await db.execute(q)).scalars().all()) or None
+
+async def recommend_for_user(db: AsyncSession, username: str, limit: int = 10) -> List[Book]:
+    weights = await _user_book_weights(db, username)
+    if not weights: return []
+    catalog = await get_catalog(db)
+    ids = catalog.top_n([b for (b,_) in weights], [float(w) for (_,w) in weights], limit)
+    return await books_by_ids(db, ids)
+
+
+# --- offline precompute -------------------------------------------------------
+
+_worker_catalog: Optional[CatalogMatrix] = None
+
+def _init_worker(catalog: CatalogMatrix) -> None:
+    global _worker_catalog
+    _worker_catalog = catalog
+
+def _rank_chunk(chunk: list[tuple[str, list[int], list[float]]], limit: int) -> list[tuple[str, list[tuple[int, float]]]]:
+    return [(username, _worker_catalog.top_n_scored(ids, weights, limit)) for (username, ids, weights) in chunk]
+
+def _user_chunks(rows: Iterable[tuple[str, int, float]], chunk_size: int) -> Iterator[list[tuple[str, list[int], list[float]]]]:
+    """Group (username, book_id, weight) rows ordered by username into per-user chunks."""
+    chunk: list[tuple[str, list[int], list[float]]] = []
+    for username, group in itertools.groupby(rows, key=lambda r: r[0]):
+        ids: list[int] = []; weights: list[float] = []
+        for (_, book_id, w) in group:
+            ids.append(book_id); weights.append(float(w))
+        chunk.append((username, ids, weights))
+        if len(chunk) >= chunk_size:
+            yield chunk; chunk = []
+    if chunk: yield chunk
+
+def _write_chunk(db: Session, ranked: list[tuple[str, list[tuple[int, float]]]], computed_at: datetime) -> int:
+    usernames = [u for (u, _) in ranked]
+    db.execute(delete(UserRecommendation).where(UserRecommendation.username.in_(usernames)))
+    rows = [
+        {"username": u, "rank": rank, "book_id": book_id, "score": score, "computed_at": computed_at}
+        for (u, recs) in ranked for rank, (book_id, score) in enumerate(recs)
+    ]
+    if rows:
+        db.execute(insert(UserRecommendation), rows)
+    db.commit()
+    return len(usernames)
+
+def precompute_user_recommendations(
+    session_factory: Optional[Callable[[], Session]] = None,
+    *,
+    limit: int = 50,
+    workers: Optional[int] = None,
+    chunk_size: int = 500,
+    yield_per: int = 10_000,
+) -> int:
+    """Rank every user with events across a process pool and replace `user_recommendations`.
+
+    Event aggregates are streamed from the DB ordered by username, so memory stays bounded
+    by the number of chunks in flight rather than the number of users. Returns users written.
+    """
+    if session_factory is None:
+        from src.db.session import SessionLocal
+        session_factory = SessionLocal
+    workers = workers or os.cpu_count() or 1
+    computed_at = datetime.now(timezone.utc)
+    written = 0
+    with session_factory() as read_db, session_factory() as write_db:
+        catalog = catalog_from_rows(read_db.execute(select(*CATALOG_COLUMNS)).all())
+        rows = read_db.execute(
+            select(UserBookEvent.username, UserBookEvent.book_id, func.sum(EVENT_WEIGHT))
+            .where(recent_events())
+            .group_by(UserBookEvent.username, UserBookEvent.book_id)
+            .order_by(UserBookEvent.username)
+            .execution_options(stream_results=True, yield_per=yield_per)
+        )
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(catalog,)) as pool:
+            max_pending = 2 * workers
+            pending: set[Future] = set()
+            for chunk in _user_chunks(rows, chunk_size):
+                pending.add(pool.submit(_rank_chunk, chunk, limit))
+                if len(pending) >= max_pending:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for f in done: written += _write_chunk(write_db, f.result(), computed_at)
+            for f in pending:
+                written += _write_chunk(write_db, f.result(), computed_at)
+        # users without events any more keep no stale rows
+        write_db.execute(delete(UserRecommendation).where(UserRecommendation.computed_at < computed_at))
+        write_db.commit()
+    log.info("precomputed recommendations for %d users", written)
+    return written
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Precompute per-user book recommendations.")
+    parser.add_argument("--limit", type=int, default=50, help="recommendations stored per user")
+    parser.add_argument("--workers", type=int, default=None, help="process pool size (default: CPU count)")
+    parser.add_argument("--chunk-size", type=int, default=500, help="users per pool task")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+    precompute_user_recommendations(limit=args.limit, workers=args.workers, chunk_size=args.chunk_size)
+
+if __name__ == "__main__":
+    main()
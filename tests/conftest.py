@@ -1,5 +1,6 @@
 import asyncio
 import pathlib
+from contextlib import contextmanager
 import pytest
 from typing import AsyncGenerator
 import httpx
@@ -9,8 +10,10 @@ from sqlalchemy import select
 
 from src.main import app
 from src.db.base import Base
-from src.db.session import get_session
+from src.db.instrumentation import instrument_engine, track_queries
+from src.db.session import get_read_session, get_session
 from src.core.security import hash_password
+from src.core.token_store import MemoryRevocationStore, set_revocation_store
 from src.models.user import User
 
 @pytest.fixture(scope="session")
@@ -32,6 +35,7 @@ async def engine(test_db_url):
         poolclass=StaticPool,
         connect_args={"check_same_thread": False},
     )
+    instrument_engine(eng.sync_engine)
     async with eng.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
     yield eng
@@ -49,8 +53,10 @@ def override_db_dep(session, monkeypatch):
     async def _get_session_override():
         yield session
     app.dependency_overrides[get_session] = _get_session_override
+    app.dependency_overrides[get_read_session] = _get_session_override
     yield
     app.dependency_overrides.pop(get_session, None)
+    app.dependency_overrides.pop(get_read_session, None)
 
 @pytest.fixture(autouse=True)
 def patch_rate_limiter(monkeypatch):
@@ -65,6 +71,13 @@ def patch_rate_limiter(monkeypatch):
     app.user_middleware = [m for m in app.user_middleware if m.cls.__name__ != "RateLimiterMiddleware"]
     app.middleware_stack = app.build_middleware_stack()
 
+@pytest.fixture(autouse=True)
+def revocation_store():
+    # user updates and deletes revoke refresh tokens; no Redis in the test run
+    set_revocation_store(MemoryRevocationStore())
+    yield
+    set_revocation_store(None)
+
 @pytest.fixture()
 async def client():
     transport = httpx.ASGITransport(app=app)
@@ -99,3 +112,16 @@ async def auth_headers(client, auth_user):
     token = r.json().get("access_token") or r.json().get("token")
     assert token
     return {"Authorization": f"Bearer {token}"}
+
+@pytest.fixture()
+def query_budget():
+    """`with query_budget(2): await client.get(...)` fails if the block runs more than two
+    statements, or the same statement shape more than `repeats` times (an N+1)."""
+    @contextmanager
+    def budget(max_queries: int, repeats: int = 1):
+        with track_queries(keep_statements=True) as stats:
+            yield stats
+        repeated = stats.repeated(repeats + 1)
+        assert not repeated, "repeated statements (N+1?):\n" + "\n".join(f"{n} x {shape}" for shape, n in repeated)
+        assert stats.count <= max_queries, f"{stats.count} queries > budget {max_queries}:\n" + "\n".join(stats.statements)
+    return budget
@@ -1,4 +1,4 @@
 from src.models.author import Author
 
-def build_author(name="Franko", bio=None):
-    return Author(name=name, bio=bio or "")
+def build_author(name="Franko", biography=None):
+    return Author(name=name, biography=biography)
@@ -1,5 +1,5 @@
 from src.models.user import User
-from src.core.security import get_password_hash
+from src.core.security import hash_password
 
 def build_user(username="alice", password="Passw0rd!"):
-    return User(username=username, password_hash=get_password_hash(password))
+    return User(username=username, password=hash_password(password))
@@ -0,0 +1,17 @@
+import pytest
+from httpx import AsyncClient
+
+
+@pytest.mark.integration
+async def test_import_reports_the_right_parse_error(client: AsyncClient, auth_headers, tmp_path, monkeypatch):
+    from src.api.v1.book import routes
+    monkeypatch.setattr(routes.settings, "IMPORT_DIR", str(tmp_path))
+
+    latin1 = "title,author_name,genre,published_year\nCafé,X,Fiction,1999\n".encode("latin-1")
+    r = await client.post("/api/v1/books/imports/", files={"file": ("b.csv", latin1, "text/csv")}, headers=auth_headers)
+    assert r.status_code == 400
+    assert r.json()["detail"] == "CSV must be UTF-8 encoded"
+
+    r = await client.post("/api/v1/books/imports/", files={"file": ("b.json", b'{"not": "a list"}', "application/json")}, headers=auth_headers)
+    assert r.status_code == 400
+    assert r.json()["detail"] == "JSON must be a list of books"
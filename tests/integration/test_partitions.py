@@ -0,0 +1,36 @@
+import os
+from datetime import date
+import pytest
+from sqlalchemy import create_engine, text
+from src.db.partitions import DEFAULT, PARENT, _month, ensure_partitions, partition_name
+
+# partitioning is Postgres-only; point this at a throwaway database migrated to head
+PG_URL = os.environ.get("TEST_POSTGRES_SYNC_URL")
+
+@pytest.mark.integration
+@pytest.mark.skipif(not PG_URL, reason="set TEST_POSTGRES_SYNC_URL to a migrated Postgres database")
+def test_partition_creation_moves_rows_out_of_default():
+    engine = create_engine(PG_URL)
+    month = _month(date.today(), 30)  # well past anything the migration created
+    name = partition_name(month)
+    try:
+        with engine.begin() as conn:
+            conn.execute(text(f"DROP TABLE IF EXISTS {name}"))
+            book_id = conn.execute(text("SELECT min(id) FROM books")).scalar()
+            if book_id is None:
+                author_id = conn.execute(text("INSERT INTO authors (name) VALUES ('Partition Test') RETURNING id")).scalar()
+                book_id = conn.execute(text(
+                    "INSERT INTO books (title, genre, published_year, author_id) VALUES ('Partition Test', 'Fiction', 2000, :a) RETURNING id"
+                ), {"a": author_id}).scalar()
+            conn.execute(text(f"INSERT INTO {PARENT} (username, book_id, event, created_at) VALUES ('partition-test', :b, 'view', :at)"),
+                         {"b": book_id, "at": f"{month.isoformat()} 12:00:00+00"})
+        with engine.begin() as conn:
+            assert name in ensure_partitions(conn, months_ahead=30, start=month)
+        with engine.begin() as conn:
+            where = "WHERE username = 'partition-test'"
+            assert conn.execute(text(f"SELECT count(*) FROM {name} {where}")).scalar() == 1
+            assert conn.execute(text(f"SELECT count(*) FROM {DEFAULT} {where}")).scalar() == 0
+    finally:
+        with engine.begin() as conn:
+            conn.execute(text(f"DELETE FROM {PARENT} WHERE username = 'partition-test'"))
+        engine.dispose()
@@ -0,0 +1,59 @@
+import pytest
+from uuid import uuid4
+from httpx import AsyncClient
+
+from src.models.author import Author
+from src.models.book import Book
+
+
+@pytest.fixture()
+async def catalog(session):
+    tag = uuid4().hex[:6]
+    authors = [Author(name=f"Budget {tag} {i}") for i in range(3)]
+    session.add_all(authors)
+    await session.flush()
+    books = [
+        Book(title=f"Budget {tag} {i}", genre="Fiction", published_year=1990 + i, author_id=authors[i % 3].id)
+        for i in range(12)
+    ]
+    session.add_all(books)
+    await session.commit()
+    return authors, books
+
+
+@pytest.mark.integration
+@pytest.mark.parametrize("limit", [2, 50])
+async def test_list_books_is_two_queries_regardless_of_page_size(client: AsyncClient, catalog, query_budget, limit):
+    with query_budget(2):
+        r = await client.get("/api/v1/books/", params={"limit": limit, "sort_by": "author"})
+    assert r.status_code == 200, r.text
+    items = r.json()["items"]
+    assert len(items) == min(limit, r.json()["total"])
+    assert all("author_name" in b for b in items if b["title"].startswith("Budget"))
+
+
+@pytest.mark.integration
+async def test_get_book_loads_author_in_one_query(client: AsyncClient, catalog, query_budget):
+    authors, books = catalog
+    with query_budget(1):
+        r = await client.get(f"/api/v1/books/{books[0].id}")
+    assert r.status_code == 200
+    assert r.json()["author_name"] == authors[0].name
+
+
+@pytest.mark.integration
+async def test_update_book_fetches_it_once(client: AsyncClient, catalog, auth_headers, query_budget):
+    _, books = catalog
+    with query_budget(3):  # select, update, refresh
+        r = await client.patch(f"/api/v1/books/{books[1].id}", json={"genre": "History"}, headers=auth_headers)
+    assert r.status_code == 200, r.text
+    assert r.json()["genre"] == "History"
+    assert r.json()["title"] == books[1].title
+
+
+@pytest.mark.integration
+async def test_query_budget_flags_repeated_statements(session, query_budget):
+    with pytest.raises(AssertionError, match="N\\+1"):
+        with query_budget(10):
+            for i in range(3):
+                await session.get(Author, 10_000 + i)
@@ -0,0 +1,46 @@
+import json
+import httpx
+import pytest
+from src.db.session import get_read_session, get_session
+from src.main import create_app
+from src.middlewares.policies import rate_limit
+
+@pytest.fixture()
+def limited_app(session):
+    # conftest strips the limiter from the shared app; this one keeps it
+    app = create_app()
+
+    async def _session():
+        yield session
+    app.dependency_overrides[get_session] = _session
+    app.dependency_overrides[get_read_session] = _session
+    return app
+
+def _client(app, ip: str) -> httpx.AsyncClient:
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app, client=(ip, 1234)), base_url="http://test")
+
+@pytest.mark.integration
+async def test_weighted_import_is_admitted(limited_app, auth_headers):
+    body = json.dumps([{"title": "Limited", "author_name": "Rate Author", "genre": "Fiction", "published_year": 2001}]).encode()
+    async with _client(limited_app, "10.1.0.1") as c:
+        codes = [
+            (await c.post("/api/v1/books/imports/", files={"file": ("b.json", body, "application/json")}, headers=auth_headers)).status_code
+            for _ in range(2)
+        ]
+    assert codes == [201, 201]
+
+@pytest.mark.integration
+async def test_export_user_budget_allows_twenty_an_hour(limited_app, auth_headers):
+    codes = []
+    for i in range(22):
+        # a fresh IP per call, so only the per-user budget is in play
+        async with _client(limited_app, f"10.2.0.{i}") as c:
+            r = await c.post("/api/v1/books/exports/", params={"fmt": "json", "year_from": 2999}, headers=auth_headers)
+            codes.append(r.status_code)
+    assert codes == [201] * 20 + [429] * 2
+    assert int(r.headers["Retry-After"]) > 60
+
+@pytest.mark.unit
+def test_policy_that_can_never_pass_is_rejected():
+    with pytest.raises(ValueError):
+        rate_limit(cost=20, per_user=(10, 3600))
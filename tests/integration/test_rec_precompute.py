@@ -0,0 +1,59 @@
+import pytest
+from uuid import uuid4
+from httpx import AsyncClient
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import sessionmaker
+from src.db.base import Base
+from src.models.author import Author
+from src.models.book import Book
+from src.models.user_book_event import UserBookEvent
+from src.models.user_recommendation import UserRecommendation
+from src.services.rec_cache import get_rec_cache
+from src.services.recommendations import precompute_user_recommendations
+
+@pytest.mark.integration
+def test_precompute_writes_ranked_rows(tmp_path):
+    eng = create_engine(f"sqlite:///{tmp_path / 'recs.db'}")
+    Base.metadata.create_all(eng)
+    Session = sessionmaker(bind=eng)
+    with Session() as db:
+        author = Author(name="Batch")
+        db.add(author)
+        db.flush()
+        books = [Book(title=f"B{i}", genre="Science", published_year=1990 + i, author_id=author.id) for i in range(4)]
+        db.add_all(books)
+        db.flush()
+        db.add_all([
+            UserBookEvent(username="u1", book_id=books[0].id, event="like"),
+            UserBookEvent(username="u2", book_id=books[1].id, event="view"),
+            UserBookEvent(username="u2", book_id=books[1].id, event="like"),
+        ])
+        db.add(UserRecommendation(username="gone", rank=0, book_id=books[0].id, score=1.0))
+        db.commit()
+        ids = [b.id for b in books]
+
+    assert precompute_user_recommendations(Session, limit=2, workers=2, chunk_size=1) == 2
+
+    with Session() as db:
+        rows = db.execute(select(UserRecommendation).order_by(UserRecommendation.username, UserRecommendation.rank)).scalars().all()
+        assert {r.username for r in rows} == {"u1", "u2"}
+        u1 = [r.book_id for r in rows if r.username == "u1"]
+        assert u1 == [ids[3], ids[2]]
+    eng.dispose()
+
+@pytest.mark.integration
+async def test_endpoint_reads_precomputed_rows(client: AsyncClient, session, auth_headers):
+    tag = uuid4().hex[:6]
+    books = [Book(title=f"Pre {tag} {i}", genre="History", published_year=2000) for i in range(2)]
+    session.add_all(books)
+    await session.flush()
+    session.add_all([
+        UserRecommendation(username="tester", rank=0, book_id=books[1].id, score=2.0),
+        UserRecommendation(username="tester", rank=1, book_id=books[0].id, score=1.0),
+    ])
+    await session.commit()
+    get_rec_cache().bump("tester")
+
+    r = await client.get("/api/v1/users/me/recommendations", headers=auth_headers)
+    assert r.status_code == 200
+    assert [b["id"] for b in r.json()] == [books[1].id, books[0].id]
@@ -0,0 +1,33 @@
+import pytest
+from uuid import uuid4
+from httpx import AsyncClient
+from src.models.author import Author
+from src.models.book import Book
+from src.services.rec_engine import invalidate_catalog
+
+@pytest.mark.integration
+async def test_user_recommendations_ranked_by_affinity(client: AsyncClient, session, auth_headers):
+    tag = uuid4().hex[:6]
+    author = Author(name=f"Rec_{tag}")
+    session.add(author)
+    await session.flush()
+    seen = Book(title=f"Seen {tag}", genre="Science", published_year=1990, author_id=author.id)
+    same_author = Book(title=f"Same author {tag}", genre="History", published_year=1970, author_id=author.id)
+    same_genre = Book(title=f"Same genre {tag}", genre="Science", published_year=1950)
+    session.add_all([seen, same_author, same_genre])
+    await session.commit()
+    invalidate_catalog()
+
+    r = await client.post("/api/v1/users/me/events", json={"book_id": seen.id, "event": "like"}, headers=auth_headers)
+    assert r.status_code == 204
+
+    r = await client.get("/api/v1/users/me/recommendations", params={"limit": 50}, headers=auth_headers)
+    assert r.status_code == 200
+    ids = [b["id"] for b in r.json()]
+    assert seen.id not in ids
+    assert ids.index(same_author.id) < ids.index(same_genre.id)
+
+    r2 = await client.get("/api/v1/users/me/recommendations", params={"limit": 50}, headers=auth_headers)
+    assert [b["id"] for b in r2.json()] == ids
+    metrics = (await client.get("/metrics")).text
+    assert 'recs_cache_requests_total{result="hit"}' in metrics
@@ -0,0 +1,81 @@
+import pytest
+import httpx
+from uuid import uuid4
+from sqlalchemy import select
+from src.core.security import hash_password
+from src.core.token_store import MemoryRevocationStore, set_revocation_store
+from src.models.user import User
+
+@pytest.fixture()
+async def tokens(client: httpx.AsyncClient, session):
+    set_revocation_store(MemoryRevocationStore())
+    username = f"refresher_{uuid4().hex[:8]}"
+    session.add(User(username=username, password=hash_password("secret123")))
+    await session.commit()
+    r = await client.post(
+        "/api/v1/auth/tokens",
+        data={"username": username, "password": "secret123"},
+        headers={"Content-Type": "application/x-www-form-urlencoded"},
+    )
+    assert r.status_code == 200
+    yield {**r.json(), "username": username}
+    set_revocation_store(None)
+
+async def _user_id(session, username: str) -> int:
+    return (await session.execute(select(User.id).where(User.username == username))).scalar_one()
+
+@pytest.mark.integration
+async def test_refresh_rotates_and_rejects_replay(client: httpx.AsyncClient, tokens):
+    r = await client.post("/api/v1/auth/tokens/refresh", json={"refresh_token": tokens["refresh_token"]})
+    assert r.status_code == 200
+    rotated = r.json()
+    assert rotated["access_token"] and rotated["refresh_token"] != tokens["refresh_token"]
+
+    r = await client.get("/api/v1/users/me/recommendations", headers={"Authorization": f"Bearer {rotated['access_token']}"})
+    assert r.status_code == 200
+
+    r = await client.post("/api/v1/auth/tokens/refresh", json={"refresh_token": tokens["refresh_token"]})
+    assert r.status_code == 401
+
+@pytest.mark.integration
+async def test_revoked_or_misused_refresh_token_is_rejected(client: httpx.AsyncClient, tokens):
+    r = await client.get("/api/v1/users/me/recommendations", headers={"Authorization": f"Bearer {tokens['refresh_token']}"})
+    assert r.status_code == 401
+
+    r = await client.post("/api/v1/auth/tokens/refresh", json={"refresh_token": tokens["access_token"]})
+    assert r.status_code == 401
+
+    r = await client.post("/api/v1/auth/tokens/revoke", json={"refresh_token": tokens["refresh_token"]})
+    assert r.status_code == 204
+    r = await client.post("/api/v1/auth/tokens/refresh", json={"refresh_token": tokens["refresh_token"]})
+    assert r.status_code == 401
+
+@pytest.mark.integration
+async def test_refresh_token_dies_with_the_account(client: httpx.AsyncClient, session, tokens):
+    user_id = await _user_id(session, tokens["username"])
+    auth = {"Authorization": f"Bearer {tokens['access_token']}"}
+    r = await client.delete(f"/api/v1/users/{user_id}", headers=auth)
+    assert r.status_code == 200
+
+    r = await client.post("/api/v1/auth/tokens/refresh", json={"refresh_token": tokens["refresh_token"]})
+    assert r.status_code == 401
+
+@pytest.mark.integration
+async def test_password_change_revokes_earlier_refresh_tokens(client: httpx.AsyncClient, session, tokens):
+    username = tokens["username"]
+    user_id = await _user_id(session, username)
+    auth = {"Authorization": f"Bearer {tokens['access_token']}"}
+    r = await client.patch(f"/api/v1/users/{user_id}", json={"username": username, "password": "changed123"}, headers=auth)
+    assert r.status_code == 200
+
+    r = await client.post("/api/v1/auth/tokens/refresh", json={"refresh_token": tokens["refresh_token"]})
+    assert r.status_code == 401
+
+    r = await client.post(
+        "/api/v1/auth/tokens",
+        data={"username": username, "password": "changed123"},
+        headers={"Content-Type": "application/x-www-form-urlencoded"},
+    )
+    assert r.status_code == 200
+    r = await client.post("/api/v1/auth/tokens/refresh", json={"refresh_token": r.json()["refresh_token"]})
+    assert r.status_code == 200
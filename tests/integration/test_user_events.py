@@ -0,0 +1,94 @@
+import asyncio
+from datetime import datetime, timezone
+import pytest
+from uuid import uuid4
+from httpx import AsyncClient
+from sqlalchemy import func, select
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from src.models.book import Book
+from src.models.user_book_event import UserBookEvent
+from src.services.event_ingest import EventBuffer
+
+async def _book(session) -> Book:
+    b = Book(title=f"Evt {uuid4().hex[:6]}", genre="Fiction", published_year=2001)
+    session.add(b)
+    await session.commit()
+    return b
+
+async def _count(session, username: str) -> int:
+    return (await session.execute(select(func.count()).select_from(UserBookEvent).where(UserBookEvent.username == username))).scalar()
+
+@pytest.mark.integration
+async def test_batch_endpoint_inserts_known_books(client: AsyncClient, session, auth_headers):
+    b = await _book(session)
+    before = await _count(session, "tester")
+    r = await client.post(
+        "/api/v1/users/me/events/batch",
+        json={"events": [{"book_id": b.id, "event": "view"}, {"book_id": b.id, "event": "rate", "rating": 4}, {"book_id": 987654, "event": "view"}]},
+        headers=auth_headers,
+    )
+    assert r.status_code == 201
+    assert r.json() == {"accepted": 2, "unknown_book_ids": [987654]}
+    assert await _count(session, "tester") == before + 2
+
+@pytest.mark.integration
+async def test_event_buffer_flushes_on_size_and_shutdown(engine, session):
+    b = await _book(session)
+    flushed: set[str] = set()
+    buf = EventBuffer(async_sessionmaker(bind=engine, class_=AsyncSession), max_queue=5, batch_size=2, flush_interval_ms=10_000, on_flushed=flushed.update)
+    buf.start()
+    row = {"username": "buffered", "book_id": b.id, "event": "view", "rating": None}
+    assert buf.offer([row, row])
+    for _ in range(50):
+        if flushed:
+            break
+        await asyncio.sleep(0.01)
+    assert flushed == {"buffered"}
+    assert buf.offer([row, row, row])
+    assert not buf.offer([row, row, row])
+    await buf.stop()
+    assert not buf.offer([row])
+    assert await _count(session, "buffered") == 5
+
+@pytest.mark.integration
+async def test_single_event_unknown_book_is_404(client: AsyncClient, auth_headers):
+    r = await client.post("/api/v1/users/me/events", json={"book_id": 987654, "event": "view"}, headers=auth_headers)
+    assert r.status_code == 404
+
+class _FlakySessions:
+    """Session factory whose first `failures` sessions lose their connection."""
+
+    def __init__(self, engine, failures: int):
+        self.maker = async_sessionmaker(bind=engine, class_=AsyncSession)
+        self.failures = failures
+
+    def __call__(self):
+        if self.failures:
+            self.failures -= 1
+            raise OperationalError("INSERT", {}, ConnectionResetError("server closed the connection"))
+        return self.maker()
+
+@pytest.mark.integration
+async def test_event_buffer_retries_transient_errors(engine, session):
+    b = await _book(session)
+    buf = EventBuffer(_FlakySessions(engine, failures=2), batch_size=10, flush_interval_ms=10_000, retry_delay_ms=1)
+    row = {"username": "flaky", "book_id": b.id, "event": "view", "rating": None}
+    await buf._flush([row, row])
+    assert await _count(session, "flaky") == 2
+
+@pytest.mark.integration
+async def test_event_buffer_spills_on_shutdown_and_restores(engine, session, tmp_path):
+    b = await _book(session)
+    row = {"username": "spilled", "book_id": b.id, "event": "view", "rating": None, "created_at": datetime.now(timezone.utc)}
+    down = EventBuffer(_FlakySessions(engine, failures=100), flush_retries=1, retry_delay_ms=1, spill_dir=str(tmp_path))
+    down.start()
+    assert down.offer([row, row, row])
+    await down.stop()
+    assert await _count(session, "spilled") == 0
+    assert len(list(tmp_path.glob("events-*.jsonl"))) == 1
+    up = EventBuffer(async_sessionmaker(bind=engine, class_=AsyncSession), flush_interval_ms=10, spill_dir=str(tmp_path))
+    up.start()
+    await up.stop()
+    assert await _count(session, "spilled") == 3
+    assert not list(tmp_path.iterdir())
@@ -0,0 +1,64 @@
+import asyncio
+import pytest
+import httpx
+from fastapi import FastAPI
+from src.middlewares.admission import AdmissionControlMiddleware, AIMDLimit
+
+@pytest.mark.unit
+def test_aimd_grows_when_fast_and_backs_off_when_slow():
+    limit = AIMDLimit("t", initial=10, min_limit=2, max_limit=20, target_latency=0.1)
+    limit.inflight = 10
+    assert limit.saturated()
+    limit.release(0.01, saturated=True)
+    assert limit.limit == pytest.approx(10.1)
+    limit.inflight = 2
+    limit.release(1.0)
+    limit.release(1.0)
+    assert limit.limit == pytest.approx(10.1 * 0.9)  # one decrease per latency period
+
+@pytest.mark.unit
+def test_aimd_does_not_grow_while_underused():
+    limit = AIMDLimit("t", initial=50, min_limit=2, max_limit=500, target_latency=0.1)
+    for _ in range(1000):
+        limit.inflight = 3
+        assert not limit.saturated()
+        limit.release(0.001, limit.saturated())
+    assert limit.limit == 50
+
+@pytest.mark.unit
+async def test_waiters_get_freed_slots_in_order():
+    limit = AIMDLimit("t", initial=1, min_limit=1, max_limit=1, target_latency=1.0)
+    assert await limit.acquire(0.1) is None
+    waiter = asyncio.create_task(limit.acquire(1.0))
+    await asyncio.sleep(0)
+    assert await limit.acquire(0.01) == "timeout"
+    limit.release(0.0)
+    assert await waiter is None and limit.inflight == 1
+
+@pytest.mark.unit
+async def test_overload_is_shed_with_503():
+    app = FastAPI()
+    app.add_middleware(AdmissionControlMiddleware, initial_limit=1, min_limit=1, max_limit=1, queue_timeout_ms=20)
+    gate = asyncio.Event()
+
+    @app.get("/slow")
+    async def slow():
+        await gate.wait()
+        return {}
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as c:
+        first = asyncio.create_task(c.get("/slow"))
+        await asyncio.sleep(0.01)
+        shed = await c.get("/slow")
+        assert shed.status_code == 503 and shed.headers["Retry-After"] == "1"
+        gate.set()
+        assert (await first).status_code == 200
+
+@pytest.mark.unit
+def test_heavy_routes_found_behind_included_routers():
+    from src.main import create_app
+    app = create_app()
+    mw = AdmissionControlMiddleware(app)
+    scope = {"type": "http", "method": "POST", "path": "/api/v1/books/imports/", "app": app, "root_path": "", "headers": []}
+    assert mw._route_class(scope) == "heavy"
+    assert mw._route_class({**scope, "path": "/api/v1/books/"}) == "write"
@@ -0,0 +1,26 @@
+import pytest
+
+from benchmarks.catalog import CatalogSize, authors, books, events
+from src.schemas.imports import BookImportItem
+
+SIZE = CatalogSize(books=200, authors=20, users=10, events=300)
+
+
+@pytest.mark.unit
+def test_catalog_is_reproducible_from_the_seed():
+    assert list(books(SIZE, 7)) == list(books(SIZE, 7))
+    assert list(events(SIZE, 7)) == list(events(SIZE, 7))
+    assert list(books(SIZE, 7)) != list(books(SIZE, 8))
+
+
+@pytest.mark.unit
+def test_catalog_rows_are_valid_and_consistent():
+    names = {a["id"]: a["name"] for a in authors(SIZE, 1)}
+    rows = list(books(SIZE, 1))
+    assert len({r["title"] for r in rows}) == len(rows)
+    isbns = [r["isbn"] for r in rows if r["isbn"]]
+    assert len(set(isbns)) == len(isbns)
+    for r in rows:
+        assert r["author_id"] in names
+        BookImportItem(title=r["title"], author_name=names[r["author_id"]], genre=r["genre"], published_year=r["published_year"], isbn=r["isbn"])
+    assert all(1 <= e["book_id"] <= SIZE.books for e in events(SIZE, 1))
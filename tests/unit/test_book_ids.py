@@ -0,0 +1,32 @@
+import pytest
+from src.services.book_ids import BookIdSet
+
+@pytest.mark.unit
+def test_only_set_bits_are_authoritative():
+    ids = BookIdSet([1, 2, 5, 9])
+    assert ids.lookup(5) is True
+    # 3 may be a sequence id that committed after 9 was loaded
+    assert ids.lookup(3) is None
+    assert ids.lookup(0) is False
+    assert ids.lookup(10) is None
+
+@pytest.mark.unit
+def test_add_and_discard():
+    ids = BookIdSet([4])
+    ids.add(12)
+    assert ids.lookup(12) is True
+    ids.discard(4)
+    ids.discard(1000)
+    assert ids.lookup(4) is None
+
+@pytest.mark.unit
+async def test_clear_bit_below_loaded_ids_is_checked_in_db(session, monkeypatch):
+    from src.models.book import Book
+    from src.services import book_ids
+    late = Book(title="Committed late", genre="Fiction", published_year=2001)
+    session.add(late)
+    await session.commit()
+    # the bitmap was loaded after a higher id committed but before this one did
+    monkeypatch.setattr(book_ids, "_ids", BookIdSet([late.id + 1]))
+    assert await book_ids.book_exists(session, late.id)
+    assert book_ids.loaded_book_ids().lookup(late.id) is True
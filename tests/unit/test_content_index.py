@@ -0,0 +1,118 @@
+import pytest
+from src.services.content_index import ContentIndex
+
+def _index():
+    idx = ContentIndex(dim=256, capacity=2)
+    idx.upsert(1, "Foundation", "Science", "Isaac Asimov")
+    idx.upsert(2, "Foundation and Empire", "Science", "Isaac Asimov")
+    idx.upsert(3, "War and Peace", "History", "Leo Tolstoy")
+    idx.upsert(4, "Second Foundation", "Science", "Isaac Asimov")
+    return idx
+
+@pytest.mark.unit
+def test_similar_ranks_same_author_and_title_first():
+    out = _index().similar(1, limit=3)
+    assert out[-1] == 3
+    assert set(out[:2]) == {2, 4}
+
+@pytest.mark.unit
+def test_remove_and_upsert_keep_positions_consistent():
+    idx = _index()
+    idx.remove(1)
+    assert 1 not in idx and len(idx) == 3
+    assert idx.similar(4, limit=5)[0] == 2
+    idx.upsert(3, "Foundation's Edge", "Science", "Isaac Asimov")
+    assert idx.similar(4, limit=1) in ([2], [3])
+    assert idx.similar(999, limit=5) == []
+
+@pytest.mark.unit
+def test_snapshot_roundtrip_is_memory_mapped(tmp_path):
+    idx = _index()
+    idx.save(str(tmp_path))
+    loaded = ContentIndex.load(str(tmp_path))
+    assert loaded.similar_many([1, 3], limit=3) == idx.similar_many([1, 3], limit=3)
+    assert not loaded.matrix.flags.writeable
+    loaded.upsert(5, "Prelude to Foundation", "Science", "Isaac Asimov")
+    assert 5 in loaded.similar(1, limit=4)
+
+@pytest.mark.unit
+def test_snapshot_swap_keeps_ids_and_matrix_from_one_build(tmp_path):
+    small, big = ContentIndex(dim=256), _index()
+    small.upsert(9, "Dune", "Science", "Frank Herbert")
+    small.save(str(tmp_path))
+    big.save(str(tmp_path))
+    loaded = ContentIndex.load(str(tmp_path))
+    assert len(loaded) == 4 and 9 not in loaded
+    for _ in range(3):
+        small.save(str(tmp_path))
+    assert len([p for p in tmp_path.iterdir() if p.name.startswith("build-")]) == 2
+    assert ContentIndex.snapshot_age(str(tmp_path)) < 60
+
+@pytest.mark.unit
+async def test_rebuild_serves_old_index_and_replays_writes(monkeypatch):
+    from src.services import content_index
+    old = _index()
+    monkeypatch.setattr(content_index, "_index", old)
+    monkeypatch.setattr(content_index, "_index_built_at", 0.0)
+
+    async def build(db, dim):
+        assert content_index.loaded_content_index() is old  # still serving
+        old.upsert(7, "Foundation's Edge", "Science", "Isaac Asimov")
+        old.remove(3)
+        return _index()
+    monkeypatch.setattr(content_index, "build_content_index", build)
+    new = await content_index._rebuild(db=None)
+    assert content_index.loaded_content_index() is new and old.journal is None
+    assert 7 in new and 3 not in new
+
+@pytest.mark.unit
+async def test_warm_keeps_snapshot_age(tmp_path, monkeypatch):
+    import os, time
+    from src.services import content_index
+    _index().save(str(tmp_path))
+    hour_ago = time.time() - 3600
+    os.utime(tmp_path / "current" / "matrix.npy", (hour_ago, hour_ago))
+    monkeypatch.setattr(content_index.settings, "CONTENT_INDEX_SNAPSHOT_DIR", str(tmp_path))
+    monkeypatch.setattr(content_index, "_index", None)
+    monkeypatch.setattr(content_index, "_index_built_at", 0.0)
+    await content_index.warm_content_index(db=None)
+    assert time.monotonic() - content_index._index_built_at >= 3599
+
+def _trained(n=400):
+    idx = ContentIndex(dim=64)
+    for i in range(1, n + 1):
+        idx.upsert(i, f"Saga {i % 37} volume {i}", ("Science", "History", "Fantasy")[i % 3], f"Author {i % 23}")
+    idx.train(n_lists=8, probes=8)
+    return idx
+
+def _lists_consistent(idx):
+    listed = sorted(p for lst in idx._lists for p in lst)
+    assert listed == list(range(len(idx)))
+    assert all(idx.cluster[p] == c for c, lst in enumerate(idx._lists) for p in lst)
+
+@pytest.mark.unit
+def test_ivf_probing_every_list_matches_the_exhaustive_scan():
+    idx = _trained()
+    exact = ContentIndex(dim=64)
+    for i in range(1, 401):
+        exact.upsert(i, f"Saga {i % 37} volume {i}", ("Science", "History", "Fantasy")[i % 3], f"Author {i % 23}")
+    ids = [1, 57, 400]
+    assert [set(r) for r in idx.similar_many(ids, limit=5)] == [set(r) for r in exact.similar_many(ids, limit=5)]
+    assert all(1 not in r for r in idx.similar_many([1], limit=400))
+
+@pytest.mark.unit
+def test_ivf_lists_follow_upserts_removes_and_snapshots(tmp_path):
+    idx = _trained()
+    idx.remove(5)
+    idx.remove(400)
+    idx.upsert(7, "Completely different", "Poetry", "Someone Else")
+    idx.upsert(401, "Saga 3 volume 401", "Science", "Author 3")
+    _lists_consistent(idx)
+    assert 5 not in idx and 401 in idx.similar(3, limit=399)
+
+    idx.save(str(tmp_path))
+    loaded = ContentIndex.load(str(tmp_path), probes=8)
+    assert loaded.centroids is not None
+    assert loaded.similar_many([3, 7], limit=5) == idx.similar_many([3, 7], limit=5)
+    loaded.remove(3)
+    _lists_consistent(loaded)
@@ -0,0 +1,56 @@
+import pytest
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+from src.core.metrics import REGISTRY
+from src.db import pool as db_pool
+from src.db.pool import DB_POOL_PINGS, TimedQueuePool, instrument_pool, pool_kwargs
+
+@pytest.mark.unit
+def test_pool_kwargs_follow_settings(monkeypatch):
+    monkeypatch.setattr(db_pool.settings, "DB_PRE_PING", "always")
+    monkeypatch.setattr(db_pool.settings, "DB_STATEMENT_CACHE_SIZE", 0)
+    kw = pool_kwargs()
+    assert kw["poolclass"] is TimedQueuePool and kw["pool_pre_ping"] is True
+    assert kw["connect_args"] == {"statement_cache_size": 0, "prepared_statement_cache_size": 0}
+
+@pytest.mark.unit
+async def test_pool_reports_connections_and_pings_idle_ones(monkeypatch, tmp_path):
+    monkeypatch.setattr(db_pool.settings, "DB_PRE_PING", "idle")
+    monkeypatch.setattr(db_pool.settings, "DB_PRE_PING_IDLE_SEC", 0.0)
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'pool.db'}", poolclass=TimedQueuePool, pool_size=2)
+    instrument_pool(engine, "unit")
+    try:
+        async with engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+            assert 'db_pool_connections{engine="unit",state="checked_out"} 1' in REGISTRY.render()
+        assert 'db_pool_connections{engine="unit",state="idle"} 1' in REGISTRY.render()
+        async with engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+        assert DB_POOL_PINGS.value(engine="unit", result="ok") == 1
+    finally:
+        await engine.dispose()
+
+@pytest.mark.unit
+async def test_only_pool_exhaustion_counts_as_a_timeout(tmp_path):
+    from sqlalchemy.exc import OperationalError, TimeoutError as PoolTimeoutError
+    from src.db.pool import DB_POOL_TIMEOUTS
+
+    engine = create_async_engine(
+        f"sqlite+aiosqlite:///{tmp_path / 'pool.db'}", poolclass=TimedQueuePool, pool_size=1, max_overflow=0, pool_timeout=0.05
+    )
+    broken = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'missing' / 'pool.db'}", poolclass=TimedQueuePool)
+    instrument_pool(engine, "timeouts")
+    instrument_pool(broken, "timeouts")
+    try:
+        with pytest.raises(OperationalError):
+            async with broken.connect():
+                pass
+        assert DB_POOL_TIMEOUTS.value(engine="timeouts") == 0
+        async with engine.connect():
+            with pytest.raises(PoolTimeoutError):
+                async with engine.connect():
+                    pass
+        assert DB_POOL_TIMEOUTS.value(engine="timeouts") == 1
+    finally:
+        await engine.dispose()
+        await broken.dispose()
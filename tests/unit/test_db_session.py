@@ -0,0 +1,18 @@
+import pytest
+from src.db import session as db_session
+
+@pytest.mark.unit
+async def test_engines_are_built_on_first_use_and_rebuilt_after_dispose():
+    await db_session.dispose_engines()
+    assert db_session._async_engine is None and db_session._sync_engine is None
+
+    engine = db_session.get_async_engine()
+    assert db_session.get_async_engine() is engine
+    async with db_session.AsyncSessionLocal() as s:
+        assert s.bind is engine
+    assert db_session._sync_engine is None
+
+    await db_session.dispose_engines()
+    async with db_session.AsyncSessionLocal() as s:
+        assert s.bind is not engine
+    await db_session.dispose_engines()
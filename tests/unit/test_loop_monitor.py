@@ -0,0 +1,78 @@
+import asyncio
+import logging
+import time
+
+import pytest
+
+from src.core.loop_monitor import LOOP_LAG, LOOP_STALLS, start_loop_monitor, stop_loop_monitor
+
+
+def hog_the_loop(seconds: float) -> None:
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+
+@pytest.mark.unit
+async def test_stall_is_logged_with_the_blocking_stack(caplog):
+    beats, stalls = LOOP_LAG.value(), LOOP_STALLS.value()
+    start_loop_monitor(interval_ms=10, threshold_ms=50)
+    try:
+        with caplog.at_level(logging.WARNING, logger="src.core.loop_monitor"):
+            await asyncio.sleep(0.05)
+            hog_the_loop(0.3)
+            await asyncio.sleep(0.05)
+    finally:
+        await stop_loop_monitor()
+
+    assert LOOP_LAG.value() > beats
+    assert LOOP_STALLS.value() == stalls + 1
+    record = next(r for r in caplog.records if r.message.startswith("event loop blocked"))
+    assert record.loop_lag_ms >= 250
+    assert record.loop_blocked_in == "hog_the_loop"
+    assert "test_stall_is_logged_with_the_blocking_stack" in record.message
+
+
+@pytest.mark.unit
+async def test_import_parsing_runs_off_the_loop():
+    from src.api.v1.book.routes import _parse_import
+
+    csv_bytes = b"title,author_name,genre,published_year\nDune,Herbert,Fiction,1965\n,Nobody,Fiction,1965\n"
+    items, invalid = await asyncio.to_thread(_parse_import, csv_bytes, ".csv")
+    assert [i.title for i in items] == ["Dune"] and invalid == 1
+    with pytest.raises(ValueError):
+        _parse_import(b'{"not": "a list"}', ".json")
+    with pytest.raises(UnicodeDecodeError):
+        _parse_import("title,author_name\nCaf\u00e9,X\n".encode("latin-1"), ".csv")
+    items, _ = _parse_import(b"\xef\xbb\xbf" + csv_bytes, ".csv")  # Excel's BOM
+    assert [i.title for i in items] == ["Dune"]
+
+
+@pytest.mark.unit
+async def test_monitor_and_profiler_share_one_watchdog():
+    import threading
+
+    from src.core.loop_watchdog import get_loop_watchdog
+    from src.core.profiler import Profile, Sampler
+
+    def watchdog_threads():
+        return [t for t in threading.enumerate() if t.name == "loop-watchdog" and t.is_alive()]
+
+    monitor = start_loop_monitor(interval_ms=50, threshold_ms=100)
+    sampler = Sampler(asyncio.get_running_loop(), interval=0.005, block_threshold=0.02)
+    watchdog = get_loop_watchdog()
+    try:
+        profile = Profile("req")
+        sampler.add(asyncio.current_task(), profile)
+        assert (watchdog.interval, watchdog.threshold) == (0.005, 0.02)
+        hog_the_loop(0.1)
+        await asyncio.sleep(0.01)
+        sampler.remove(asyncio.current_task())
+        assert profile.blocks and profile.blocks[0][1][-1][0] == "hog_the_loop"
+        assert (watchdog.interval, watchdog.threshold) == (monitor.interval, monitor.threshold)
+        assert len(watchdog_threads()) == 1
+    finally:
+        sampler.stop()
+        await stop_loop_monitor()
+    await asyncio.sleep(0.01)
+    assert not watchdog_threads()
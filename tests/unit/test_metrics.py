@@ -0,0 +1,97 @@
+import json
+import os
+
+import httpx
+import pytest
+from fastapi import FastAPI
+
+from src.core.metrics import Counter, Gauge, Histogram, Registry
+from src.middlewares import http_metrics
+from src.middlewares.http_metrics import HTTPMetricsMiddleware
+
+
+@pytest.fixture()
+def registry(monkeypatch):
+    reg = Registry()
+    monkeypatch.setattr("src.core.metrics.REGISTRY", reg)
+    return reg
+
+
+@pytest.mark.unit
+def test_histogram_renders_cumulative_buckets(registry):
+    h = Histogram("t_seconds", "test", labelnames=("route",), buckets=(0.1, 1.0))
+    for v in (0.05, 0.1, 0.5, 3.0):
+        h.observe(v, route="/a")
+    text = registry.render()
+    assert '# TYPE t_seconds histogram' in text
+    assert 't_seconds_bucket{route="/a",le="0.1"} 2' in text
+    assert 't_seconds_bucket{route="/a",le="1"} 3' in text
+    assert 't_seconds_bucket{route="/a",le="+Inf"} 4' in text
+    assert 't_seconds_count{route="/a"} 4' in text
+    assert 't_seconds_sum{route="/a"} 3.65' in text
+
+
+@pytest.mark.unit
+def test_multiprocess_render_merges_workers(registry, tmp_path):
+    c = Counter("t_total", "test", labelnames=("k",))
+    g = Gauge("t_inflight", "test")
+    h = Histogram("t_latency", "test", buckets=(1.0,))
+    c.inc(2, k="x")
+    g.set(1)
+    h.observe(0.5)
+
+    other = [
+        {"name": "t_total", "doc": "test", "kind": "counter", "mode": "sum", "samples": [["t_total", ["k"], ["x"], 3]]},
+        {"name": "t_inflight", "doc": "test", "kind": "gauge", "mode": "sum", "samples": [["t_inflight", [], [], 5]]},
+        {"name": "t_latency", "doc": "test", "kind": "histogram", "mode": "sum", "samples": [
+            ["t_latency_bucket", ["le"], ["1"], 1], ["t_latency_bucket", ["le"], ["+Inf"], 2],
+            ["t_latency_sum", [], [], 4.0], ["t_latency_count", [], [], 2],
+        ]},
+    ]
+    (tmp_path / f"{os.getppid()}-a1b2c3.json").write_text(json.dumps(other))  # a live process
+    (tmp_path / "999999999-d4e5f6.json").write_text(json.dumps(other))  # an exited worker
+
+    text = registry.render_multiprocess(str(tmp_path))
+    assert len(list(tmp_path.glob(f"{os.getpid()}-*.json"))) == 1
+    assert 't_total{k="x"} 8' in text
+    assert "t_inflight 6" in text  # the exited worker's gauge is ignored
+    assert 't_latency_bucket{le="+Inf"} 5' in text
+    assert "t_latency_count 5" in text
+
+
+@pytest.mark.unit
+async def test_http_metrics_are_labelled_by_route_template():
+    app = FastAPI()
+    app.add_middleware(HTTPMetricsMiddleware)
+
+    @app.get("/items/{item_id}")
+    async def item(item_id: int):
+        return {"id": item_id}
+
+    before = http_metrics.HTTP_REQUESTS.value(method="GET", route="/items/{item_id}", status="200")
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://t") as client:
+        for i in range(3):
+            assert (await client.get(f"/items/{i}")).status_code == 200
+        assert (await client.get("/nope/1")).status_code == 404
+        assert (await client.request("BREW", "/items/1")).status_code == 405
+
+    assert http_metrics.HTTP_REQUESTS.value(method="GET", route="/items/{item_id}", status="200") == before + 3
+    assert http_metrics.HTTP_REQUESTS.value(method="GET", route="<unmatched>", status="404") >= 1
+    assert http_metrics.HTTP_REQUESTS.value(method="OTHER", route="/items/{item_id}", status="405") >= 1
+    assert http_metrics.HTTP_INFLIGHT.value(method="GET", route="/items/{item_id}") == 0
+    assert http_metrics.HTTP_LATENCY.value(method="GET", route="/items/{item_id}") >= 3
+
+
+@pytest.mark.unit
+def test_reused_pid_does_not_overwrite_dead_worker(registry, tmp_path, monkeypatch):
+    from src.core import metrics
+    Counter("t_total", "test").inc(4)
+    registry.write_snapshot(str(tmp_path))
+    # a new worker that was handed the same pid starts from zero
+    monkeypatch.setattr(metrics, "_instance", (os.getpid(), "newworker"))
+    fresh = Registry()
+    monkeypatch.setattr("src.core.metrics.REGISTRY", fresh)
+    Counter("t_total", "test").inc(1)
+    assert "t_total 5" in fresh.render_multiprocess(str(tmp_path))
+    metrics.clear_multiprocess_dir(str(tmp_path))
+    assert not list(tmp_path.iterdir())
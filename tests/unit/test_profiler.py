@@ -0,0 +1,84 @@
+import json
+import time
+
+import httpx
+import pytest
+from fastapi import FastAPI
+
+from src.core.profiler import Profile, stop_sampler
+from src.middlewares.profiling import ProfilingMiddleware
+
+
+def busy(seconds: float) -> None:
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+
+def make_app(tmp_path, **kw) -> FastAPI:
+    app = FastAPI()
+    app.add_middleware(ProfilingMiddleware, directory=str(tmp_path), interval_ms=1, **kw)
+
+    @app.get("/slow")
+    async def slow():
+        busy(0.08)
+        return {}
+
+    return app
+
+
+@pytest.fixture(autouse=True)
+def _stop_sampler():
+    yield
+    stop_sampler()
+
+
+@pytest.mark.unit
+async def test_profiles_only_requests_with_the_admin_token(tmp_path):
+    app = make_app(tmp_path, token="s3cret", block_ms=20)
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://t") as client:
+        assert "x-profile-file" not in (await client.get("/slow")).headers
+        assert "x-profile-file" not in (await client.get("/slow", headers={"X-Profile": "wrong"})).headers
+        r = await client.get("/slow", headers={"X-Profile": "s3cret"})
+
+    name = r.headers["x-profile-file"]
+    assert name.endswith(".speedscope.json") and "-GET-slow-" in name
+    doc = json.loads((tmp_path / name).read_text())
+    frames = [f["name"] for f in doc["shared"]["frames"]]
+    assert "busy" in frames
+    assert doc["profiles"][0]["endValue"] > 0
+    blocks = (tmp_path / name.replace(".speedscope.json", ".blocks.txt")).read_text()
+    assert "event loop blocked" in blocks and "busy" in blocks
+
+
+@pytest.mark.unit
+async def test_sampled_requests_write_collapsed_stacks(tmp_path):
+    app = make_app(tmp_path, sample_rate=1.0, fmt="collapsed")
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://t") as client:
+        r = await client.get("/slow")
+    lines = (tmp_path / r.headers["x-profile-file"]).read_text().splitlines()
+    assert any(";busy (test_profiler.py:" in line for line in lines)
+    assert all(line.rsplit(" ", 1)[1].isdigit() for line in lines)
+
+
+@pytest.mark.unit
+def test_speedscope_weights_follow_sample_counts():
+    p = Profile("p")
+    p.stacks[(("main", "m.py", 1), ("work", "w.py", 5))] += 3
+    p.stacks[(("main", "m.py", 1),)] += 1
+    doc = p.speedscope(interval=0.002)
+    assert [f["name"] for f in doc["shared"]["frames"]] == ["main", "work"]
+    assert doc["profiles"][0]["samples"] == [[0, 1], [0]]
+    assert doc["profiles"][0]["weights"] == [6.0, 2.0]
+
+
+@pytest.mark.unit
+def test_query_stats_is_the_innermost_middleware(monkeypatch):
+    from src.core.config import settings
+    from src.main import create_app
+
+    monkeypatch.setattr(settings, "PROFILE_ENABLED", True)
+    monkeypatch.setattr(settings, "SERVER_TIMING_ENABLED", True)
+    names = [m.cls.__name__ for m in create_app().user_middleware]  # outermost first
+    assert names[-2:] == ["ProfilingMiddleware", "QueryStatsMiddleware"]
+    assert names[0] == "HTTPMetricsMiddleware"
@@ -0,0 +1,94 @@
+import logging
+
+import httpx
+import pytest
+from fastapi import FastAPI
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from src.db import instrumentation
+from src.db.instrumentation import instrument_engine, track_queries
+from src.middlewares.query_stats import QueryStatsMiddleware
+
+
+@pytest.fixture()
+async def db():
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    instrument_engine(engine.sync_engine)
+    instrument_engine(engine.sync_engine)  # idempotent
+    yield engine
+    await engine.dispose()
+
+
+@pytest.mark.unit
+async def test_track_queries_counts_statements_in_context(db):
+    async with db.connect() as conn:
+        await conn.execute(text("SELECT 1"))
+        with track_queries(keep_statements=True) as stats:
+            await conn.execute(text("SELECT 2"))
+            await conn.execute(text("SELECT 3"))
+        await conn.execute(text("SELECT 4"))
+    assert stats.count == 2
+    assert stats.statements == ["SELECT 2", "SELECT 3"]
+    assert stats.total >= stats.slowest > 0
+    assert stats.slowest_statement in stats.statements
+
+
+@pytest.mark.unit
+async def test_failed_statement_is_counted_and_does_not_skew_the_next(db):
+    async with db.connect() as conn:
+        with track_queries(keep_statements=True) as stats:
+            with pytest.raises(Exception):
+                await conn.execute(text("SELECT * FROM missing_table"))
+            await conn.execute(text("SELECT 1"))
+    assert stats.statements == ["SELECT * FROM missing_table", "SELECT 1"]
+    assert stats.slowest < 1
+
+
+@pytest.mark.unit
+async def test_slow_statements_are_logged(db, monkeypatch, caplog):
+    monkeypatch.setattr(instrumentation.settings, "DB_SLOW_QUERY_MS", 0.000001)
+    with caplog.at_level(logging.WARNING, logger="src.db.instrumentation"):
+        async with db.connect() as conn:
+            await conn.execute(text("SELECT 42"))
+    record = next(r for r in caplog.records if r.db_statement == "SELECT 42")
+    assert record.db_plan is None  # EXPLAIN only on postgres
+
+
+@pytest.mark.unit
+async def test_middleware_adds_server_timing_header(db):
+    app = FastAPI()
+    app.add_middleware(QueryStatsMiddleware)
+
+    @app.get("/two")
+    async def two():
+        async with db.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+            await conn.execute(text("SELECT 2"))
+        return {}
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://t") as client:
+        r = await client.get("/two")
+    timing = r.headers["server-timing"]
+    assert 'desc="2 queries"' in timing
+    assert "db-slowest;dur=" in timing and "app;dur=" in timing
+
+
+@pytest.mark.unit
+def test_statement_shape_folds_literals_and_in_lists():
+    shape = instrumentation.statement_shape
+    assert shape("SELECT * FROM b WHERE id IN (?, ?, ?)") == shape("SELECT * FROM b  WHERE id IN (?)")
+    assert shape("SELECT * FROM b WHERE id = 1") == shape("SELECT * FROM b WHERE id = 22")
+    assert shape("SELECT * FROM b WHERE t = 'x'") != shape("SELECT * FROM a WHERE t = 'x'")
+
+
+@pytest.mark.unit
+async def test_nested_tracking_and_repeated_shapes(db):
+    async with db.connect() as conn:
+        with track_queries(keep_statements=True) as outer:
+            with track_queries() as inner:
+                for i in range(3):
+                    await conn.execute(text(f"SELECT {i}"))
+            await conn.execute(text("SELECT 'other' AS x"))
+    assert inner.count == 3 and outer.count == 4
+    assert outer.repeated(3) == [("SELECT ?", 3)]
@@ -0,0 +1,177 @@
+import pytest
+import httpx
+from fastapi import FastAPI
+from redis.exceptions import ConnectionError as RedisConnectionError
+from src.middlewares import rate_limiter
+from src.middlewares.gcra import LocalGCRA
+from src.middlewares.rate_limiter import RateLimiterMiddleware
+from src.middlewares.templates import UNMATCHED, RouteTemplates
+
+class _FakeRedis:
+    def __init__(self, replies):
+        self.replies = replies
+        self.calls = []
+
+    def register_script(self, source):
+        async def run(keys, args):
+            self.calls.append((keys, args))
+            reply = self.replies.pop(0)
+            if isinstance(reply, Exception):
+                raise reply
+            return reply
+        return run
+
+def _app(**kw) -> FastAPI:
+    app = FastAPI()
+    app.add_middleware(RateLimiterMiddleware, max_requests=2, window_seconds=10, backend="redis", **kw)
+
+    @app.get("/ping")
+    async def ping():
+        return {"ok": True}
+    return app
+
+async def _get(app, n):
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as c:
+        return [await c.get("/ping") for _ in range(n)]
+
+@pytest.mark.unit
+async def test_redis_backend_decides(monkeypatch):
+    fake = _FakeRedis([[1, 1, 0, 5000], [0, 0, 2500, 10000]])
+    monkeypatch.setattr(rate_limiter, "get_rate_redis", lambda: fake)
+    ok, limited = await _get(_app(), 2)
+    assert ok.status_code == 200 and ok.headers["X-RateLimit-Remaining"] == "1"
+    assert limited.status_code == 429 and limited.headers["Retry-After"] == "3"
+    keys, args = fake.calls[0]
+    assert keys == ["rl:ip:127.0.0.1:/ping"] and args == [5_000_000, 10_000_000, 1]
+
+@pytest.mark.unit
+async def test_redis_outage_fails_open_to_local(monkeypatch):
+    fake = _FakeRedis([RedisConnectionError("down")])
+    monkeypatch.setattr(rate_limiter, "get_rate_redis", lambda: fake)
+    errors = rate_limiter.RATE_LIMIT_BACKEND_ERRORS.value()
+    codes = [r.status_code for r in await _get(_app(), 3)]
+    assert codes == [200, 200, 429]
+    assert len(fake.calls) == 1
+    assert rate_limiter.RATE_LIMIT_BACKEND_ERRORS.value() == errors + 1
+
+@pytest.mark.unit
+def test_local_gcra_limits_and_refills():
+    g = LocalGCRA(max_requests=3, window_seconds=3)
+    assert [g.hit("k", 100.0)[:2] for _ in range(3)] == [(True, 2), (True, 1), (True, 0)]
+    allowed, _, retry_after, _ = g.hit("k", 100.0)
+    assert not allowed and retry_after == pytest.approx(1.0)
+    assert g.hit("k", 101.0)[0]
+
+@pytest.mark.unit
+def test_local_gcra_state_stays_bounded():
+    g = LocalGCRA(max_requests=5, window_seconds=10, max_keys=100)
+    for i in range(1000):
+        g.hit(f"scanner:{i}", 0.0)
+    assert len(g) == 100
+    g.hit("active", 4.0)
+    assert len(g) == 100
+    assert g.sweep(now=5.0) == 99
+    assert len(g) == 1
+    assert g.sweep(now=100.0) == 1
+
+@pytest.mark.unit
+async def test_route_templates_collapse_ids():
+    app = _app()
+    templates = RouteTemplates()
+
+    @app.get("/books/{id}")
+    async def book(id: int):
+        return {}
+
+    def scope(path):
+        return {"type": "http", "method": "GET", "path": path, "app": app, "root_path": ""}
+    assert templates.resolve(scope("/books/1")) == templates.resolve(scope("/books/2")) == "/books/{id}"
+    assert templates.resolve(scope("/wp-admin/x.php")) == UNMATCHED
+
+@pytest.mark.unit
+async def test_route_policies_charge_cost_and_user_budget(monkeypatch):
+    from src.core.security import create_access_token
+    from src.middlewares.policies import rate_limit
+
+    app = FastAPI()
+    app.add_middleware(RateLimiterMiddleware, max_requests=100, window_seconds=60, user_max_requests=50)
+
+    @app.post("/exports")
+    @rate_limit(cost=40)
+    async def export():
+        return {}
+
+    @app.post("/login")
+    @rate_limit(per_ip=(1, 60))
+    async def login():
+        return {}
+
+    @app.get("/free")
+    @rate_limit(exempt=True)
+    async def free():
+        return {}
+
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': 'alice'})}"}
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as c:
+        assert [(await c.post("/exports")).status_code for _ in range(3)] == [200, 200, 429]
+        assert [(await c.post("/login")).status_code for _ in range(2)] == [200, 429]
+        assert [(await c.get("/free")).status_code for _ in range(3)] == [200, 200, 200]
+        r = await c.get("/free", headers=headers)
+        assert "x-ratelimit-limit" not in r.headers
+
+        monkeypatch.setattr(rate_limiter, "client_ip", lambda scope: "10.0.0.9")
+        r = await c.post("/login", headers=headers)
+        assert r.status_code == 200 and r.headers["x-ratelimit-limit"] == "1"
+        codes = [(await c.post("/exports", headers=headers)).status_code for _ in range(3)]
+        assert codes == [200, 429, 429]
+
+@pytest.mark.unit
+async def test_authenticated_request_verifies_its_token_once():
+    from fastapi import Depends
+    from src.core.security import AUTH_TOKEN_CACHE_REQUESTS, create_access_token, get_current_user
+
+    app = FastAPI()
+    app.add_middleware(RateLimiterMiddleware, max_requests=100, window_seconds=60, user_max_requests=50)
+
+    @app.get("/me")
+    async def me(user: dict = Depends(get_current_user)):
+        return {"sub": user["sub"]}
+
+    def lookups():
+        return AUTH_TOKEN_CACHE_REQUESTS.value(result="hit") + AUTH_TOKEN_CACHE_REQUESTS.value(result="miss")
+
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': 'carol'})}"}
+    before = lookups()
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as c:
+        assert [(await c.get("/me", headers=headers)).json()["sub"] for _ in range(2)] == ["carol", "carol"]
+    assert lookups() == before + 2
+
+@pytest.mark.unit
+async def test_user_budget_rejection_refunds_ip_budget():
+    from src.core.security import create_access_token
+
+    app = FastAPI()
+    app.add_middleware(RateLimiterMiddleware, max_requests=3, window_seconds=60, user_max_requests=1)
+
+    @app.get("/ping")
+    async def ping():
+        return {}
+
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': 'dave'})}"}
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as c:
+        assert [(await c.get("/ping", headers=headers)).status_code for _ in range(3)] == [200, 429, 429]
+        r = await c.get("/ping")
+    assert r.headers["x-ratelimit-remaining"] == "1"
+
+@pytest.mark.unit
+async def test_redis_refunds_ip_charge_when_user_budget_rejects(monkeypatch):
+    from src.core.security import create_access_token
+
+    fake = _FakeRedis([[1, 1, 0, 5000], [0, 0, 2500, 10000], 1])
+    monkeypatch.setattr(rate_limiter, "get_rate_redis", lambda: fake)
+    app = _app(user_max_requests=1)
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': 'erin'})}"}
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as c:
+        assert (await c.get("/ping", headers=headers)).status_code == 429
+    (ip_key, _), (user_key, _), refund = fake.calls
+    assert refund == (ip_key, [5_000_000, 1]) and user_key == ["rl:user:erin"]
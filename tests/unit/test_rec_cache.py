@@ -0,0 +1,49 @@
+import pytest
+from src.services.rec_cache import RecommendationCache
+
+@pytest.mark.unit
+def test_cache_hit_until_version_bump():
+    c = RecommendationCache(maxsize=10, ttl_seconds=60)
+    v = c.version("alice")
+    c.put("alice", 10, v, ["a"])
+    assert c.get("alice", 10) == ["a"]
+    assert c.get("alice", 5) is None
+    c.bump("alice")
+    assert c.get("alice", 10) is None
+
+@pytest.mark.unit
+def test_cache_ignores_results_computed_before_bump():
+    c = RecommendationCache(maxsize=10, ttl_seconds=60)
+    v = c.version("bob")
+    c.bump("bob")
+    c.put("bob", 10, v, ["stale"])
+    assert c.get("bob", 10) is None
+
+@pytest.mark.unit
+def test_cache_expires_and_evicts():
+    c = RecommendationCache(maxsize=1, ttl_seconds=0)
+    c.put("carol", 10, 0, ["x"])
+    assert c.get("carol", 10) is None
+    c = RecommendationCache(maxsize=1, ttl_seconds=60)
+    c.put("carol", 10, 0, ["x"])
+    c.put("dave", 10, 0, ["y"])
+    assert c.get("carol", 10) is None
+    assert c.get("dave", 10) == ["y"]
+
+@pytest.mark.unit
+async def test_flushed_events_invalidate_and_warm(monkeypatch):
+    import asyncio
+    from src.services import rec_cache
+
+    warmed = []
+
+    async def warm(username, limit=10):
+        warmed.append(username)
+
+    monkeypatch.setattr(rec_cache, "warm_user_recommendations", warm)
+    monkeypatch.setattr(rec_cache.settings, "RECS_WARM_ON_EVENT", True)
+    before = rec_cache.get_rec_cache().version("flushed-user")
+    rec_cache.events_recorded({"flushed-user"})
+    assert rec_cache.get_rec_cache().version("flushed-user") == before + 1
+    await asyncio.gather(*rec_cache._warming)
+    assert warmed == ["flushed-user"]
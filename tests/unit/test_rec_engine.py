@@ -0,0 +1,27 @@
+import pytest
+from src.services.rec_engine import CatalogMatrix
+
+def _catalog():
+    return CatalogMatrix(
+        ids=[1, 2, 3, 4, 5],
+        genres=["Fiction", "Science", "Fiction", "Science", "History"],
+        author_ids=[10, None, 10, None, 11],
+        years=[1990, 2001, 2000, 1980, 2005],
+    )
+
+@pytest.mark.unit
+def test_top_n_prefers_shared_author_and_genre():
+    assert _catalog().top_n([1], [3.0], limit=5) == [3]
+
+@pytest.mark.unit
+def test_top_n_excludes_seen_and_ignores_missing_author():
+    out = _catalog().top_n([2], [1.0], limit=5)
+    assert 2 not in out
+    assert out == [4, 5, 3]
+
+@pytest.mark.unit
+def test_top_n_respects_limit_and_unknown_ids():
+    c = _catalog()
+    assert c.top_n([2], [1.0], limit=1) == [4]
+    assert c.top_n([999], [1.0], limit=5) == []
+    assert CatalogMatrix([], [], [], []).top_n([1], [1.0], limit=5) == []
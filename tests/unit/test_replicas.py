@@ -0,0 +1,39 @@
+import pytest
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+from src.db.replicas import Replica, ReplicaSet, open_replica_session, set_replica_set
+
+def _replica(name, url):
+    return Replica(name, create_async_engine(url))
+
+@pytest.fixture()
+async def replicas(tmp_path):
+    good = _replica("good", f"sqlite+aiosqlite:///{tmp_path / 'good.db'}")
+    bad = _replica("bad", f"sqlite+aiosqlite:///{tmp_path / 'missing' / 'bad.db'}")
+    rs = ReplicaSet([bad, good])
+    set_replica_set(rs)
+    yield rs
+    set_replica_set(None)
+    await rs.dispose()
+
+@pytest.mark.unit
+async def test_failed_replica_is_skipped_until_healthy(replicas):
+    bad, good = replicas.replicas
+    for _ in range(3):
+        session = await open_replica_session()
+        async with session:
+            assert (await session.execute(text("SELECT 1"))).scalar() == 1
+            assert session.bind is good.engine
+    assert not bad.healthy and good.healthy
+
+    await replicas.check()
+    assert not bad.healthy
+    good.healthy = False
+    assert await open_replica_session() is None
+
+@pytest.mark.unit
+async def test_pick_prefers_least_busy(replicas):
+    bad, good = replicas.replicas
+    async with good.engine.connect():
+        assert {replicas.pick().name for _ in range(4)} == {"bad"}
+    assert {replicas.pick().name for _ in range(4)} == {"bad", "good"}
@@ -0,0 +1,33 @@
+import pytest
+from fastapi import HTTPException
+from src.core import security
+from src.core.security import hash_password_async, verify_password_async
+
+@pytest.mark.unit
+async def test_async_hash_roundtrip():
+    hashed = await hash_password_async("secret123")
+    assert await verify_password_async("secret123", hashed)
+    assert not await verify_password_async("wrong", hashed)
+    assert security.AUTH_HASH_QUEUE_DEPTH.value() == 0
+
+@pytest.mark.unit
+async def test_async_hash_rejects_when_queue_full(monkeypatch):
+    monkeypatch.setattr(security.settings, "AUTH_HASH_MAX_PENDING", 0)
+    with pytest.raises(HTTPException) as exc:
+        await hash_password_async("secret123")
+    assert exc.value.status_code == 503
+
+@pytest.mark.unit
+def test_token_cache_serves_until_exp(monkeypatch):
+    token = security.create_access_token({"sub": "cached"}, expires_delta=5)
+    security.get_token_cache().clear()
+    hits = security.AUTH_TOKEN_CACHE_REQUESTS.value(result="hit")
+    assert security.verify_token(token)["sub"] == "cached"
+    calls = []
+    monkeypatch.setattr(security.jwt, "decode", lambda *a, **kw: calls.append(a))
+    assert security.verify_token(token)["sub"] == "cached"
+    assert not calls and security.AUTH_TOKEN_CACHE_REQUESTS.value(result="hit") == hits + 1
+
+    payload, _ = next(iter(security.get_token_cache()._entries.values()))
+    monkeypatch.setattr(security.time, "time", lambda: payload["exp"] + 1)
+    assert security.get_token_cache().get(token) is None
@@ -0,0 +1,22 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from src.core.serialization import FastJSONResponse, dumps
+from src.schemas.book import BookResponse, book_payload
+
+
+@pytest.mark.unit
+def test_book_payload_matches_response_model_without_none_fields():
+    book = SimpleNamespace(id=1, title="T", genre="Fiction", published_year=2001, author=None, isbn=None)
+    payload = book_payload(book)
+    assert payload == BookResponse(**payload).model_dump(exclude_none=True)
+    assert "author_name" not in payload and "isbn" not in payload
+
+
+@pytest.mark.unit
+def test_dumps_encodes_models_and_non_str_keys():
+    model = BookResponse(id=1, title="T", genre="Fiction", published_year=2001, author_name="A")
+    assert json.loads(dumps({"book": model, 1: "x"})) == {"book": model.model_dump(mode="json"), "1": "x"}
+    assert FastJSONResponse({"a": [1, None]}).body == b'{"a":[1,null]}'
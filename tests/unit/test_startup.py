@@ -0,0 +1,27 @@
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parents[2]
+
+PROBE = r"""
+import importlib, pathlib
+import src.core.config as config
+for path in sorted(pathlib.Path("src").rglob("*.py")):
+    name = ".".join(path.with_suffix("").parts)
+    importlib.import_module(name[: -len(".__init__")] if name.endswith(".__init__") else name)
+assert config.get_settings.cache_info().currsize == 0, "settings read at import"
+import src.main
+assert src.main._app is None
+"""
+
+
+@pytest.mark.unit
+def test_importing_the_package_reads_no_settings():
+    # a bare environment: any import-time `settings.X` would fail validation here
+    env = {"PATH": os.environ.get("PATH", ""), "PYTHONPATH": str(ROOT)}
+    result = subprocess.run([sys.executable, "-c", PROBE], cwd=ROOT, env=env, capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr